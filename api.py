@@ -1,10 +1,23 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from neo4j import GraphDatabase
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from functools import lru_cache
+import json
 import logging
 
+import metrics
+from graph import events
+from graph.client import GraphClient
+from graph.lineage import LineageGraph
+from graph.lineage_index import INDEX_PROPERTIES
+from graph.search import SearchIndex
+from jobs.queue import JobQueue
+from jobs.tasks import TASKS
+
 load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -12,6 +25,62 @@ CORS(app)  # Enable CORS for all routes
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ========== MÉTRICAS ==========
+
+REQUEST_SECONDS = metrics.Histogram("api_request_duration_seconds", "Request latency by route",
+                                    ("route", "method", "status"))
+RESPONSE_BYTES = metrics.Histogram("api_response_bytes", "Response body size by route", ("route",),
+                                   buckets=metrics.SIZE_BUCKETS)
+IN_FLIGHT = metrics.Gauge("api_requests_in_flight", "Requests being handled")
+QUERY_SECONDS = metrics.Histogram("api_cypher_duration_seconds",
+                                  "Cypher statement time (run + fetching all records)", ("statement",))
+QUERY_ROWS = metrics.Histogram("api_cypher_rows", "Records returned per Cypher statement", ("statement",),
+                               buckets=metrics.ROW_BUCKETS)
+SERIALIZE_SECONDS = metrics.Histogram("api_serialize_duration_seconds", "JSON serialization time", ("route",))
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.started, (route, request.method, str(response.status_code)))
+    # Streams (no Content-Length) are left out
+    if response.content_length is not None:
+        RESPONSE_BYTES.observe(response.content_length, (route,))
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    if "started" in g:
+        IN_FLIGHT.dec()
+
+@lru_cache(maxsize=256)
+def statement_label(query: str) -> str:
+    """Short, stable label for a Cypher statement (its first 60 characters)."""
+    return " ".join(query.split())[:60]
+
+def timed_query(run, query: str, params: dict = None, name: str = None) -> list:
+    """Run a statement with run(query, params), fetch all records and record time/rows."""
+    started = time.perf_counter()
+    records = list(run(query, params or {}))
+    label = (name or statement_label(query),)
+    QUERY_SECONDS.observe(time.perf_counter() - started, label)
+    QUERY_ROWS.observe(len(records), label)
+    return records
+
+def timed_json(payload):
+    started = time.perf_counter()
+    response = jsonify(payload)
+    SERIALIZE_SECONDS.observe(time.perf_counter() - started, (request.url_rule.rule,))
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 def get_neo4j_driver():
     uri = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
     user = os.getenv("NEO4J_USER", "neo4j")
@@ -26,29 +95,30 @@ def get_data():
         
         with driver.session(database=database) as session:
             # Get data nodes
-            result = session.run("""
+            result = timed_query(session.run, """
                 MATCH (n:DataNode)
                 RETURN n
                 ORDER BY n.id
-            """)
+            """, name="data_nodes")
             data_nodes = [record["n"] for record in result]
             
             # Get inferences with their relationships
-            result = session.run("""
+            result = timed_query(session.run, """
                 MATCH (i:Inference)
                 OPTIONAL MATCH (source)-[r:SUPPORTS]->(i)
                 OPTIONAL MATCH (i)-[l:LEADS_TO]->(target:Inference)
                 RETURN i, collect(DISTINCT source.id) as sources, collect(DISTINCT target.id) as targets
-            """)
+            """, name="inferences")
+            # Lineage index bookkeeping (dag_depth, ROOT_OF counts) is not part of the payload
             inferences = [{
-                **dict(record["i"]),
+                **{k: v for k, v in dict(record["i"]).items() if k not in INDEX_PROPERTIES},
                 "sources": record["sources"],
                 "targets": record["targets"]
             } for record in result]
             
         driver.close()
         
-        return jsonify({
+        return timed_json({
             "data_nodes": [dict(node) for node in data_nodes],
             "inferences": inferences
         })
@@ -57,5 +127,244 @@ def get_data():
         logger.error(f"Error fetching data: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ========== LINHAGEM ==========
+
+LINEAGE_CHECK_SECONDS = float(os.getenv("LINEAGE_CHECK_SECONDS", "5"))
+_lineage = {"graph": None, "checked": 0.0}
+_client = {"client": None}
+# Guards creation of the lazy singletons below (Flask serves requests from several threads)
+_singletons_lock = threading.RLock()
+
+def get_client() -> GraphClient:
+    """GraphClient shared by the in-process caches."""
+    if _client["client"] is None:
+        with _singletons_lock:
+            if _client["client"] is None:
+                client = GraphClient()
+                client.connect()
+                run_query = client.run_query
+                client.run_query = lambda query, params=None: timed_query(run_query, query, params)
+                _client["client"] = client
+    return _client["client"]
+
+def get_lineage() -> LineageGraph:
+    """Shared lineage cache; checks the graph revision at most every LINEAGE_CHECK_SECONDS."""
+    if _lineage["graph"] is None:
+        with _singletons_lock:
+            if _lineage["graph"] is None:
+                _lineage["graph"] = LineageGraph(get_client())
+    if time.time() - _lineage["checked"] >= LINEAGE_CHECK_SECONDS:
+        _lineage["graph"].refresh()
+        _lineage["checked"] = time.time()
+    return _lineage["graph"]
+
+@app.route('/api/lineage')
+def get_lineage_route():
+    """
+    ?id=<node>[&direction=ancestors|descendants|both][&depth=N][&kind=DataNode|Inference]
+    ?from=<node>&to=<node>[&undirected=1]
+    ?order=topological
+    """
+    try:
+        lineage = get_lineage().pinned()
+        args = request.args
+        depth = int(args["depth"]) if "depth" in args else None
+        kind = args.get("kind")
+        if kind not in (None, "DataNode", "Inference"):
+            return jsonify({"error": f"Unknown kind '{kind}'"}), 400
+
+        if "from" in args and "to" in args:
+            path = lineage.shortest_path(args["from"], args["to"], directed=args.get("undirected") != "1")
+            return jsonify({"from": args["from"], "to": args["to"], "path": path,
+                            "hops": len(path) - 1 if path else None, "version": lineage.version})
+
+        if args.get("order") == "topological":
+            return jsonify({"order": lineage.topological_order(), "depth": lineage.depths(),
+                            "version": lineage.version})
+
+        if "id" in args:
+            direction = args.get("direction", "both")
+            if direction not in ("ancestors", "descendants", "both"):
+                return jsonify({"error": f"Unknown direction '{direction}'"}), 400
+            result = {"id": args["id"], "version": lineage.version}
+            if direction in ("ancestors", "both"):
+                result["ancestors"] = lineage.ancestors(args["id"], depth, kind)
+            if direction in ("descendants", "both"):
+                result["descendants"] = lineage.descendants(args["id"], depth, kind)
+            return jsonify(result)
+
+        return jsonify({"error": "Pass id, from/to or order=topological"}), 400
+
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in lineage query: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# ========== BUSCA ==========
+
+SEARCH_CHECK_SECONDS = float(os.getenv("SEARCH_CHECK_SECONDS", "5"))
+_search = {"index": None, "checked": 0.0}
+
+def get_search_index() -> SearchIndex:
+    """Shared search index; checks the graph version at most every SEARCH_CHECK_SECONDS."""
+    if _search["index"] is None:
+        with _singletons_lock:
+            if _search["index"] is None:
+                _search["index"] = SearchIndex(get_client())
+    if time.time() - _search["checked"] >= SEARCH_CHECK_SECONDS:
+        _search["index"].refresh()
+        _search["checked"] = time.time()
+    return _search["index"]
+
+@app.route('/api/search')
+def search():
+    """?q=<words>[&limit=20][&type=interpretation|action|...]"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing q"}), 400
+    try:
+        limit = min(int(request.args.get("limit", 20)), 200)
+        index = get_search_index()
+        started = time.perf_counter()
+        results = index.search(query, limit, request.args.get("type"))
+        return jsonify({
+            "query": query,
+            "results": results,
+            "total_indexed": index.size,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3)
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in search: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# ========== JOBS ==========
+
+_jobs = {"queue": None}
+
+def get_job_queue() -> JobQueue:
+    """Shared job queue, started on first use; results are written back through get_client()."""
+    if _jobs["queue"] is None:
+        with _singletons_lock:
+            if _jobs["queue"] is None:
+                queue = JobQueue(client_factory=get_client)
+                queue.listeners.append(emit_job_event)
+                queue.start()
+                _jobs["queue"] = queue
+    return _jobs["queue"]
+
+def emit_job_event(job: dict):
+    """Job transitions (and evidence written back to an Inference) go to the event stream."""
+    changes = [{"type": "job", "id": job["id"], "kind": job["kind"], "status": job["status"]}]
+    if job["status"] == "done" and job["written_back"]:
+        changes.append(events.node_event("node_updated", TASKS[job["kind"]]["inference"], "Inference",
+                                         analysis=job["kind"]))
+    events.emit(changes)
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+def jobs():
+    """
+    POST {"kind": "cluster_analysis", "params": {"project": "...", ...}} -> 202 job
+    GET [?status=queued|running|done|failed|cancelled][&limit=100]
+    """
+    try:
+        queue = get_job_queue()
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            if "kind" not in body:
+                return jsonify({"error": "Missing kind", "kinds": sorted(TASKS)}), 400
+            job = queue.submit(body["kind"], body.get("params") or {})
+            return jsonify(job), 200 if job["status"] == "done" else 202
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        return jsonify({"jobs": queue.store.list(request.args.get("status"), limit), "kinds": sorted(TASKS)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in jobs: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """GET status; DELETE cancels (queued jobs are dropped, running ones terminated)."""
+    try:
+        queue = get_job_queue()
+        job = queue.cancel(job_id) if request.method == 'DELETE' else queue.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+        return jsonify(job)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        logger.error(f"Error in job {job_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>/result')
+def job_result(job_id):
+    try:
+        return timed_json(get_job_queue().result(job_id))
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error in job result {job_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# ========== EVENTOS ==========
+
+_events = {"stream": None}
+EVENT_HEARTBEAT = 15.0
+
+def get_event_stream() -> events.EventStream:
+    """Shared tail of the graph event log (one poller thread per process)."""
+    if _events["stream"] is None:
+        with _singletons_lock:
+            if _events["stream"] is None:
+                stream = events.EventStream()
+                stream.start()
+                _events["stream"] = stream
+    return _events["stream"]
+
+@app.route('/api/events')
+def graph_events():
+    """
+    Server-sent graph changes. Each message is one coalesced batch:
+
+        id: <last event id>
+        event: changes
+        data: {"events": [...]}
+
+    Reconnecting clients send Last-Event-ID (or ?last_id=) and receive only
+    what they missed; new clients start from now.
+    """
+    try:
+        stream = get_event_stream()
+        resume = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+        last_id = int(resume) if resume else stream.latest
+        # A reset log (ids restarted) replays from the beginning
+        if last_id > stream.latest:
+            last_id = 0
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    except Exception as e:
+        logger.error(f"Error opening event stream: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    def generate(last_id):
+        yield f"retry: 3000\nid: {last_id}\n\n"
+        while True:
+            last_id, changes = stream.wait(last_id, EVENT_HEARTBEAT)
+            if changes:
+                yield f"id: {last_id}\nevent: changes\ndata: {json.dumps({'events': changes})}\n\n"
+            else:
+                yield ": ping\n\n"
+
+    return Response(generate(last_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == '__main__':
     app.run(port=5000)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+📦 Batch: processa vários projetos em paralelo
+Cada projeto (diretório com collar/survey/assay/lith CSVs) roda ingestão,
+estatísticas e migrations no seu próprio banco Neo4j, num pool de processos.
+
+Uso:
+    python batch.py proj_a proj_b proj_c            # um worker por CPU
+    python batch.py projetos/* --workers 4
+    python batch.py projetos/* --no-graph           # só ingestão e estatísticas
+    python batch.py projetos/* --report batch.json  # resumo em JSON
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = ".batch.log"
+
+
+def database_name(project_dir: str, prefix: str = "") -> str:
+    """Valid Neo4j database name for a project: lowercase, starts with a letter, 3-63 chars."""
+    name = re.sub(r"[^a-z0-9.-]", "-", (prefix + os.path.basename(os.path.abspath(project_dir))).lower())
+    name = name.strip(".-")
+    if not name or not name[0].isalpha():
+        name = "p-" + name
+    return name.ljust(3, "0")[:63]
+
+
+def create_database(name: str):
+    """CREATE DATABASE on the system database (Neo4j Enterprise; Community only has one database)."""
+    from graph.client import GraphClient
+
+    with GraphClient(database="system") as client:
+        client.run_query(f"CREATE DATABASE `{name}` IF NOT EXISTS WAIT")
+
+
+# ========== WORKER ==========
+
+def run_project(project_dir: str, database: str, graph: bool, progress) -> dict:
+    """All steps for one project; runs in a worker process."""
+    from migrate import build_migrations, run_migrations
+    from pipeline.runner import Pipeline
+
+    handler = logging.FileHandler(os.path.join(project_dir, LOG_FILE), mode="w")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    result = {"project": project_dir, "database": database if graph else None,
+              "steps": {}, "step": None, "error": None}
+    started = time.time()
+
+    def step(name, fn):
+        result["step"] = name
+        progress.put((project_dir, name, "started", None))
+        t0 = time.time()
+        value = fn()
+        seconds = round(time.time() - t0, 2)
+        result["steps"][name] = seconds
+        progress.put((project_dir, name, "done", seconds))
+        return value
+
+    try:
+        pipeline = Pipeline(project_dir)
+        if graph:
+            step("database", lambda: create_database(database))
+            step("migrations", lambda: run_migrations(build_migrations(database)))
+        result["ingest"] = step("ingest", pipeline.ingest)
+        results = step("stats", pipeline.run)
+        result["nodes"] = len(results["stats"])
+        if graph:
+            result["publish"] = step("publish", lambda: _publish(pipeline, results, database))
+    except Exception as e:
+        logger.exception(f"Project {project_dir} failed")
+        result["error"] = f"{result['step']}: {type(e).__name__}: {e}"
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+    result["seconds"] = round(time.time() - started, 2)
+    return result
+
+
+def _publish(pipeline, results: dict, database: str) -> dict:
+    from graph.client import GraphClient
+
+    with GraphClient(database=database) as client:
+        return pipeline.publish(results, client)
+
+
+def _init_worker():
+    # Workers log to each project's LOG_FILE; keep the terminal for progress lines.
+    # The NullHandler also turns later logging.basicConfig calls into no-ops.
+    root = logging.getLogger()
+    root.handlers = [logging.NullHandler()]
+    root.setLevel(logging.INFO)
+
+
+# ========== ORQUESTRAÇÃO ==========
+
+def run_batch(projects: list, workers: int = None, graph: bool = True, prefix: str = "") -> list:
+    """Run every project on a process pool; returns per-project results in input order."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(projects)))
+    databases = {project: database_name(project, prefix) for project in projects}
+    duplicates = {db for db in databases.values() if list(databases.values()).count(db) > 1}
+    if graph and duplicates:
+        raise ValueError(f"Projects map to the same database: {sorted(duplicates)}")
+
+    logger.info(f"📦 {len(projects)} projects, {workers} workers")
+    started = time.time()
+    results = {}
+    with multiprocessing.Manager() as manager:
+        progress = manager.Queue()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = {
+                pool.submit(run_project, project, databases[project], graph, progress): project
+                for project in projects
+            }
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                _drain(progress)
+                for future in done:
+                    project = pending.pop(future)
+                    try:
+                        results[project] = future.result()
+                    except Exception as e:
+                        results[project] = {"project": project, "error": f"{type(e).__name__}: {e}",
+                                            "steps": {}, "seconds": None}
+                    _report(results[project], len(results), len(projects))
+            _drain(progress)
+
+    failed = sum(1 for r in results.values() if r["error"])
+    logger.info(f"✨ Batch finished in {time.time() - started:.1f}s: "
+                f"{len(projects) - failed} ok, {failed} failed")
+    return [results[project] for project in projects]
+
+
+def _drain(progress):
+    while not progress.empty():
+        project, step, status, seconds = progress.get()
+        name = os.path.basename(os.path.abspath(project))
+        if status == "started":
+            logger.info(f"🔄 {name}: {step}...")
+        else:
+            logger.info(f"   {name}: {step} ({seconds}s)")
+
+
+def _report(result: dict, finished: int, total: int):
+    name = os.path.basename(os.path.abspath(result["project"]))
+    if result["error"]:
+        logger.error(f"❌ [{finished}/{total}] {name}: {result['error']}")
+    else:
+        steps = ", ".join(f"{step} {seconds}s" for step, seconds in result["steps"].items())
+        logger.info(f"✅ [{finished}/{total}] {name} in {result['seconds']}s ({steps})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description="Run ingestion, stats and migrations for many projects")
+    parser.add_argument("projects", nargs="+", help="project directories")
+    parser.add_argument("--workers", type=int, default=None, help="parallel projects (default: CPU count)")
+    parser.add_argument("--no-graph", action="store_true", help="skip Neo4j (databases, migrations, publish)")
+    parser.add_argument("--database-prefix", default="", help="prefix for per-project database names")
+    parser.add_argument("--report", help="write per-project results as JSON")
+    args = parser.parse_args()
+
+    missing = [p for p in args.projects if not os.path.isdir(p)]
+    if missing:
+        parser.error(f"not a directory: {', '.join(missing)}")
+
+    batch = run_batch(args.projects, args.workers, graph=not args.no_graph, prefix=args.database_prefix)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(batch, f, indent=2, default=str)
+    sys.exit(1 if any(r["error"] for r in batch) else 0)
@@ -0,0 +1,3 @@
+"""
+Synthetic scale data and the benchmark harness.
+"""
@@ -0,0 +1,221 @@
+"""
+In-process stand-in for the neo4j driver.
+
+Serves a fixture graph (the graph.snapshot layout: {"nodes": [{key, labels,
+props}], "relationships": [{start, end, type, props}], "migrations"}) through
+the small part of the driver API the app uses: GraphDatabase.driver(),
+verify_connectivity(), session(database=...), session.run(query, params),
+records by key and close(). Query results are precomputed per statement, and
+every run sleeps for the injected latency, so load tests measure the app
+and not the fixture.
+
+Only the statements issued by api.py (/api/data, lineage and search caches)
+are recognized; anything else raises NotImplementedError naming the query.
+A driver created with writes=True instead accepts every other statement as a
+write returning no records, so the migrations can run against it and be
+timed by their round trips (`driver.statements` counts them).
+
+    with fake_driver(web_fixture(10000), latency=0.005):
+        ...  # GraphDatabase.driver() now returns the fake
+"""
+from contextlib import contextmanager
+import re
+import time
+
+import neo4j
+
+from .synthetic import knowledge_web
+
+
+class FakeRecord(dict):
+    """Dict record; node values are plain property dicts so dict(record["n"]) works."""
+
+    def data(self) -> dict:
+        return dict(self)
+
+    def value(self, key=0):
+        return self[key] if not isinstance(key, int) else list(self.values())[key]
+
+
+class FakeResult(list):
+    """Buffered records with the Result methods the migrations call."""
+
+    def single(self):
+        return self[0] if self else None
+
+    def data(self) -> list:
+        return [dict(record) for record in self]
+
+    def consume(self):
+        return None
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+# ========== FIXTURES ==========
+
+def web_fixture(n: int, seed: int = 0) -> dict:
+    """Synthetic knowledge web of n inferences in the snapshot layout."""
+    web = knowledge_web(n, seed)
+    nodes, keys = [], {}
+    for node in web["data_nodes"]:
+        keys[node["id"]] = len(nodes)
+        nodes.append({"key": len(nodes), "labels": ["DataNode"], "props": dict(node)})
+    for node in web["inferences"]:
+        keys[node["id"]] = len(nodes)
+        nodes.append({"key": len(nodes), "labels": ["Inference"],
+                      "props": {k: v for k, v in node.items() if k != "sources"}})
+    relationships = [{"start": keys[source], "end": keys[node["id"]], "type": "SUPPORTS", "props": {}}
+                     for node in web["inferences"] for source in node["sources"]]
+    migrations = ["001", "002", "003", "004"]
+    for version in migrations:
+        nodes.append({"key": len(nodes), "labels": ["Migration"], "props": {"version": version}})
+    return {"nodes": nodes, "relationships": relationships, "migrations": migrations}
+
+
+def load_fixture(spec: str) -> dict:
+    """"web:<n>" for a synthetic web, anything else is a graph.snapshot path."""
+    if spec.startswith("web:"):
+        return web_fixture(int(spec[4:]))
+    from graph.snapshot import load_snapshot
+
+    return load_snapshot(spec)
+
+
+# ========== DRIVER ==========
+
+class FakeGraph:
+    """Precomputed answers to the app's statements over a fixture graph."""
+
+    def __init__(self, fixture: dict, writes: bool = False):
+        self.writes = writes
+        nodes = {node["key"]: node for node in fixture["nodes"]}
+        by_label = {}
+        for node in fixture["nodes"]:
+            for label in node["labels"]:
+                by_label.setdefault(label, []).append(node)
+        data_nodes = sorted(by_label.get("DataNode", []), key=lambda node: str(node["props"].get("id")))
+        inferences = by_label.get("Inference", [])
+
+        sources, targets, edges = {}, {}, set()
+        for rel in fixture["relationships"]:
+            start, end = nodes[rel["start"]], nodes[rel["end"]]
+            start_id, end_id = start["props"].get("id"), end["props"].get("id")
+            if rel["type"] == "SUPPORTS" and "Inference" in end["labels"]:
+                sources.setdefault(rel["end"], []).append(start_id)
+            if rel["type"] == "LEADS_TO" and "Inference" in end["labels"]:
+                targets.setdefault(rel["start"], []).append(end_id)
+            if rel["type"] in ("SUPPORTS", "LEADS_TO") and start_id is not None and end_id is not None:
+                edges.add((start_id, end_id))
+
+        text_fields = ("title", "evidence", "implications", "recommendations")
+        self.results = {
+            "data_nodes": [FakeRecord(n=node["props"]) for node in data_nodes],
+            "inferences": [
+                FakeRecord(i=node["props"], sources=sorted(set(sources.get(node["key"], []))),
+                           targets=sorted(set(targets.get(node["key"], []))))
+                for node in inferences
+            ],
+            "migrations": [FakeRecord(version=node["props"].get("version"))
+                           for node in sorted(by_label.get("Migration", []),
+                                              key=lambda node: str(node["props"].get("version")))],
+            "lineage_nodes": sorted(
+                [FakeRecord(id=node["props"].get("id"), is_data="DataNode" in node["labels"])
+                 for node in data_nodes + inferences], key=lambda record: str(record["id"])),
+            "lineage_edges": [FakeRecord(source=a, target=b) for a, b in sorted(edges)],
+            "structure": [FakeRecord(nodes=len(data_nodes) + len(inferences), edges=len(edges))],
+            "applied_versions": [FakeRecord(versions=[str(node["props"].get("version"))
+                                                      for node in by_label.get("Migration", [])])],
+            "search_version": [FakeRecord(n=len(inferences), size=sum(
+                len(str(node["props"].get(field) or "")) for node in inferences for field in text_fields))],
+            "search_documents": [
+                FakeRecord(id=node["props"].get("id"), type=node["props"].get("type"),
+                           **{field: node["props"].get(field) for field in text_fields})
+                for node in inferences
+            ],
+            "empty": []
+        }
+
+    # Normalized statement pattern -> precomputed result
+    STATEMENTS = [
+        (r"^MATCH \(n:DataNode\) RETURN n ORDER BY n\.id$", "data_nodes"),
+        (r"^MATCH \(i:Inference\) OPTIONAL MATCH \(source\)-\[r:SUPPORTS\]->\(i\)", "inferences"),
+        (r"^MATCH \(m:Migration\) RETURN m\.version AS version", "migrations"),
+        (r"^MATCH \(m:Migration\) RETURN collect\(m\.version\) AS versions", "applied_versions"),
+        (r"^CALL \{ MATCH \(n\) WHERE n:DataNode OR n:Inference RETURN count\(n\) AS nodes \}", "structure"),
+        (r"^MATCH \(n\) WHERE n:DataNode OR n:Inference RETURN n\.id AS id", "lineage_nodes"),
+        (r"^MATCH \(a\)-\[:SUPPORTS\|LEADS_TO\]->\(b\)", "lineage_edges"),
+        (r"^MATCH \(i:Inference\) RETURN count\(i\) AS n", "search_version"),
+        (r"^MATCH \(i:Inference\) RETURN i\.id AS id, i\.type AS type", "search_documents"),
+        (r"^RETURN 1", "empty")
+    ]
+    _compiled = [(re.compile(pattern), name) for pattern, name in STATEMENTS]
+
+    def answer(self, query: str) -> list:
+        text = _normalize(query)
+        for pattern, name in self._compiled:
+            if pattern.search(text):
+                return self.results[name]
+        if self.writes:
+            return []
+        raise NotImplementedError(f"Fake driver does not know this statement: {text[:120]}")
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> FakeResult:
+        records = self.driver.graph.answer(query)
+        self.driver.statements += 1
+        delay = self.driver.latency + self.driver.row_latency * len(records)
+        if delay:
+            time.sleep(delay)
+        return FakeResult(records)
+
+    def execute_write(self, work, *args, **kwargs):
+        # The session doubles as the transaction: both only need run()
+        return work(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeDriver:
+    def __init__(self, graph: FakeGraph, latency: float = 0.0, row_latency: float = 0.0):
+        self.graph = graph
+        self.latency = latency
+        self.row_latency = row_latency
+        self.statements = 0
+
+    def verify_connectivity(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def session(self, database: str = None, **kwargs) -> FakeSession:
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def fake_driver(fixture: dict, latency: float = 0.0, row_latency: float = 0.0, writes: bool = False):
+    """Make neo4j.GraphDatabase.driver() return a FakeDriver over the fixture."""
+    driver = FakeDriver(FakeGraph(fixture, writes), latency, row_latency)
+    original = neo4j.GraphDatabase.__dict__["driver"]
+    neo4j.GraphDatabase.driver = staticmethod(lambda *args, **kwargs: driver)
+    try:
+        yield driver
+    finally:
+        neo4j.GraphDatabase.driver = original
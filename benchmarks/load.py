@@ -0,0 +1,188 @@
+"""
+Load generator for the API, on the in-process fake Neo4j driver.
+
+Drives an endpoint at fixed concurrency levels and reports p50/p95/p99
+latency, requests/s and errors per level. Targets:
+
+    inprocess  Flask test client, no sockets (app + driver cost only)
+    http       the app on a local threaded werkzeug server, real HTTP
+    server     the unified server (server.py: static assets + API), real HTTP
+    --url      an already running server (e.g. another server mode); the fake
+               driver only applies to servers started by this process
+
+Usage:
+    python -m benchmarks.load --fixture web:10000 --latency 0.005 --concurrency 1 4 16
+    python -m benchmarks.load --fixture snapshot/ --target http --path /api/search?q=nickel
+    python -m benchmarks.load --url http://localhost:5000/api/data --concurrency 8
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from .fake_neo4j import fake_driver, load_fixture
+
+logger = logging.getLogger(__name__)
+
+
+def run_load(request, concurrency: int, requests: int = None, duration: float = None) -> dict:
+    """
+    Call request() from `concurrency` threads, either `requests` times in total
+    or for `duration` seconds. request() returns the response size in bytes and
+    raises on failure.
+    """
+    latencies, sizes, errors = [], [], []
+    lock = threading.Lock()
+    remaining = [requests if requests is not None else float("inf")]
+    deadline = time.perf_counter() + duration if duration else float("inf")
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0 or time.perf_counter() >= deadline:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                size = request()
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(size)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    result = {"concurrency": concurrency, "requests": len(latencies), "errors": len(errors),
+              "wall_s": round(wall, 4), "requests_per_s": round(len(latencies) / wall, 1) if wall else None}
+    if latencies:
+        ms = np.array(latencies) * 1000
+        result.update({
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "response_bytes": int(np.median(sizes))
+        })
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+# ========== ALVOS ==========
+
+def inprocess_request(path: str):
+    import api
+
+    local = threading.local()
+
+    def request():
+        # One test client per thread
+        if not hasattr(local, "client"):
+            local.client = api.app.test_client()
+        response = local.client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.data[:200]!r}")
+        return len(response.data)
+
+    return request
+
+
+def http_request(url: str):
+    def request():
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return len(response.read())
+
+    return request
+
+
+def serve_app(unified: bool = False) -> tuple:
+    """Start api.app (alone or behind server.py) on a free port; returns (server, base_url)."""
+    from werkzeug.serving import make_server
+
+    import api
+
+    if unified:
+        import server as unified_server
+
+        server = unified_server.create_server("127.0.0.1", 0, api.app)
+    else:
+        server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.port}"
+
+
+def load_test(path: str, levels: list, fixture: dict = None, latency: float = 0.0, row_latency: float = 0.0,
+              target: str = "inprocess", url: str = None, requests: int = 200, duration: float = None,
+              warmup: int = 5) -> list:
+    """run_load at each concurrency level; returns one result per level."""
+    if url:
+        request = http_request(url)
+        return [run_load(request, level, requests, duration) for level in levels]
+
+    results = []
+    with fake_driver(fixture, latency, row_latency):
+        server = None
+        if target in ("http", "server"):
+            server, base = serve_app(unified=target == "server")
+            request = http_request(base + path)
+        else:
+            request = inprocess_request(path)
+        try:
+            run_load(request, 1, warmup)
+            for level in levels:
+                result = run_load(request, level, requests, duration)
+                logger.info(f"🔥 c={level}: {result.get('requests_per_s')} req/s, "
+                            f"p50 {result.get('p50_ms')} ms, p99 {result.get('p99_ms')} ms, "
+                            f"{result['errors']} errors")
+                results.append(result)
+        finally:
+            if server:
+                server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Load-test the API against a fake Neo4j driver")
+    parser.add_argument("--fixture", default="web:1000", help="web:<n> or a graph.snapshot path")
+    parser.add_argument("--latency", type=float, default=0.0, help="injected seconds per Cypher statement")
+    parser.add_argument("--row-latency", type=float, default=0.0, help="injected seconds per returned record")
+    parser.add_argument("--path", default="/api/data")
+    parser.add_argument("--target", choices=["inprocess", "http", "server"], default="inprocess")
+    parser.add_argument("--url", help="load an already running server instead (no fake driver)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--duration", type=float, help="seconds per level (instead of --requests)")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    fixture = None if args.url else load_fixture(args.fixture)
+    results = load_test(args.path, args.concurrency, fixture, args.latency, args.row_latency, args.target,
+                        args.url, None if args.duration else args.requests, args.duration)
+    report = {
+        "params": {"fixture": None if args.url else args.fixture, "latency": args.latency,
+                   "row_latency": args.row_latency, "path": args.path,
+                   "target": "url" if args.url else args.target, "url": args.url},
+        "levels": results
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,361 @@
+"""
+End-to-end benchmark harness.
+
+Runs timed scenarios on synthetic data and writes machine-readable results
+(JSON) so runs can be compared. Scenarios:
+
+    web        synthetic knowledge-web generation
+    lineage    CSR lineage cache build + ancestors/descendants/topological order
+    search     search index build + query latency
+    pipeline   synthetic CSVs -> ingestion, cold/warm/one-file-changed stats runs
+    graph      load the web into Neo4j with UNWIND batches (migration-shaped writes)
+    api        /api/data latency and throughput (after `graph`)
+    migration  m001-m004 and the lineage index through migrate.py, per step
+
+The graph/api scenarios only run with --database, and they wipe that database.
+The migration scenario wipes and migrates --database when given; otherwise it
+runs against benchmarks.fake_neo4j, where every statement costs
+--fake-latency, so it measures round trips and client-side work.
+
+Usage:
+    python -m benchmarks.run --sizes 1000 10000 100000 --holes 2000 --intervals 500
+    python -m benchmarks.run --database bench --scenarios graph api --sizes 10000
+    python -m benchmarks.run --baseline benchmarks/results/previous.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from .synthetic import drillhole_project, knowledge_web
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+ALL_SCENARIOS = ["web", "lineage", "search", "pipeline", "graph", "api", "migration"]
+REGRESSION_RATIO = 1.2
+FAKE_LATENCY = 0.001    # seconds per statement against the fake driver
+
+
+def latency(fn, repeat: int) -> dict:
+    """Run fn repeat times; per-call latency percentiles in ms and calls/s."""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - started
+    samples = np.array(samples)
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "throughput_per_s": round(repeat / total, 1) if total else None
+    }
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    value = fn()
+    return value, round(time.perf_counter() - t0, 4)
+
+
+# ========== CENÁRIOS ==========
+
+def scenario_web(n: int, state: dict) -> dict:
+    web, seconds = timed(lambda: knowledge_web(n))
+    state["web"] = web
+    edges = sum(len(i["sources"]) for i in web["inferences"])
+    return {"generate_s": seconds, "inferences": n, "edges": edges}
+
+
+def _web(n: int, state: dict) -> dict:
+    if state.get("web") is None or len(state["web"]["inferences"]) != n:
+        state["web"] = knowledge_web(n)
+    return state["web"]
+
+
+def scenario_lineage(n: int, state: dict) -> dict:
+    from graph.lineage import LineageGraph
+
+    web = _web(n, state)
+    nodes = [(d["id"], True) for d in web["data_nodes"]] + [(i["id"], False) for i in web["inferences"]]
+    edges = [(s, i["id"]) for i in web["inferences"] for s in i["sources"]]
+    lineage = LineageGraph(client=None)
+    _, build = timed(lambda: lineage.build(nodes, edges))
+    last = web["inferences"][-1]["id"]
+    return {
+        "build_s": build,
+        "ancestors": latency(lambda: lineage.ancestors(last, kind="DataNode"), 50),
+        "descendants": latency(lambda: lineage.descendants("assay.elements.Ni"), 20),
+        "topological_order_s": timed(lineage.topological_order)[1]
+    }
+
+
+def scenario_search(n: int, state: dict) -> dict:
+    from graph.search import SearchIndex
+
+    web = _web(n, state)
+    index = SearchIndex()
+    documents = {i["id"]: i for i in web["inferences"]}
+    _, build = timed(lambda: index.sync(documents))
+    changed = dict(documents)
+    first = web["inferences"][0]["id"]
+    changed[first] = {**changed[first], "title": "Changed title"}
+    _, resync = timed(lambda: index.sync(changed))
+    return {
+        "build_s": build,
+        "resync_one_changed_s": resync,
+        "query_single_term": latency(lambda: index.search("variogram"), 200),
+        "query_prefix": latency(lambda: index.search("sapro"), 200),
+        "query_multi_term": latency(lambda: index.search("grade shell kriging"), 200),
+        "query_common_terms": latency(lambda: index.search("contact analysis"), 200),
+        "query_short_prefix": latency(lambda: index.search("sa"), 200)
+    }
+
+
+def scenario_pipeline(holes: int, intervals: int, workdir: str) -> dict:
+    from pipeline.runner import Pipeline
+
+    project = os.path.join(workdir, f"project_{holes}x{intervals}")
+    shutil.rmtree(project, ignore_errors=True)
+    rows, generate = timed(lambda: drillhole_project(project, holes, intervals))
+    pipeline = Pipeline(project)
+    _, ingest = timed(pipeline.ingest)
+    _, cold = timed(pipeline.run)
+    _, warm = timed(pipeline.run)
+    with open(os.path.join(project, "assay_0.csv"), "a") as f:
+        f.write("H0,9999,10000,1.5,40,12,SAP\n")
+    _, one_changed = timed(pipeline.run)
+    _, read_columns = timed(lambda: pipeline.store.read("assay", ["NI"]))
+    return {
+        "intervals": rows["assay"],
+        "generate_s": generate,
+        "ingest_s": ingest,
+        "stats_cold_s": cold,
+        "stats_warm_s": warm,
+        "stats_one_file_changed_s": one_changed,
+        "columnar_read_ni_s": read_columns
+    }
+
+
+def scenario_graph(n: int, state: dict, database: str) -> dict:
+    from graph.client import GraphClient
+    from graph.snapshot import clear
+
+    web = _web(n, state)
+    batch = 5000
+    with GraphClient(database=database) as client:
+        _, wipe = timed(lambda: clear(client))
+        client.run_query("CREATE INDEX inference_id IF NOT EXISTS FOR (i:Inference) ON (i.id)")
+        client.run_query("CREATE INDEX datanode_id IF NOT EXISTS FOR (n:DataNode) ON (n.id)")
+        t0 = time.perf_counter()
+        client.run_query("UNWIND $rows AS row MERGE (n:DataNode {id: row.id}) SET n += row",
+                         {"rows": web["data_nodes"]})
+        rows = [{k: v for k, v in i.items() if k != "sources"} for i in web["inferences"]]
+        for start in range(0, len(rows), batch):
+            client.run_query("UNWIND $rows AS row MERGE (i:Inference {id: row.id}) SET i += row",
+                             {"rows": rows[start:start + batch]})
+        nodes = round(time.perf_counter() - t0, 4)
+        edges = [{"source": s, "target": i["id"]} for i in web["inferences"] for s in i["sources"]]
+        t0 = time.perf_counter()
+        for start in range(0, len(edges), batch):
+            client.run_query("""
+                UNWIND $rows AS row
+                MATCH (t:Inference {id: row.target})
+                OPTIONAL MATCH (d:DataNode {id: row.source})
+                OPTIONAL MATCH (s:Inference {id: row.source})
+                WITH t, coalesce(d, s) AS source
+                WHERE source IS NOT NULL
+                MERGE (source)-[:SUPPORTS]->(t)
+            """, {"rows": edges[start:start + batch]})
+        relationships = round(time.perf_counter() - t0, 4)
+    state["graph_loaded"] = n
+    return {"wipe_s": wipe, "nodes_s": nodes, "relationships_s": relationships, "edges": len(edges)}
+
+
+def scenario_api(n: int, state: dict, database: str, repeat: int = 20) -> dict:
+    if state.get("graph_loaded") != n:
+        scenario_graph(n, state, database)
+    os.environ["NEO4J_DATABASE"] = database
+    import api
+
+    client = api.app.test_client()
+    sizes = []
+
+    def fetch():
+        response = client.get("/api/data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/data returned {response.status_code}")
+        sizes.append(len(response.data))
+
+    result = latency(fetch, repeat)
+    result["response_bytes"] = sizes[-1] if sizes else None
+    return result
+
+
+def scenario_migration(state: dict, database: str = None, fake_latency: float = FAKE_LATENCY) -> dict:
+    import migrate
+
+    def steps() -> dict:
+        migrations = migrate.build_migrations(database)
+        result = {}
+        for migration in migrations:
+            _, result[f"m{migration.version}_s"] = timed(migration.migrate)
+        _, result["lineage_index_s"] = timed(lambda: migrate.update_lineage_index(database))
+        result["total_s"] = round(sum(result.values()), 4)
+        return result
+
+    if database:
+        from graph.client import GraphClient
+        from graph.snapshot import clear
+
+        with GraphClient(database=database) as client:
+            clear(client)
+        state["graph_loaded"] = None
+        result = steps()
+        _, result["startup_check_s"] = timed(lambda: migrate.migrate_if_pending(migrate.build_migrations(database)))
+        return result
+
+    from .fake_neo4j import fake_driver
+
+    empty = {"nodes": [], "relationships": [], "migrations": []}
+    with fake_driver(empty, latency=fake_latency, writes=True) as driver:
+        result = steps()
+    result["statements"] = driver.statements
+    result["fake_latency_s"] = fake_latency
+    return result
+
+
+# ========== EXECUÇÃO ==========
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+
+def run(scenarios: list, sizes: list, holes: int, intervals: int, database: str = None,
+        workdir: str = None, fake_latency: float = FAKE_LATENCY) -> dict:
+    results = {"meta": metadata(), "scenarios": []}
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_")
+
+    def record(name: str, params: dict, fn):
+        logger.info(f"⏱️  {name} {params}")
+        entry = {"name": name, "params": params}
+        try:
+            entry["metrics"] = fn()
+            entry["status"] = "ok"
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+            entry["status"] = "error"
+            entry["error"] = f"{type(e).__name__}: {e}"
+        results["scenarios"].append(entry)
+
+    state = {}
+    for n in sizes:
+        for name in scenarios:
+            if name in ("graph", "api") and not database:
+                continue
+            if name == "web":
+                record("web", {"inferences": n}, lambda: scenario_web(n, state))
+            elif name == "lineage":
+                record("lineage", {"inferences": n}, lambda: scenario_lineage(n, state))
+            elif name == "search":
+                record("search", {"inferences": n}, lambda: scenario_search(n, state))
+            elif name == "graph":
+                record("graph", {"inferences": n}, lambda: scenario_graph(n, state, database))
+            elif name == "api":
+                record("api", {"inferences": n}, lambda: scenario_api(n, state, database))
+    if "migration" in scenarios:
+        record("migration", {"target": database or "fake"},
+               lambda: scenario_migration(state, database, fake_latency))
+    if "pipeline" in scenarios:
+        record("pipeline", {"holes": holes, "intervals": intervals},
+               lambda: scenario_pipeline(holes, intervals, workdir))
+    return results
+
+
+def flatten(metrics: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, ratio: float = REGRESSION_RATIO) -> list:
+    """Timing metrics (*_s, *_ms) that got slower than ratio x baseline; throughput that dropped as much."""
+    def key(entry):
+        return entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+    previous = {key(e): flatten(e.get("metrics", {})) for e in baseline["scenarios"]}
+    regressions = []
+    for entry in results["scenarios"]:
+        before = previous.get(key(entry), {})
+        for metric, value in flatten(entry.get("metrics", {})).items():
+            old = before.get(metric)
+            if not old:
+                continue
+            if metric.endswith("_per_s"):
+                slower = value * ratio < old
+            else:
+                slower = metric.endswith(("_s", "_ms")) and value > ratio * old
+            if slower:
+                regressions.append({"scenario": entry["name"], "params": entry["params"], "metric": metric,
+                                    "baseline": old, "current": value, "ratio": round(value / old, 2)})
+    return regressions
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description="Run the synthetic benchmark suite")
+    parser.add_argument("--scenarios", nargs="+", default=["web", "lineage", "search", "pipeline", "migration"],
+                        choices=ALL_SCENARIOS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000],
+                        help="knowledge-web sizes (inferences), 10^3..10^6")
+    parser.add_argument("--holes", type=int, default=1000)
+    parser.add_argument("--intervals", type=int, default=200, help="assay intervals per hole")
+    parser.add_argument("--database", help="Neo4j database for graph/api scenarios (it is wiped!)")
+    parser.add_argument("--fake-latency", type=float, default=FAKE_LATENCY,
+                        help="seconds per statement for the migration scenario without --database")
+    parser.add_argument("--workdir", help="where synthetic projects are written (default: temp dir)")
+    parser.add_argument("--output", help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    results = run(args.scenarios, args.sizes, args.holes, args.intervals, args.database, args.workdir,
+                  args.fake_latency)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f))
+        for r in results["regressions"]:
+            logger.warning(f"📉 {r['scenario']} {r['params']} {r['metric']}: "
+                           f"{r['baseline']} -> {r['current']} (x{r['ratio']})")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"✨ Results written to {output}")
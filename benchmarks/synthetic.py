@@ -0,0 +1,109 @@
+"""
+Synthetic data at scale.
+
+- `knowledge_web(n)`: a DAG of n inferences shaped like m004's MOCK_NODES
+  (id, title, type, 1-4 sources drawn from the m001 DataNodes and earlier
+  inferences, JSON evidence/implications/recommendations).
+- `drillhole_project(dir, holes, intervals)`: collar/survey/assay/lith CSVs
+  with the columns the pipeline reads, assays split across several files.
+"""
+import json
+import os
+
+import numpy as np
+
+from migrations.m004_knowledge_web import KnowledgeWebMigration
+from pipeline.stages import DATA_NODE_COLUMNS
+
+DATA_NODE_IDS = list(DATA_NODE_COLUMNS)
+LITHOLOGIES = np.array(["SAP", "LAT", "LIM", "BR", "TRANS"])
+DRILL_TYPES = np.array(["DDH", "RC"])
+DIAMETERS = np.array(["HQ", "BQ", "NQ"])
+WRITE_ROWS = 250_000
+
+
+def knowledge_web(n: int, seed: int = 0) -> dict:
+    """{"data_nodes": [...], "inferences": [...]} with n inferences."""
+    rng = np.random.default_rng(seed)
+    templates = KnowledgeWebMigration.MOCK_NODES
+    # Source counts follow the MOCK_NODES mix (mostly 1-2, a few 3-4)
+    source_counts = np.array([len(node["sources"]) for node in templates])
+    ids = []
+    inferences = []
+    for i in range(n):
+        template = templates[i % len(templates)]
+        node_id = f"{template['id']}_{i}"
+        k = int(rng.choice(source_counts))
+        sources = set()
+        for _ in range(k):
+            # Half the sources are raw columns early on, then mostly recent inferences (deep DAG)
+            if not ids or rng.random() < max(0.1, 0.5 - i / max(n, 1)):
+                sources.add(DATA_NODE_IDS[rng.integers(len(DATA_NODE_IDS))])
+            else:
+                window = max(1, min(len(ids), 2000))
+                sources.add(ids[len(ids) - 1 - int(rng.integers(window))])
+        sources = sorted(sources)
+        inferences.append({
+            "id": node_id,
+            "title": f"{template['title']} #{i}",
+            "type": template["type"],
+            "sources": sources,
+            "evidence": json.dumps({"input": f"Analysis based on {', '.join(sources)}"}),
+            "implications": json.dumps(["Part of resource estimation workflow"]),
+            "recommendations": json.dumps(["Review in context of project geology"]),
+            "metadata": json.dumps({"mock_node": True, "category": "synthetic"})
+        })
+        ids.append(node_id)
+    data_nodes = [{"id": node_id, "title": node_id.split(".")[-1], "type": "data"} for node_id in DATA_NODE_IDS]
+    return {"data_nodes": data_nodes, "inferences": inferences}
+
+
+# ========== CSVs ==========
+
+def _write_csv(path: str, header: list, columns: list):
+    """Write equally long columns (arrays of str/float) in blocks."""
+    rows = len(columns[0])
+    with open(path, "w") as f:
+        f.write(",".join(header) + "\n")
+        for start in range(0, rows, WRITE_ROWS):
+            block = [
+                c[start:start + WRITE_ROWS].astype(str) if c.dtype.kind in "US"
+                else np.char.mod("%.4g", c[start:start + WRITE_ROWS])
+                for c in columns
+            ]
+            f.write("\n".join(",".join(row) for row in zip(*block)) + "\n")
+
+
+def drillhole_project(directory: str, holes: int = 1000, intervals: int = 100, assay_files: int = 4,
+                      seed: int = 0) -> dict:
+    """Write a synthetic project; returns row counts per table."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    bhid = np.char.add("H", np.arange(holes).astype(str))
+    depth = intervals * 1.0
+
+    _write_csv(os.path.join(directory, "collar.csv"),
+               ["BHID", "XCOLLAR", "YCOLLAR", "ZCOLLAR", "DEPTH", "DTYPE", "DIAM"],
+               [bhid, 345000 + rng.uniform(0, 2000, holes), 7345000 + rng.uniform(0, 2000, holes),
+                rng.normal(1250, 15, holes), np.full(holes, depth),
+                DRILL_TYPES[rng.integers(2, size=holes)], DIAMETERS[rng.integers(3, size=holes)]])
+    _write_csv(os.path.join(directory, "survey.csv"), ["BHID", "AT", "DIP", "BRG"],
+               [bhid, np.zeros(holes), rng.uniform(-90, -60, holes), rng.uniform(0, 360, holes)])
+
+    hole_of = np.repeat(np.arange(holes), intervals)
+    top = np.tile(np.arange(intervals, dtype=np.float64), holes)
+    n = len(hole_of)
+    # Lateritic profile: Ni enriched in saprolite, lognormal nugget
+    lith_index = np.minimum((top / depth * len(LITHOLOGIES)).astype(int), len(LITHOLOGIES) - 1)
+    ni = rng.lognormal(np.log(0.8) + 0.4 * (lith_index == 0), 0.6)
+    si = rng.normal(40, 6, n) - 5 * ni
+    mg = rng.normal(12, 4, n) + 2 * lith_index
+    bounds = np.linspace(0, holes, assay_files + 1).astype(int)
+    for k in range(assay_files):
+        rows = (hole_of >= bounds[k]) & (hole_of < bounds[k + 1])
+        _write_csv(os.path.join(directory, f"assay_{k}.csv"), ["BHID", "FROM", "TO", "NI", "SI", "MG", "LITO"],
+                   [bhid[hole_of[rows]], top[rows], top[rows] + 1, ni[rows], si[rows], mg[rows],
+                    LITHOLOGIES[lith_index[rows]]])
+    _write_csv(os.path.join(directory, "lith.csv"), ["BHID", "FROM", "TO", "LITO"],
+               [bhid[hole_of], top, top + 1, LITHOLOGIES[lith_index]])
+    return {"collar": holes, "survey": holes, "assay": n, "lithology": n}
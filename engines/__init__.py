@@ -0,0 +1,3 @@
+"""
+Numerical engines behind the resource estimation workflow nodes.
+"""
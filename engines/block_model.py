@@ -0,0 +1,342 @@
+"""
+Chunked, memory-mapped block model store.
+
+Implements `build_block_model`, `parent_cell_size` and `subcell_size`. Each
+attribute (grade, variance, domain, density) is a fixed-size `.npy` memmap laid
+out tile-major, shape (n_tiles, tx, ty, tz), so one spatial tile is one
+contiguous region on disk. Callers read and write whole tiles and never load
+the full model. Parent cells that straddle a domain contact can be split into
+sub-cells, which are stored in separate memmaps indexed by parent cell.
+
+Layout:
+    model_dir/
+        model.json           # grid definition and attribute dtypes
+        grade.npy ...        # one tile-major memmap per attribute
+        sub_index.npy        # sorted flat ids of sub-blocked parents
+        sub_grade.npy ...    # (n_parents, n_subcells) per attribute
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "model.json"
+
+# ========== ATRIBUTOS PADRÃO ==========
+DEFAULT_ATTRIBUTES = {
+    "grade": "float32",
+    "variance": "float32",
+    "domain": "int16",
+    "density": "float32"
+}
+DEFAULT_TILE_SHAPE = (32, 32, 16)
+SUB_CHUNK_ROWS = 65536     # sub-block rows copied at a time when the store is rewritten
+
+
+def _fill_value(dtype: str):
+    return np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+
+
+class BlockModel:
+    """Regular parent-cell grid stored as tile-major memmaps."""
+
+    def __init__(self, path: str, manifest: dict, mode: str = "r+"):
+        self.path = path
+        self.manifest = manifest
+        self.mode = mode
+        self.origin = np.asarray(manifest["origin"], dtype=np.float64)
+        self.cell_size = np.asarray(manifest["parent_cell_size"], dtype=np.float64)
+        self.dims = tuple(manifest["dims"])
+        self.tile_shape = tuple(manifest["tile_shape"])
+        self.tile_grid = tuple(-(-d // t) for d, t in zip(self.dims, self.tile_shape))
+        self.n_tiles = int(np.prod(self.tile_grid))
+        self.attributes = manifest["attributes"]
+        self.subcell_size = manifest.get("subcell_size")
+        self._arrays = {}
+        self._sub = None
+
+    # ========== CRIAÇÃO / ABERTURA ==========
+
+    @classmethod
+    def create(cls, path: str, origin, parent_cell_size, dims, tile_shape=DEFAULT_TILE_SHAPE,
+               subcell_size=None, attributes: dict = None) -> "BlockModel":
+        """Create an empty model; every attribute starts at NaN (floats) or 0 (ints)."""
+        if subcell_size is not None:
+            ratio = np.asarray(parent_cell_size, dtype=np.float64) / np.asarray(subcell_size, dtype=np.float64)
+            if not np.allclose(ratio, np.round(ratio)) or np.any(ratio < 1):
+                raise ValueError("parent_cell_size must be a whole multiple of subcell_size")
+
+        os.makedirs(path, exist_ok=True)
+        manifest = {
+            "origin": [float(v) for v in origin],
+            "parent_cell_size": [float(v) for v in parent_cell_size],
+            "dims": [int(v) for v in dims],
+            "tile_shape": [int(v) for v in tile_shape],
+            "subcell_size": [float(v) for v in subcell_size] if subcell_size is not None else None,
+            "attributes": dict(attributes or DEFAULT_ATTRIBUTES)
+        }
+        with open(os.path.join(path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        model = cls(path, manifest)
+        shape = (model.n_tiles, *model.tile_shape)
+        for name, dtype in model.attributes.items():
+            array = np.lib.format.open_memmap(model._file(name), mode="w+", dtype=dtype, shape=shape)
+            array[:] = _fill_value(dtype)
+            array.flush()
+            del array
+        logger.info(f"Created block model {path}: {np.prod(model.dims)} cells in {model.n_tiles} tiles")
+        return model
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r+") -> "BlockModel":
+        with open(os.path.join(path, MANIFEST)) as f:
+            return cls(path, json.load(f), mode)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.npy")
+
+    def array(self, name: str) -> np.memmap:
+        """Lazily opened memmap for one attribute; nothing is read until sliced."""
+        if name not in self._arrays:
+            if name not in self.attributes:
+                raise KeyError(f"Unknown block model attribute '{name}'")
+            self._arrays[name] = np.load(self._file(name), mmap_mode=self.mode)
+        return self._arrays[name]
+
+    def fingerprint(self) -> str:
+        """
+        Cheap content hash of the model: manifest plus size and mtime of every
+        attribute file. Any tile write that is flushed changes it.
+        """
+        digest = hashlib.sha1(json.dumps(self.manifest, sort_keys=True).encode())
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.path, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    def flush(self):
+        for array in self._arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def close(self):
+        self.flush()
+        self._arrays.clear()
+        self._sub = None
+
+    # ========== GEOMETRIA DOS TILES ==========
+
+    def tiles(self):
+        return range(self.n_tiles)
+
+    def tile_origin(self, tile_id: int) -> tuple:
+        """Parent-cell index (i, j, k) of the tile's first cell."""
+        ti, tj, tk = np.unravel_index(tile_id, self.tile_grid)
+        return int(ti) * self.tile_shape[0], int(tj) * self.tile_shape[1], int(tk) * self.tile_shape[2]
+
+    def tile_extent(self, tile_id: int) -> tuple:
+        """Number of valid cells along each axis (edge tiles are padded)."""
+        start = self.tile_origin(tile_id)
+        return tuple(min(t, d - s) for t, d, s in zip(self.tile_shape, self.dims, start))
+
+    def tile_cell_indices(self, tile_id: int) -> np.ndarray:
+        """(n, 3) parent-cell indices of the valid cells in a tile, C order."""
+        start = self.tile_origin(tile_id)
+        axes = [np.arange(s, s + n) for s, n in zip(start, self.tile_extent(tile_id))]
+        grid = np.meshgrid(*axes, indexing="ij")
+        return np.stack([g.ravel() for g in grid], axis=1)
+
+    def tile_centres(self, tile_id: int) -> np.ndarray:
+        return self.origin + (self.tile_cell_indices(tile_id) + 0.5) * self.cell_size
+
+    def tiles_in_box(self, min_xyz, max_xyz) -> list:
+        """Tiles intersecting an axis-aligned box in world coordinates."""
+        lo = np.floor((np.asarray(min_xyz) - self.origin) / self.cell_size).astype(int)
+        hi = np.floor((np.asarray(max_xyz) - self.origin) / self.cell_size).astype(int)
+        lo = np.clip(lo, 0, np.asarray(self.dims) - 1) // self.tile_shape
+        hi = np.clip(hi, 0, np.asarray(self.dims) - 1) // self.tile_shape
+        ranges = [np.arange(a, b + 1) for a, b in zip(lo, hi)]
+        grid = np.meshgrid(*ranges, indexing="ij")
+        return [int(t) for t in np.ravel_multi_index([g.ravel() for g in grid], self.tile_grid)]
+
+    def flat_index(self, cell_indices: np.ndarray) -> np.ndarray:
+        """Global flat parent-cell id for (n, 3) cell indices."""
+        return np.ravel_multi_index(tuple(cell_indices.T), self.dims)
+
+    # ========== LEITURA / ESCRITA ==========
+
+    def read_tile(self, tile_id: int, attributes=None) -> dict:
+        """Valid cells of one tile, per attribute, as (nx, ny, nz) in-memory arrays."""
+        nx, ny, nz = self.tile_extent(tile_id)
+        return {
+            name: np.array(self.array(name)[tile_id, :nx, :ny, :nz])
+            for name in (attributes or self.attributes)
+        }
+
+    def write_tile(self, tile_id: int, **arrays):
+        """Write attributes for the valid cells of one tile; arrays may be flat."""
+        extent = self.tile_extent(tile_id)
+        nx, ny, nz = extent
+        for name, values in arrays.items():
+            self.array(name)[tile_id, :nx, :ny, :nz] = np.asarray(values).reshape(extent)
+
+    # ========== SUB-BLOCOS ==========
+
+    @property
+    def subcells_per_parent(self) -> tuple:
+        if self.subcell_size is None:
+            raise ValueError("Block model was created without subcell_size")
+        return tuple(int(round(p / s)) for p, s in zip(self.cell_size, self.subcell_size))
+
+    def subcell_offsets(self) -> np.ndarray:
+        """Sub-cell centre offsets from the parent cell corner."""
+        counts = self.subcells_per_parent
+        axes = [(np.arange(n) + 0.5) * s for n, s in zip(counts, self.subcell_size)]
+        grid = np.meshgrid(*axes, indexing="ij")
+        return np.stack([g.ravel() for g in grid], axis=1)
+
+    def build_subblocks(self, domain_fn, tiles=None):
+        """
+        Split parent cells that straddle a domain contact.
+
+        domain_fn maps (n, 3) points to integer domain codes. Every tile is
+        evaluated at its sub-cell centres; parents with more than one domain
+        keep their sub-cell domains, and the parent takes the majority domain.
+        With `tiles`, only those tiles are rebuilt: sub-blocks of the other
+        tiles (and their estimates) are kept.
+        """
+        offsets = self.subcell_offsets()
+        n_sub = len(offsets)
+        rebuilt, contact_ids, contact_domains = [], [], []
+
+        for tile_id in (tiles if tiles is not None else self.tiles()):
+            cells = self.tile_cell_indices(tile_id)
+            corners = self.origin + cells * self.cell_size
+            points = (corners[:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+            domains = np.asarray(domain_fn(points)).astype(self.attributes["domain"]).reshape(-1, n_sub)
+
+            first = domains[:, :1]
+            contact = np.any(domains != first, axis=1)
+            parent_domain = first[:, 0].copy()
+            if contact.any():
+                parent_domain[contact] = self._majority(domains[contact])
+            self.write_tile(tile_id, domain=parent_domain)
+
+            if tiles is not None:
+                rebuilt.append(self.flat_index(cells))
+            if contact.any():
+                contact_ids.append(self.flat_index(cells[contact]))
+                contact_domains.append(domains[contact])
+
+        ids = np.concatenate(contact_ids) if contact_ids else np.empty(0, dtype=np.int64)
+        sub_domains = np.concatenate(contact_domains) if contact_domains else np.empty((0, n_sub))
+        self._write_subblocks(ids, sub_domains, np.concatenate(rebuilt) if tiles is not None else None)
+        self.flush()
+        logger.info(f"Sub-blocked {len(ids)} contact parent cells ({n_sub} sub-cells each)")
+
+    @staticmethod
+    def _majority(domains: np.ndarray) -> np.ndarray:
+        """Most frequent code per row (lowest code on ties), with one bincount."""
+        low = domains.min()
+        codes = (domains - low).astype(np.int64)
+        width = int(codes.max()) + 1
+        rows = np.repeat(np.arange(len(codes)), codes.shape[1])
+        counts = np.bincount(rows * width + codes.ravel(), minlength=len(codes) * width).reshape(-1, width)
+        return (counts.argmax(axis=1) + low).astype(domains.dtype)
+
+    def _write_subblocks(self, ids: np.ndarray, sub_domains: np.ndarray, rebuilt: np.ndarray = None):
+        """
+        Store sub-blocks for `ids`. With `rebuilt` (flat ids of the parents
+        that were re-evaluated), existing rows outside it are kept with all
+        their attributes; otherwise the whole sub-block store is replaced.
+
+        When the rebuilt tiles keep the same contact parents their rows are
+        patched in place. Otherwise each attribute is rewritten into a new file,
+        copying the kept rows SUB_CHUNK_ROWS at a time, so only the parent index
+        is ever held in memory.
+        """
+        n_sub = sub_domains.shape[1] if sub_domains.ndim == 2 else len(self.subcell_offsets())
+        order = np.argsort(ids, kind="stable")
+        ids, sub_domains = ids.astype(np.int64)[order], sub_domains[order]
+        state = self._subblock_state() if rebuilt is not None else {"index": np.empty(0, dtype=np.int64)}
+        keep = ~np.isin(state["index"], rebuilt) if rebuilt is not None else np.zeros(0, dtype=bool)
+
+        if rebuilt is not None and state["arrays"] and np.array_equal(state["index"][~keep], ids):
+            slots = np.flatnonzero(~keep)
+            if not len(slots):
+                return
+            self.write_subblocks(slots, **{
+                name: sub_domains if name == "domain" else np.full((len(ids), n_sub), _fill_value(dtype))
+                for name, dtype in self.attributes.items()
+            })
+            for name in self.attributes:
+                state["arrays"][name].flush()
+            return
+
+        kept_slots = np.flatnonzero(keep)
+        all_ids = np.concatenate([state["index"][kept_slots], ids])
+        position = np.empty(len(all_ids), dtype=np.int64)
+        position[np.argsort(all_ids, kind="stable")] = np.arange(len(all_ids))
+        kept_position, new_position = position[:len(kept_slots)], position[len(kept_slots):]
+
+        for name, dtype in self.attributes.items():
+            array = np.lib.format.open_memmap(self._file(f"sub_{name}.tmp"), mode="w+", dtype=dtype,
+                                              shape=(len(all_ids), n_sub))
+            old = state.get("arrays", {}).get(name)
+            for start in range(0, len(kept_slots), SUB_CHUNK_ROWS):
+                chunk = slice(start, start + SUB_CHUNK_ROWS)
+                array[kept_position[chunk]] = old[kept_slots[chunk]]
+            array[new_position] = sub_domains.astype(dtype) if name == "domain" else _fill_value(dtype)
+            array.flush()
+            del array, old
+
+        # Old memmaps must be released before their files are replaced
+        self._sub, state = None, None
+        for name in self.attributes:
+            os.replace(self._file(f"sub_{name}.tmp"), self._file(f"sub_{name}"))
+        np.save(self._file("sub_index.tmp"), np.sort(all_ids))
+        os.replace(self._file("sub_index.tmp"), self._file("sub_index"))
+
+    def _subblock_state(self):
+        if self._sub is None:
+            index_file = os.path.join(self.path, "sub_index.npy")
+            if not os.path.exists(index_file):
+                self._sub = {"index": np.empty(0, dtype=np.int64), "arrays": {}}
+            else:
+                self._sub = {
+                    "index": np.load(index_file),
+                    "arrays": {name: np.load(self._file(f"sub_{name}"), mmap_mode=self.mode)
+                               for name in self.attributes}
+                }
+        return self._sub
+
+    def tile_subblocks(self, tile_id: int):
+        """Slots and parent ids of the sub-blocked cells within a tile."""
+        index = self._subblock_state()["index"]
+        parents = self.flat_index(self.tile_cell_indices(tile_id))
+        lo, hi = parents.min(), parents.max()
+        # Tile cells are not contiguous in flat ids, so narrow by range then test
+        window = np.arange(np.searchsorted(index, lo), np.searchsorted(index, hi, side="right"))
+        slots = window[np.isin(index[window], parents)]
+        return slots, index[slots]
+
+    def subblock_centres(self, parent_ids: np.ndarray) -> np.ndarray:
+        """(n_parents, n_subcells, 3) sub-cell centres for flat parent ids."""
+        cells = np.stack(np.unravel_index(parent_ids, self.dims), axis=1)
+        corners = self.origin + cells * self.cell_size
+        return corners[:, None, :] + self.subcell_offsets()[None, :, :]
+
+    def read_subblocks(self, slots: np.ndarray, attributes=None) -> dict:
+        arrays = self._subblock_state()["arrays"]
+        return {name: np.array(arrays[name][slots]) for name in (attributes or self.attributes)}
+
+    def write_subblocks(self, slots: np.ndarray, **arrays):
+        state = self._subblock_state()["arrays"]
+        for name, values in arrays.items():
+            state[name][slots] = np.asarray(values).reshape(len(slots), -1)
@@ -0,0 +1,137 @@
+"""
+Streaming per-domain capping and outlier analysis.
+
+Backs `capping`, `outlier_detection` (3σ rule) and `cap_value_selection`
+(99th percentile). Assay chunks update, per domain, a mergeable quantile
+sketch and running moments, so memory stays bounded regardless of the
+population size. Files can be processed in parallel and their partial
+states merged. Cap proposals include the metal lost by capping.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+
+from .sketches import QuantileSketch, RunningMoments
+from .tables import iter_csv_chunks
+
+logger = logging.getLogger(__name__)
+
+ALL_DOMAINS = None     # key of the all-domains row; domain names are strings, so none collides with it
+DEFAULT_CANDIDATES = (95.0, 97.5, 99.0, 99.5, 99.9)
+
+
+class CappingEngine:
+    """Per-domain streaming statistics for grade capping."""
+
+    def __init__(self, relative_accuracy: float = 0.005):
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+        self.moments = {}
+
+    def _domain(self, domain: str):
+        if domain not in self.sketches:
+            self.sketches[domain] = QuantileSketch(self.relative_accuracy)
+            self.moments[domain] = RunningMoments()
+        return self.sketches[domain], self.moments[domain]
+
+    def update(self, values, domains=None, weights=None):
+        """Add one chunk of assays; weights are usually sample lengths."""
+        values = np.asarray(values, dtype=np.float64)
+        weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        if domains is None:
+            groups = [(ALL_DOMAINS, slice(None))]
+        else:
+            domains = np.asarray(domains).astype(str)
+            names, inverse = np.unique(domains, return_inverse=True)
+            groups = [(name, inverse == i) for i, name in enumerate(names)]
+
+        for name, mask in groups:
+            sketch, moments = self._domain(name if name is ALL_DOMAINS else str(name))
+            w = None if weights is None else weights[mask]
+            sketch.update(values[mask], w)
+            moments.update(values[mask], w)
+        return self
+
+    def merge(self, other: "CappingEngine"):
+        for name in other.sketches:
+            sketch, moments = self._domain(name)
+            sketch.merge(other.sketches[name])
+            moments.merge(other.moments[name])
+        return self
+
+    def _combined(self):
+        sketch, moments = QuantileSketch(self.relative_accuracy), RunningMoments()
+        for name in self.sketches:
+            sketch.merge(self.sketches[name])
+            moments.merge(self.moments[name])
+        return sketch, moments
+
+    def propose(self, percentile: float = 99.0, candidates=DEFAULT_CANDIDATES) -> dict:
+        """Cap proposal and candidate table per domain, plus the all-domains row under ALL_DOMAINS."""
+        results = {}
+        states = {name: (self.sketches[name], self.moments[name]) for name in self.sketches
+                  if name is not ALL_DOMAINS}
+        if self.sketches:
+            states[ALL_DOMAINS] = self._combined()
+
+        for name, (sketch, moments) in states.items():
+            metal = sketch.sum
+            threshold = moments.mean + 3 * moments.std
+
+            def impact(cap):
+                loss = sketch.excess_above(cap)
+                return {
+                    "cap": cap,
+                    "metal_loss_pct": 100.0 * loss / metal if metal else 0.0,
+                    "weight_capped": sketch.weight_above(cap),
+                    "capped_mean": (metal - loss) / moments.weight if moments.weight else float("nan")
+                }
+
+            proposal = impact(sketch.quantile(percentile / 100.0))
+            results[name] = {
+                "count": moments.count,
+                "mean": moments.mean,
+                "std": moments.std,
+                "cv": moments.cv,
+                "min": moments.min,
+                "max": moments.max,
+                "outlier_threshold_3sigma": threshold,
+                "outliers_3sigma": sketch.weight_above(threshold),
+                "percentile": percentile,
+                **proposal,
+                "candidates": [{"percentile": p, **impact(sketch.quantile(p / 100.0))} for p in candidates]
+            }
+        return results
+
+    # ========== ARQUIVOS ==========
+
+    @classmethod
+    def from_csv(cls, path: str, value_column: str, domain_column: str = None, weight_column: str = None,
+                 relative_accuracy: float = 0.005) -> "CappingEngine":
+        engine = cls(relative_accuracy)
+        columns = [c for c in (value_column, domain_column, weight_column) if c]
+        numeric = [c for c in (value_column, weight_column) if c]
+        for chunk in iter_csv_chunks(path, columns, numeric):
+            engine.update(chunk[value_column],
+                          chunk[domain_column] if domain_column else None,
+                          chunk[weight_column] if weight_column else None)
+        return engine
+
+    @classmethod
+    def from_files(cls, paths: list, value_column: str, domain_column: str = None, weight_column: str = None,
+                   relative_accuracy: float = 0.005, workers: int = None) -> "CappingEngine":
+        """One worker per file; partial sketches are merged in the parent."""
+        workers = workers or os.cpu_count() or 1
+        args = (value_column, domain_column, weight_column, relative_accuracy)
+        engine = cls(relative_accuracy)
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                engine.merge(cls.from_csv(path, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for partial in pool.map(cls.from_csv, paths, *[[a] * len(paths) for a in args]):
+                    engine.merge(partial)
+        logger.info(f"Capping statistics from {len(paths)} files, {len(engine.sketches)} domains")
+        return engine
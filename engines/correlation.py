@@ -0,0 +1,102 @@
+"""
+Streaming element correlation and covariance matrices.
+
+Backs `correlation_ni_si`, `correlation_ni_mg`, `alteration_mapping` and
+`geochemical_vectors`. Every assay chunk updates a pairwise-complete,
+mergeable covariance accumulator globally and per domain; files are processed
+in parallel and the partial accumulators merged. Chunks cost a few matrix
+products, so 50+ element columns over very long tables stay cheap.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+
+from .capping import ALL_DOMAINS
+from .sketches import CovarianceAccumulator
+from .tables import iter_csv_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class CorrelationEngine:
+    """Correlation/covariance of element columns, per domain and overall."""
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.accumulators = {}
+
+    def _accumulator(self, domain: str) -> CovarianceAccumulator:
+        if domain not in self.accumulators:
+            self.accumulators[domain] = CovarianceAccumulator(len(self.columns))
+        return self.accumulators[domain]
+
+    def update(self, values, domains=None):
+        """Add a chunk: values is (rows, len(columns)), NaN where missing."""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        self._accumulator(ALL_DOMAINS).update(values)
+        if domains is not None:
+            domains = np.asarray(domains).astype(str)
+            names, inverse = np.unique(domains, return_inverse=True)
+            for i, name in enumerate(names):
+                self._accumulator(str(name)).update(values[inverse == i])
+        return self
+
+    def merge(self, other: "CorrelationEngine"):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge correlation engines over different columns")
+        for domain, accumulator in other.accumulators.items():
+            self._accumulator(domain).merge(accumulator)
+        return self
+
+    def result(self, domain: str = ALL_DOMAINS) -> dict:
+        accumulator = self.accumulators.get(domain)
+        if accumulator is None:
+            raise KeyError(f"No data for domain '{domain}'")
+        return {
+            "columns": self.columns,
+            "count": np.diag(accumulator.n).astype(np.int64),
+            "mean": np.diag(accumulator.mean).copy(),
+            "pair_count": accumulator.n.astype(np.int64),
+            "covariance": accumulator.covariance(),
+            "correlation": accumulator.correlation()
+        }
+
+    def pair(self, a: str, b: str, domain: str = ALL_DOMAINS) -> float:
+        """Correlation between two element columns, e.g. pair('Ni', 'Si')."""
+        i, j = self.columns.index(a), self.columns.index(b)
+        return float(self.accumulators[domain].correlation()[i, j])
+
+    @property
+    def domains(self) -> list:
+        """Domain names with data; the all-domains accumulator is ALL_DOMAINS."""
+        return sorted(domain for domain in self.accumulators if domain is not ALL_DOMAINS)
+
+    # ========== ARQUIVOS ==========
+
+    @classmethod
+    def from_csv(cls, path: str, columns: list, domain_column: str = None) -> "CorrelationEngine":
+        engine = cls(columns)
+        wanted = columns + ([domain_column] if domain_column else [])
+        for chunk in iter_csv_chunks(path, wanted, numeric=columns):
+            values = np.column_stack([chunk[c] for c in columns])
+            engine.update(values, chunk[domain_column] if domain_column else None)
+        return engine
+
+    @classmethod
+    def from_files(cls, paths: list, columns: list, domain_column: str = None,
+                   workers: int = None) -> "CorrelationEngine":
+        """One worker per file; partial accumulators are merged in the parent."""
+        workers = workers or os.cpu_count() or 1
+        engine = cls(columns)
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                engine.merge(cls.from_csv(path, columns, domain_column))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for partial in pool.map(cls.from_csv, paths, [columns] * len(paths),
+                                        [domain_column] * len(paths)):
+                    engine.merge(partial)
+        logger.info(f"Correlation matrix over {len(columns)} columns from {len(paths)} files")
+        return engine
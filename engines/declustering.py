@@ -0,0 +1,109 @@
+"""
+Cell declustering weight optimizer for the `decluster_weights` node.
+
+For every cell size in a sweep, samples are binned into cells with integer
+arithmetic and cell occupancy is counted with `np.bincount`; weights are
+averaged over several origin offsets, as in GSLIB `declus`. Cell sizes are
+evaluated in parallel on a process pool, and the optimal size (minimum
+declustered mean for data clustered in high grades, maximum otherwise) gives
+the final weights.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Above this many candidate cells, compact keys with np.unique instead of bincount
+MAX_DENSE_CELLS = 50_000_000
+
+_coords = None
+_values = None
+
+
+def _init_worker(coords, values):
+    global _coords, _values
+    _coords = coords
+    _values = values
+
+
+def _cell_weights(cell_size: np.ndarray, n_offsets: int) -> np.ndarray:
+    """Declustering weights (mean 1) for one cell size, averaged over origin offsets."""
+    n = len(_values)
+    weights = np.zeros(n)
+    base = _coords - _coords.min(axis=0)
+
+    for k in range(n_offsets):
+        shifted = base + cell_size * (k / n_offsets)
+        index = np.floor(shifted / cell_size).astype(np.int64)
+        dims = index.max(axis=0) + 1
+        if np.prod(dims.astype(np.float64)) <= MAX_DENSE_CELLS:
+            keys = np.ravel_multi_index(tuple(index.T), tuple(dims))
+        else:
+            _, keys = np.unique(index, axis=0, return_inverse=True)
+            keys = keys.ravel()
+        occupancy = np.bincount(keys)
+        occupied = np.count_nonzero(occupancy)
+        weights += n / (occupied * occupancy[keys])
+
+    return weights / n_offsets
+
+
+def _declustered_mean(cell_size: np.ndarray, n_offsets: int) -> float:
+    weights = _cell_weights(cell_size, n_offsets)
+    return float(np.sum(weights * _values) / np.sum(weights))
+
+
+class DeclusteringEngine:
+    """Cell-size sweep for declustering weights."""
+
+    def __init__(self, coords, values, workers: int = None):
+        coords = np.asarray(coords, dtype=np.float64)
+        coords = coords.reshape(len(coords), -1)
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(values) & np.all(np.isfinite(coords), axis=1)
+        self.coords, self.values = np.ascontiguousarray(coords[valid]), values[valid]
+        self.valid = valid
+        self.workers = workers or os.cpu_count() or 1
+
+    def optimize(self, cell_sizes, anisotropy=None, n_offsets: int = 8, minimize: bool = True) -> dict:
+        """
+        Evaluate every cell size and return the optimal weights.
+
+        anisotropy scales the cell per axis (e.g. (1, 1, 0.1) for flat cells).
+        Returns {"cell_sizes", "declustered_means", "naive_mean", "best_cell_size",
+                 "best_mean", "weights"}; weights are aligned with the input
+        samples and NaN where a sample was invalid.
+        """
+        cell_sizes = np.asarray(cell_sizes, dtype=np.float64)
+        if np.any(cell_sizes <= 0):
+            raise ValueError("cell sizes must be positive")
+        ratio = np.ones(self.coords.shape[1]) if anisotropy is None else np.asarray(anisotropy, dtype=np.float64)
+        cells = [size * ratio for size in cell_sizes]
+
+        if self.workers <= 1 or len(cells) <= 1:
+            _init_worker(self.coords, self.values)
+            means = [_declustered_mean(cell, n_offsets) for cell in cells]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.coords, self.values)) as pool:
+                means = list(pool.map(_declustered_mean, cells, [n_offsets] * len(cells)))
+            _init_worker(self.coords, self.values)
+
+        means = np.asarray(means)
+        best = int(np.argmin(means) if minimize else np.argmax(means))
+        weights = np.full(len(self.valid), np.nan)
+        weights[self.valid] = _cell_weights(cells[best], n_offsets)
+
+        logger.info(f"Declustering: {len(self.values)} samples, {len(cells)} cell sizes, "
+                    f"best {cell_sizes[best]:.2f} (mean {means[best]:.4f})")
+        return {
+            "cell_sizes": cell_sizes,
+            "declustered_means": means,
+            "naive_mean": float(self.values.mean()) if len(self.values) else float("nan"),
+            "best_cell_size": float(cell_sizes[best]),
+            "best_mean": float(means[best]),
+            "weights": weights
+        }
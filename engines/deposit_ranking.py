@@ -0,0 +1,210 @@
+"""
+Incremental Bayesian ranking of nickel deposit types.
+
+Backs the `ranking` evidence of `ni_lateritico`. Each deposit type has a
+prior probability and a geochemical signature: for every element, the
+expected deposit-average log grade and how much that average varies between
+deposits of the type, plus the expected share of weathered-profile
+lithologies (SAP, LAT, ...). Samples scatter around their deposit's average
+with a within-deposit spread of the type (WITHIN_SIGMA unless the type
+overrides it), and each type names the codes it counts as weathered.
+
+Under that hierarchical model the evidence for a type depends on the data
+only through the moments of the log grades of its elements and its
+weathered / total lithology counts. These statistics are kept separately
+for each type (TypeStatistics), so an assay chunk costs one pass over its
+rows per type and the posterior is recomputed from a few numbers. Partial
+states merge, so files can be processed separately. Because the deposit average is itself
+uncertain, the evidence converges as samples accumulate instead of growing
+without bound: the ranking moves with the data (e.g. from Lateritic to
+Sulfide when deep drilling reaches fresh, sulfur-rich rock) without
+collapsing to 100% after the first few thousand assays.
+"""
+import math
+
+import numpy as np
+
+from .sketches import RunningMoments
+from .tables import iter_csv_chunks, read_header
+
+# Within-deposit standard deviation of ln(grade), per element
+WITHIN_SIGMA = {"NI": 0.6, "SI": 0.25, "MG": 0.5, "S": 1.0, "CU": 0.9, "CO": 0.7}
+
+WEATHERED_CODES = {"LAT", "SAP", "LIM", "FER", "FERR", "DUR", "CAP", "PED"}
+LITHOLOGY_COLUMN = "LITO"
+
+# Grades in wt% (SI and MG as the oxides). "signature": element ->
+# (typical deposit average, between-deposit sd of its ln); "weathered":
+# Beta(a, b) prior on the weathered-profile share of logged intervals.
+# Optional "within" (element -> within-deposit sd of ln(grade)) and
+# "weathered_codes" override WITHIN_SIGMA and WEATHERED_CODES for the type.
+DEPOSIT_TYPES = {
+    "lateritic_ni": {
+        "title": "Lateritic Ni",
+        "prior": 0.65,
+        "signature": {"NI": (1.2, 0.35), "SI": (40.0, 0.25), "MG": (12.0, 0.5),
+                      "S": (0.05, 0.7), "CU": (0.01, 0.6), "CO": (0.06, 0.5)},
+        "weathered": (8.0, 2.0)
+    },
+    "sulfide_ni": {
+        "title": "Sulfide Ni",
+        "prior": 0.20,
+        "signature": {"NI": (1.5, 0.5), "SI": (38.0, 0.2), "MG": (28.0, 0.3),
+                      "S": (4.0, 0.6), "CU": (0.12, 0.5), "CO": (0.04, 0.5)},
+        "weathered": (1.0, 6.0),
+        "weathered_codes": WEATHERED_CODES | {"GOS"}
+    },
+    "magmatic_ni_cu": {
+        "title": "Magmatic Ni-Cu",
+        "prior": 0.10,
+        "signature": {"NI": (0.8, 0.5), "SI": (46.0, 0.15), "MG": (10.0, 0.4),
+                      "S": (5.0, 0.6), "CU": (0.7, 0.5), "CO": (0.04, 0.5)},
+        "weathered": (1.0, 8.0),
+        "weathered_codes": WEATHERED_CODES | {"GOS"}
+    },
+    "hydrothermal_ni_co": {
+        "title": "Hydrothermal Ni-Co",
+        "prior": 0.05,
+        "signature": {"NI": (0.4, 0.6), "SI": (55.0, 0.25), "MG": (4.0, 0.7),
+                      "S": (2.0, 0.8), "CU": (0.1, 0.7), "CO": (0.15, 0.6)},
+        "weathered": (1.0, 5.0)
+    }
+}
+
+
+def _log_beta(a: float, b: float) -> float:
+    return math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)
+
+
+class TypeStatistics:
+    """Sufficient statistics of the assays seen so far, as one deposit type reads them."""
+
+    __slots__ = ("within", "codes", "moments", "weathered", "logged")
+
+    def __init__(self, spec: dict):
+        self.within = {e: spec.get("within", {}).get(e, WITHIN_SIGMA.get(e)) for e in spec["signature"]}
+        self.within = {e: sigma for e, sigma in self.within.items() if sigma}
+        self.codes = frozenset(spec.get("weathered_codes", WEATHERED_CODES))
+        self.moments = {e: RunningMoments() for e in sorted(self.within)}    # of ln(grade), grade > 0
+        self.weathered = 0
+        self.logged = 0                                                      # intervals with a lithology code
+
+    def update(self, logs: dict, codes=None):
+        """Add ln(grade) arrays per element and an array of upper-case lithology codes."""
+        for element, moments in self.moments.items():
+            if element in logs:
+                moments.update(logs[element])
+        if codes is not None:
+            self.logged += len(codes)
+            self.weathered += int(np.isin(codes, list(self.codes)).sum())
+        return self
+
+    def merge(self, other: "TypeStatistics", lithology: bool = True):
+        for element, moments in self.moments.items():
+            if element in other.moments:
+                moments.merge(other.moments[element])
+        if lithology:
+            self.weathered += other.weathered
+            self.logged += other.logged
+        return self
+
+    def log_evidence(self, spec: dict) -> float:
+        """ln p(data | type); the within-deposit scatter terms differ between types, so they are kept."""
+        total = 0.0
+        for element, (typical, tau) in spec["signature"].items():
+            moments = self.moments.get(element)
+            if moments is None or not moments.count:
+                continue
+            n = moments.count
+            sigma2, tau2 = self.within[element] ** 2, tau ** 2
+            spread = sigma2 + n * tau2
+            total += (-0.5 * n * math.log(2 * math.pi * sigma2) - moments.m2 / (2 * sigma2)
+                      + 0.5 * math.log(sigma2 / spread) - n * (moments.mean - math.log(typical)) ** 2 / (2 * spread))
+        if self.logged:
+            a, b = spec["weathered"]
+            total += _log_beta(a + self.weathered, b + self.logged - self.weathered) - _log_beta(a, b)
+        return total
+
+
+class DepositRanking:
+    """Per-type sufficient statistics of the assays seen so far and the deposit-type posterior."""
+
+    def __init__(self, types: dict = None):
+        self.types = types or DEPOSIT_TYPES
+        self.stats = {name: TypeStatistics(spec) for name, spec in self.types.items()}
+        self.elements = sorted({e for stats in self.stats.values() for e in stats.moments})
+
+    def update(self, chunk: dict):
+        """Add a chunk of {column: array}; element columns and LITO are optional."""
+        logs = {}
+        for element in self.elements:
+            if element not in chunk:
+                continue
+            values = np.asarray(chunk[element], dtype=np.float64)
+            logs[element] = np.log(values[np.isfinite(values) & (values > 0)])
+        codes = None
+        if LITHOLOGY_COLUMN in chunk:
+            codes = np.char.upper(np.asarray(chunk[LITHOLOGY_COLUMN]).astype(str))
+            codes = codes[codes != ""]
+        for stats in self.stats.values():
+            stats.update(logs, codes)
+        return self
+
+    def merge(self, other: "DepositRanking", lithology: bool = True):
+        for name, stats in self.stats.items():
+            if name in other.stats:
+                stats.merge(other.stats[name], lithology)
+        return self
+
+    @property
+    def samples(self) -> int:
+        return max((m.count for stats in self.stats.values() for m in stats.moments.values()), default=0)
+
+    @property
+    def logged(self) -> int:
+        return max((stats.logged for stats in self.stats.values()), default=0)
+
+    # ========== POSTERIOR ==========
+
+    def log_evidence(self, deposit_type: str) -> float:
+        """ln p(data | type), from that type's statistics."""
+        return self.stats[deposit_type].log_evidence(self.types[deposit_type])
+
+    def posterior(self) -> dict:
+        """Deposit type -> probability, highest first."""
+        names = list(self.types)
+        scores = np.array([math.log(self.types[name]["prior"]) + self.log_evidence(name) for name in names])
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        order = np.argsort(-probabilities, kind="stable")
+        return {names[i]: float(probabilities[i]) for i in order}
+
+    def ranking(self) -> str:
+        """The posterior in the format of the `ni_lateritico` evidence."""
+        return ", ".join(f"{self.types[name]['title']} ({100 * p:.0f}%)" for name, p in self.posterior().items())
+
+    def summary(self) -> dict:
+        posterior = self.posterior()
+        leader = self.stats[next(iter(posterior))]
+        return {
+            "ranking": self.ranking(),
+            "posterior": {name: round(p, 4) for name, p in posterior.items()},
+            "leader": self.types[next(iter(posterior))]["title"],
+            "samples": self.samples,
+            # As the leading type counts weathered codes
+            "weathered_share": round(leader.weathered / leader.logged, 3) if leader.logged else None
+        }
+
+    # ========== ARQUIVOS ==========
+
+    @classmethod
+    def from_csv(cls, path: str) -> "DepositRanking":
+        header = read_header(path)
+        ranking = cls()
+        numeric = [e for e in ranking.elements if e in header]
+        columns = numeric + ([LITHOLOGY_COLUMN] if LITHOLOGY_COLUMN in header else [])
+        if not columns:
+            return ranking
+        for chunk in iter_csv_chunks(path, columns, numeric=numeric):
+            ranking.update(chunk)
+        return ranking
@@ -0,0 +1,287 @@
+"""
+Per-hole downhole trend and contact engine.
+
+Backs `depth_grade_trend`, `trend_vertical`, `contact_analysis`,
+`contact_sap_lat` and `contact_lat_fresh`. Intervals are sorted once by
+(hole, FROM) and every per-hole quantity is a segmented reduction
+(`np.add.reduceat`) over the hole or lithology-run boundaries, so the cost
+is a handful of array passes regardless of the number of holes:
+
+    trends     length-weighted least squares of grade against mid-point
+               depth, per hole (slope, intercept, r²) plus the pooled
+               within-hole slope
+    contacts   one row per lithology change inside a hole, with the mean
+               grade of each side (optionally within a window of the
+               contact), the jump between them and the step between the
+               two adjacent intervals
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRESH_CODES = {"BR", "FR", "FRESH", "ROC", "ROCK", "BED", "BEDROCK", "UM", "SER"}
+WEATHERED_CODES = {"LAT", "LIM", "FER", "FERR", "DUR", "CAP", "PED"}
+
+# Contact groups reported for the inferences: (upper codes, lower codes), either order
+CONTACT_GROUPS = {
+    "sap_lat": ({"LAT"}, {"SAP"}),
+    "lat_fresh": (WEATHERED_CODES | {"SAP"}, FRESH_CODES)
+}
+
+
+def _nanmean(values: np.ndarray):
+    return float(np.nanmean(values)) if np.isfinite(values).any() else None
+
+
+def _segment_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    if not len(starts):
+        return np.zeros(0)
+    return np.add.reduceat(values, starts)
+
+
+def assign_lithology(hole, depth, lith_hole, lith_from, lith_to, lith_code) -> np.ndarray:
+    """
+    Lithology code at each (hole, depth) from a lithology interval table
+    ('' where no interval covers the depth). One sort and one searchsorted.
+    """
+    hole, lith_hole = np.asarray(hole).astype(str), np.asarray(lith_hole).astype(str)
+    lith_from, lith_to = np.asarray(lith_from, dtype=np.float64), np.asarray(lith_to, dtype=np.float64)
+    depth = np.asarray(depth, dtype=np.float64)
+    _, codes = np.unique(np.concatenate([hole, lith_hole]), return_inverse=True)
+    sample_code, lith_hole_code = codes[:len(hole)], codes[len(hole):]
+
+    # Holes laid end to end on one axis: hole k occupies [k * span, (k + 1) * span)
+    finite = np.concatenate([depth[np.isfinite(depth)], lith_to[np.isfinite(lith_to)], [0.0]])
+    span = float(np.abs(finite).max()) * 2 + 1
+    lith_key = lith_hole_code * span + lith_from
+    order = np.argsort(lith_key, kind="stable")
+    position = np.searchsorted(lith_key[order], sample_code * span + depth, side="right") - 1
+
+    result = np.full(len(hole), "", dtype=np.asarray(lith_code).astype(str).dtype)
+    found = position >= 0
+    index = order[np.maximum(position, 0)]
+    found &= (lith_hole_code[index] == sample_code) & (depth < lith_to[index])
+    result[found] = np.asarray(lith_code).astype(str)[index[found]]
+    return result
+
+
+class DownholeEngine:
+    """Hole-sorted interval arrays with segmented trend and contact analyses."""
+
+    def __init__(self, hole, depth_from, depth_to, grade, lithology=None):
+        hole = np.asarray(hole).astype(str)
+        depth_from = np.asarray(depth_from, dtype=np.float64)
+        depth_to = np.asarray(depth_to, dtype=np.float64)
+        keep = np.isfinite(depth_from) & np.isfinite(depth_to) & (depth_to > depth_from)
+        # Strings are compared once, in np.unique; the sort and run detection use integer codes
+        self.holes, hole_code = np.unique(hole[keep], return_inverse=True)
+        order = np.lexsort((depth_from[keep], hole_code))
+
+        self.hole_code = hole_code[order]
+        self.depth_from = depth_from[keep][order]
+        self.depth_to = depth_to[keep][order]
+        self.grade = np.asarray(grade, dtype=np.float64)[keep][order]
+        self.lithologies = self.lith_code = None
+        if lithology is not None:
+            names, code = np.unique(np.asarray(lithology).astype(str)[keep], return_inverse=True)
+            self.lithologies = np.char.upper(np.char.strip(names))
+            self.lith_code = code[order]
+
+        n = len(self.hole_code)
+        new_hole = np.ones(n, dtype=bool)
+        new_hole[1:] = self.hole_code[1:] != self.hole_code[:-1]
+        self.hole_starts = np.flatnonzero(new_hole)
+        logger.info(f"Downhole engine: {n} intervals in {len(self.holes)} holes")
+
+    @property
+    def length(self) -> np.ndarray:
+        return self.depth_to - self.depth_from
+
+    @property
+    def depth(self) -> np.ndarray:
+        return (self.depth_from + self.depth_to) / 2.0
+
+    # ========== TENDÊNCIA ==========
+
+    def trends(self, log: bool = False, min_samples: int = 3) -> dict:
+        """
+        Per-hole weighted regression of grade (or ln grade) on depth.
+
+        Arrays per hole: hole, samples, mean, slope (grade per metre),
+        intercept, r2, top, bottom; plus the pooled within-hole slope.
+        Holes with fewer than min_samples graded intervals get NaN coefficients.
+        """
+        y = self.grade.copy()
+        valid = np.isfinite(y) & ((y > 0) if log else True)
+        if log:
+            y[valid] = np.log(y[valid])
+        y[~valid] = 0.0
+        w = np.where(valid, self.length, 0.0)
+        x = self.depth
+        starts = self.hole_starts
+        sizes = np.diff(np.append(starts, len(x)))
+
+        weight = _segment_sum(w, starts)
+        samples = _segment_sum(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_x = _segment_sum(w * x, starts) / weight
+            mean_y = _segment_sum(w * y, starts) / weight
+            # Second pass on centred values: no cancellation for deep holes
+            dx = np.where(valid, x - np.repeat(mean_x, sizes), 0.0)
+            dy = np.where(valid, y - np.repeat(mean_y, sizes), 0.0)
+            sxx = _segment_sum(w * dx * dx, starts)
+            sxy = _segment_sum(w * dx * dy, starts)
+            syy = _segment_sum(w * dy * dy, starts)
+            fit = (samples >= min_samples) & (sxx > 0)
+            slope = np.where(fit, sxy / sxx, np.nan)
+            intercept = np.where(fit, mean_y - slope * mean_x, np.nan)
+            r2 = np.where(fit & (syy > 0), sxy ** 2 / (sxx * syy), np.nan)
+            pooled = float(sxy[fit].sum() / sxx[fit].sum()) if fit.any() else float("nan")
+            overall = float((w * y).sum() / w.sum()) if w.sum() else float("nan")
+
+        return {
+            "hole": self.holes,
+            "samples": samples,
+            "mean": mean_y,
+            "slope": slope,
+            "intercept": intercept,
+            "r2": r2,
+            "top": self.depth_from[starts] if len(starts) else np.zeros(0),
+            "bottom": np.maximum.reduceat(self.depth_to, starts) if len(starts) else np.zeros(0),
+            "pooled_slope": pooled,
+            "mean_grade": overall,
+            "log": log
+        }
+
+    @staticmethod
+    def trend_summary(trends: dict, interval: float = 50.0) -> dict:
+        """Evidence-sized summary: slope distribution and change per `interval` metres."""
+        slope = trends["slope"][np.isfinite(trends["slope"])]
+        pooled, mean = trends["pooled_slope"], trends["mean_grade"]
+        if trends["log"]:
+            change = 100.0 * (np.exp(pooled * interval) - 1.0)
+        else:
+            change = 100.0 * pooled * interval / mean if mean else float("nan")
+        return {
+            "holes": len(trends["hole"]),
+            "holes_fitted": len(slope),
+            "pooled_slope_per_m": pooled,
+            "median_slope_per_m": float(np.median(slope)) if len(slope) else None,
+            "decreasing_share": round(float((slope < 0).mean()), 3) if len(slope) else None,
+            f"change_pct_per_{interval:g}m": round(float(change), 2) if np.isfinite(change) else None,
+            "median_r2": float(np.nanmedian(trends["r2"])) if np.isfinite(trends["r2"]).any() else None
+        }
+
+    # ========== CONTATOS ==========
+
+    def contacts(self, window: float = None) -> dict:
+        """
+        Contact table: one row per change of lithology between consecutive
+        intervals of a hole (blank codes excluded).
+
+        Columns: hole, depth (top of the lower unit), above, below,
+        above_mean, below_mean (length-weighted grade of each unit, limited
+        to `window` metres from the contact when given), jump (below -
+        above), ratio, step (grade change between the two adjacent
+        intervals), gap (logging gap at the contact), above_thickness,
+        below_thickness; plus lithologies (upper-cased code names) and the
+        integer above_code, below_code and hole_code used for grouping.
+        """
+        if self.lith_code is None:
+            raise ValueError("Contact analysis needs a lithology column")
+        n = len(self.lith_code)
+        # Codes that differ only in case/whitespace are the same unit
+        _, canonical = np.unique(self.lithologies, return_inverse=True)
+        code = canonical[self.lith_code]
+        blank = np.flatnonzero(self.lithologies == "")
+        blank = canonical[blank[0]] if len(blank) else -1
+        new_run = np.zeros(n, dtype=bool)
+        new_run[self.hole_starts] = True
+        new_run[1:] |= code[1:] != code[:-1]
+        run_starts = np.flatnonzero(new_run)
+        run_ends = np.append(run_starts[1:], n) - 1
+        run_sizes = run_ends - run_starts + 1
+        run_of = np.repeat(np.arange(len(run_starts)), run_sizes)
+
+        top = self.depth_from[run_starts]
+        bottom = np.maximum.reduceat(self.depth_to, run_starts) if n else np.zeros(0)
+        graded = np.isfinite(self.grade)
+        grade = np.where(graded, self.grade, 0.0)
+        w = np.where(graded, self.length, 0.0)
+
+        # Each side only uses the part of its unit nearest the contact
+        if window is None:
+            near_bottom = near_top = np.ones(n, dtype=bool)
+        else:
+            near_bottom = bottom[run_of] - self.depth_from <= window
+            near_top = self.depth_to - top[run_of] <= window
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bottom_mean = (_segment_sum(w * grade * near_bottom, run_starts)
+                           / _segment_sum(w * near_bottom, run_starts))
+            top_mean = _segment_sum(w * grade * near_top, run_starts) / _segment_sum(w * near_top, run_starts)
+
+        run_hole = self.hole_code[run_starts]
+        run_code = code[run_starts]
+        names = np.unique(self.lithologies)
+        upper = np.arange(len(run_starts) - 1)
+        pairs = (run_hole[upper] == run_hole[upper + 1]) & (run_code[upper] != blank) & (run_code[upper + 1] != blank)
+        upper = upper[pairs]
+        lower = upper + 1
+
+        above_mean, below_mean = bottom_mean[upper], top_mean[lower]
+        last_above, first_below = run_ends[upper], run_starts[lower]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = below_mean / above_mean
+        return {
+            "hole": self.holes[run_hole[upper]],
+            "depth": top[lower],
+            "above": names[run_code[upper]],
+            "below": names[run_code[lower]],
+            "above_mean": above_mean,
+            "below_mean": below_mean,
+            "jump": below_mean - above_mean,
+            "ratio": ratio,
+            "step": self.grade[first_below] - self.grade[last_above],
+            "gap": top[lower] - bottom[upper],
+            "above_thickness": bottom[upper] - top[upper],
+            "below_thickness": bottom[lower] - top[lower],
+            "lithologies": names,
+            "above_code": run_code[upper],
+            "below_code": run_code[lower],
+            "hole_code": run_hole[upper]
+        }
+
+    @staticmethod
+    def contact_summary(contacts: dict) -> dict:
+        """Per transition type ("SAP->LAT") and per CONTACT_GROUPS group: counts and mean grade change."""
+        def stats(mask) -> dict:
+            if not mask.any():
+                return {"contacts": 0}
+            step = contacts["step"][mask]
+            return {
+                "contacts": int(mask.sum()),
+                "holes": int(len(np.unique(contacts["hole_code"][mask]))),
+                "mean_depth": round(float(contacts["depth"][mask].mean()), 2),
+                "mean_above": _nanmean(contacts["above_mean"][mask]),
+                "mean_below": _nanmean(contacts["below_mean"][mask]),
+                "mean_jump": _nanmean(contacts["jump"][mask]),
+                "median_abs_step": float(np.nanmedian(np.abs(step))) if np.isfinite(step).any() else None
+            }
+
+        names = contacts["lithologies"]
+        above, below = contacts["above_code"], contacts["below_code"]
+        transition = above * len(names) + below
+        kinds, counts = np.unique(transition, return_counts=True)
+        by_transition = {
+            f"{names[kind // len(names)]}->{names[kind % len(names)]}": stats(transition == kind)
+            for kind in kinds[np.argsort(-counts, kind="stable")]
+        }
+        groups = {}
+        for group, (upper, lower) in CONTACT_GROUPS.items():
+            is_upper = np.isin(names, list(upper))
+            is_lower = np.isin(names, list(lower))
+            groups[group] = {"downward": stats(is_upper[above] & is_lower[below]),
+                             "inverted": stats(is_lower[above] & is_upper[below])}
+        return {"contacts": len(transition), "transitions": by_transition, "groups": groups}
@@ -0,0 +1,244 @@
+"""
+Mergeable streaming accumulators shared by the engines.
+
+Every accumulator is updated chunk by chunk in bounded memory and supports
+`merge`, so partial results from worker processes can be combined.
+"""
+import numpy as np
+
+
+class RunningMoments:
+    """Weighted count, mean, variance, min and max (Welford/Chan merge)."""
+
+    def __init__(self):
+        self.weight = 0.0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        keep = np.isfinite(values) & np.isfinite(weights) & (weights > 0)
+        values, weights = values[keep], weights[keep]
+        if not len(values):
+            return self
+        chunk = RunningMoments()
+        chunk.weight = float(weights.sum())
+        chunk.count = len(values)
+        chunk.mean = float(np.dot(weights, values) / chunk.weight)
+        chunk.m2 = float(np.dot(weights, (values - chunk.mean) ** 2))
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        return self.merge(chunk)
+
+    def merge(self, other: "RunningMoments"):
+        if other.weight == 0:
+            return self
+        total = self.weight + other.weight
+        delta = other.mean - self.mean
+        self.mean += delta * other.weight / total
+        self.m2 += other.m2 + delta ** 2 * self.weight * other.weight / total
+        self.weight = total
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.weight if self.weight else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def cv(self) -> float:
+        return self.std / self.mean if self.mean else float("nan")
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch style).
+
+    Positive values fall in log-spaced bins of ratio gamma = (1 + a) / (1 - a),
+    so any quantile is within relative accuracy `a`. Bins also keep the
+    weighted sum of their values, which makes tail excess (metal above a cap)
+    cheap. Zeros have their own bin and negative values (e.g. elevations, dips)
+    go to a mirrored sketch of their magnitudes.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.offset = 0
+        self.counts = np.zeros(0)
+        self.sums = np.zeros(0)
+        self.zero_count = 0.0
+        self.negative = None
+
+    def _index(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def _grow(self, lo: int, hi: int):
+        if not len(self.counts):
+            self.offset = lo
+            self.counts = np.zeros(hi - lo + 1)
+            self.sums = np.zeros(hi - lo + 1)
+            return
+        new_lo = min(lo, self.offset)
+        new_hi = max(hi, self.offset + len(self.counts) - 1)
+        if new_lo == self.offset and new_hi == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_hi - new_lo + 1)
+        sums = np.zeros(new_hi - new_lo + 1)
+        start = self.offset - new_lo
+        counts[start:start + len(self.counts)] = self.counts
+        sums[start:start + len(self.sums)] = self.sums
+        self.offset, self.counts, self.sums = new_lo, counts, sums
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        keep = np.isfinite(values) & np.isfinite(weights) & (weights > 0)
+        values, weights = values[keep], weights[keep]
+        negative = values < 0
+        if negative.any():
+            if self.negative is None:
+                self.negative = QuantileSketch(self.relative_accuracy)
+            self.negative.update(-values[negative], weights[negative])
+        positive = values > 0
+        self.zero_count += float(weights[values == 0].sum())
+        values, weights = values[positive], weights[positive]
+        if not len(values):
+            return self
+
+        index = self._index(values)
+        self._grow(int(index.min()), int(index.max()))
+        slot = index - self.offset
+        self.counts += np.bincount(slot, weights=weights, minlength=len(self.counts))
+        self.sums += np.bincount(slot, weights=weights * values, minlength=len(self.sums))
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        if other.negative is not None:
+            if self.negative is None:
+                self.negative = QuantileSketch(self.relative_accuracy)
+            self.negative.merge(other.negative)
+        if len(other.counts):
+            self._grow(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+            self.sums[start:start + len(other.sums)] += other.sums
+        return self
+
+    @property
+    def negative_total(self) -> float:
+        return self.negative.total if self.negative is not None else 0.0
+
+    @property
+    def total(self) -> float:
+        return self.negative_total + self.zero_count + float(self.counts.sum())
+
+    def _bin_values(self) -> np.ndarray:
+        k = np.arange(self.offset, self.offset + len(self.counts))
+        return 2.0 * self.gamma ** k / (self.gamma + 1.0)
+
+    def quantile(self, q: float) -> float:
+        total = self.total
+        if total == 0:
+            return float("nan")
+        rank = q * total
+        negative_total = self.negative_total
+        if rank < negative_total or (rank == negative_total and negative_total == total):
+            return -self.negative.quantile(1.0 - rank / negative_total)
+        if rank <= negative_total + self.zero_count or not len(self.counts):
+            return 0.0
+        cumulative = negative_total + self.zero_count + np.cumsum(self.counts)
+        b = min(int(np.searchsorted(cumulative, rank)), len(self.counts) - 1)
+        return float(self._bin_values()[b])
+
+    def weight_above(self, threshold: float) -> float:
+        """Approximate weight of values above threshold."""
+        if not len(self.counts):
+            return 0.0
+        return float(self.counts[self._bin_values() > threshold].sum())
+
+    def excess_above(self, cap: float) -> float:
+        """Approximate sum of weight * (value - cap) over values above cap."""
+        if not len(self.counts):
+            return 0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bin_mean = np.where(self.counts > 0, self.sums / self.counts, 0.0)
+        return float(np.sum(np.maximum(bin_mean - cap, 0.0) * self.counts))
+
+    @property
+    def sum(self) -> float:
+        negative = self.negative.sum if self.negative is not None else 0.0
+        return float(self.sums.sum()) - negative
+
+
+class CovarianceAccumulator:
+    """
+    Pairwise-complete covariance of p columns with Welford/Chan merging.
+
+    Missing values (NaN) are handled by pairwise deletion: entry (i, j) only
+    uses rows where both columns are present. Stored per pair are the count,
+    the mean of column i on those rows, the co-moment and the second moment
+    of column i, all as (p, p) matrices, so each chunk is a few matrix
+    products and merges are elementwise.
+    """
+
+    def __init__(self, n_columns: int):
+        p = n_columns
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))     # mean[i, j]: mean of i where i and j present
+        self.comoment = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))       # m2[i, j]: second moment of i where i and j present
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        present = np.isfinite(values)
+        if not present.any():
+            return self
+        # Centre on chunk column means to keep the products well conditioned
+        counts = present.sum(axis=0)
+        centre = np.where(present, values, 0.0).sum(axis=0) / np.maximum(counts, 1)
+        x = np.where(present, values - centre, 0.0)
+        m = present.astype(np.float64)
+
+        chunk = CovarianceAccumulator(values.shape[1])
+        chunk.n = m.T @ m
+        sums = x.T @ m                   # sums[i, j]: sum of i where i and j present
+        with np.errstate(invalid="ignore", divide="ignore"):
+            local_mean = np.where(chunk.n > 0, sums / chunk.n, 0.0)
+        chunk.mean = local_mean + centre[:, None]
+        chunk.comoment = x.T @ x - local_mean * sums.T
+        chunk.m2 = (x ** 2).T @ m - local_mean * sums
+        return self.merge(chunk)
+
+    def merge(self, other: "CovarianceAccumulator"):
+        n = self.n + other.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            factor = np.where(n > 0, self.n * other.n / n, 0.0)
+            delta = other.mean - self.mean
+            self.comoment += other.comoment + delta * delta.T * factor
+            self.m2 += other.m2 + delta ** 2 * factor
+            self.mean += np.where(n > 0, delta * other.n / n, 0.0)
+        self.n = n
+        return self
+
+    def covariance(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, self.comoment / (self.n - 1), np.nan)
+
+    def correlation(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, self.comoment / np.sqrt(self.m2 * self.m2.T), np.nan)
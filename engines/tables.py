@@ -0,0 +1,99 @@
+"""
+Chunked readers for drillhole tables (collar, survey, assay, lithology CSVs).
+"""
+import csv
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 200_000
+MISSING = {"", "na", "nan", "null", "-", "n/a"}
+BLANK_MARKERS = ("", "-")   # the common missing markers, masked before converting
+PARSE_BLOCK = 64            # entries per vectorized retry once a conversion fails
+BELOW_DETECTION = 0.5       # "<0.01" is read as this fraction of the detection limit
+
+
+def _parse(text: str) -> float:
+    text = text.strip()
+    if text.lower() in MISSING:
+        return np.nan
+    try:
+        if text.startswith("<"):
+            return BELOW_DETECTION * float(text[1:])
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def to_float(values) -> np.ndarray:
+    """
+    Parse a column of strings into floats; missing or invalid entries become NaN
+    and below-detection entries ("<0.01") BELOW_DETECTION times their limit.
+
+    A clean column is one vectorized conversion. Otherwise blank cells are
+    masked out and the rest converted at once, or, when some entry still
+    fails (other missing markers, "<0.01", ...), in blocks of PARSE_BLOCK
+    where only the failing blocks are parsed entry by entry.
+    """
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        pass
+    values = np.asarray(values, dtype=object)
+    result = np.full(len(values), np.nan)
+    filled = np.ones(len(values), dtype=bool)
+    for marker in BLANK_MARKERS:
+        filled &= values != marker
+    index = np.flatnonzero(filled)
+    try:
+        result[index] = values[index].astype(np.float64)
+        return result
+    except ValueError:
+        pass
+    for start in range(0, len(index), PARSE_BLOCK):
+        rows = index[start:start + PARSE_BLOCK]
+        block = values[rows]
+        try:
+            result[rows] = block.astype(np.float64)
+        except ValueError:
+            result[rows] = [_parse(value) for value in block]
+    return result
+
+
+def read_header(path: str) -> list:
+    """Upper-cased column names of a CSV file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [name.strip().upper() for name in next(csv.reader(f), [])]
+
+
+def iter_csv_chunks(path: str, columns: list, numeric: list = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    """
+    Yield {column: array} chunks of at most chunk_rows rows.
+
+    Columns listed in `numeric` are parsed as float64 (NaN when missing), the
+    others are returned as string arrays. Header matching is case-insensitive.
+    """
+    numeric = set(numeric or [])
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip().upper() for name in next(reader)]
+        missing = [c for c in columns if c.upper() not in header]
+        if missing:
+            raise KeyError(f"{path}: missing columns {missing}")
+        positions = [header.index(c.upper()) for c in columns]
+
+        buffers = [[] for _ in columns]
+        for row in reader:
+            for buffer, position in zip(buffers, positions):
+                buffer.append(row[position] if position < len(row) else "")
+            if len(buffers[0]) >= chunk_rows:
+                yield _to_chunk(columns, buffers, numeric)
+                buffers = [[] for _ in columns]
+        if buffers[0]:
+            yield _to_chunk(columns, buffers, numeric)
+
+
+def _to_chunk(columns: list, buffers: list, numeric: set) -> dict:
+    return {
+        column: to_float(buffer) if column in numeric else np.array([v.strip() for v in buffer])
+        for column, buffer in zip(columns, buffers)
+    }
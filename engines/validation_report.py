@@ -0,0 +1,311 @@
+"""
+Single-pass block model validation report.
+
+Builds the validation branch of the knowledge web (`swath_plots`,
+`grade_tonnage`, `qq_plot_est`, `mean_comparison`, `metal_balance_final`,
+`variance_reduction`) from one streaming pass over the block model tiles.
+
+The pass only collects parameter-free sufficient statistics (moments, per
+row/column/level sums and a fixed log-spaced grade histogram). That summary
+is cached by model fingerprint, so changing swath widths, cutoffs or
+quantiles rebuilds the charts from the summary without touching the model.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".validation"
+MAX_SUMMARIES = 8       # model summaries kept in process, least recently used evicted first
+REPORT_VERSION = 2      # bump when the cached report format changes
+
+# Fixed grade histogram of [lower, upper) bins: bin 0 holds negative grades
+# (missing-value codes), bin 1 zero and positive grades below 1e-4, then
+# log-spaced bins up to 1e4. Bin edges never depend on the data, so summaries
+# stay mergeable and cacheable.
+HISTOGRAM_EDGES = np.concatenate([[-np.inf, 0.0], np.logspace(-4, 4, 4097)[1:], [np.inf]])
+
+DEFAULT_CUTOFFS = [0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0]
+DEFAULT_QUANTILES = list(np.round(np.linspace(0.01, 0.99, 99), 2))
+
+
+def _array_hash(*arrays) -> str:
+    digest = hashlib.sha1()
+    for array in arrays:
+        if array is not None:
+            digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _histogram_quantiles(counts: np.ndarray, quantiles) -> np.ndarray:
+    """Quantiles from HISTOGRAM_EDGES counts, interpolated within a bin."""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1] if len(cumulative) else 0
+    if total == 0:
+        return np.full(len(quantiles), np.nan)
+    result = []
+    lower = np.concatenate([[0.0], HISTOGRAM_EDGES[1:-1]])
+    upper = np.concatenate([HISTOGRAM_EDGES[1:-1], [HISTOGRAM_EDGES[-2]]])
+    for q in quantiles:
+        target = q * total
+        b = int(np.searchsorted(cumulative, target))
+        before = cumulative[b - 1] if b > 0 else 0
+        fraction = (target - before) / counts[b] if counts[b] else 0.0
+        result.append(lower[b] + fraction * (upper[b] - lower[b]))
+    return np.asarray(result)
+
+
+def _weighted_quantiles(values: np.ndarray, weights: np.ndarray, quantiles) -> np.ndarray:
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    cumulative = (np.cumsum(weights) - 0.5 * weights) / weights.sum()
+    return np.interp(quantiles, cumulative, values)
+
+
+def _json_safe(value):
+    """Report structure with non-finite floats as None."""
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+class ValidationReport:
+    """Block model versus composites validation statistics."""
+
+    _summaries = OrderedDict()   # in-process LRU summary cache: key -> summary
+
+    def __init__(self, model, coords, values, weights=None, domain: int = None,
+                 default_density: float = 1.0, grade: str = "grade"):
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        valid = np.isfinite(values) & np.isfinite(weights)
+        self.model = model
+        self.coords, self.values, self.weights = coords[valid], values[valid], weights[valid]
+        self.domain = domain
+        self.default_density = default_density
+        self.grade = grade
+
+    # ========== RESUMO DO MODELO (UMA PASSADA) ==========
+
+    def _summary_key(self) -> str:
+        return hashlib.sha1(json.dumps({
+            "model": self.model.fingerprint(),
+            "grade": self.grade,
+            "domain": self.domain,
+            "default_density": self.default_density
+        }, sort_keys=True).encode()).hexdigest()
+
+    def summary(self) -> dict:
+        """Sufficient statistics of the model, from cache or one pass over all tiles."""
+        key = self._summary_key()
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            return self._summaries[key]
+
+        cache_file = os.path.join(self.model.path, CACHE_DIR, f"summary_{key}.npz")
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as data:
+                summary = {name: data[name] for name in data.files}
+        else:
+            summary = self._scan()
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            np.savez(cache_file, **summary)
+
+        self._summaries[key] = summary
+        while len(self._summaries) > MAX_SUMMARIES:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def _scan(self) -> dict:
+        model = self.model
+        nbins = len(HISTOGRAM_EDGES) - 1
+        summary = {
+            "moments": np.zeros(5),            # n, volume, tonnes, metal, tonnes * grade²
+            "histogram_count": np.zeros(nbins),
+            "histogram_tonnes": np.zeros(nbins),
+            "histogram_metal": np.zeros(nbins),
+        }
+        for axis, n in zip("xyz", model.dims):
+            summary[f"swath_{axis}_tonnes"] = np.zeros(n)
+            summary[f"swath_{axis}_metal"] = np.zeros(n)
+
+        cell_volume = float(np.prod(model.cell_size))
+        has_sub = model.subcell_size is not None
+        attributes = [self.grade, "density", "domain"]
+
+        for tile_id in model.tiles():
+            tile = model.read_tile(tile_id, attributes)
+            cells = model.tile_cell_indices(tile_id)
+            grade = tile[self.grade].ravel().astype(np.float64)
+            density = tile["density"].ravel().astype(np.float64)
+            keep = np.isfinite(grade)
+            if self.domain is not None:
+                keep &= tile["domain"].ravel() == self.domain
+
+            if has_sub:
+                slots, parents = model.tile_subblocks(tile_id)
+                if len(slots):
+                    # Sub-blocked parents are represented by their sub-cells
+                    keep &= ~np.isin(model.flat_index(cells), parents)
+                    sub = model.read_subblocks(slots, attributes)
+                    n_sub = sub[self.grade].shape[1]
+                    sub_cells = np.repeat(np.stack(np.unravel_index(parents, model.dims), axis=1), n_sub, axis=0)
+                    sub_grade = sub[self.grade].ravel().astype(np.float64)
+                    sub_keep = np.isfinite(sub_grade)
+                    if self.domain is not None:
+                        sub_keep &= sub["domain"].ravel() == self.domain
+                    self._accumulate(summary, sub_cells[sub_keep], sub_grade[sub_keep],
+                                     sub["density"].ravel().astype(np.float64)[sub_keep], cell_volume / n_sub)
+
+            self._accumulate(summary, cells[keep], grade[keep], density[keep], cell_volume)
+
+        logger.info(f"Validation pass over {model.n_tiles} tiles: {int(summary['moments'][0])} blocks")
+        return summary
+
+    def _accumulate(self, summary: dict, cells, grade, density, volume: float):
+        if not len(grade):
+            return
+        density = np.where(np.isfinite(density), density, self.default_density)
+        tonnes = volume * density
+        metal = tonnes * grade
+        summary["moments"] += [len(grade), volume * len(grade), tonnes.sum(), metal.sum(), (metal * grade).sum()]
+
+        bins = np.searchsorted(HISTOGRAM_EDGES, grade, side="right") - 1
+        nbins = len(HISTOGRAM_EDGES) - 1
+        summary["histogram_count"] += np.bincount(bins, minlength=nbins)
+        summary["histogram_tonnes"] += np.bincount(bins, weights=tonnes, minlength=nbins)
+        summary["histogram_metal"] += np.bincount(bins, weights=metal, minlength=nbins)
+        for axis, column in zip("xyz", range(3)):
+            n = len(summary[f"swath_{axis}_tonnes"])
+            summary[f"swath_{axis}_tonnes"] += np.bincount(cells[:, column], weights=tonnes, minlength=n)
+            summary[f"swath_{axis}_metal"] += np.bincount(cells[:, column], weights=metal, minlength=n)
+
+    # ========== RELATÓRIO ==========
+
+    def build(self, swath_cells=(1, 1, 1), cutoffs=None, quantiles=None) -> dict:
+        """
+        All validation charts, keyed by knowledge-web node id.
+
+        swath_cells is the swath width in parent cells per axis. Reports are
+        cached next to the summary; a new parameter set only re-runs the cheap
+        chart step.
+        """
+        cutoffs = list(cutoffs if cutoffs is not None else DEFAULT_CUTOFFS)
+        quantiles = list(quantiles if quantiles is not None else DEFAULT_QUANTILES)
+        key = hashlib.sha1(json.dumps({
+            "version": REPORT_VERSION,
+            "summary": self._summary_key(),
+            "composites": _array_hash(self.coords, self.values, self.weights),
+            "swath_cells": list(swath_cells),
+            "cutoffs": cutoffs,
+            "quantiles": quantiles
+        }, sort_keys=True).encode()).hexdigest()
+        cache_file = os.path.join(self.model.path, CACHE_DIR, f"report_{key}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                return json.load(f)
+
+        summary = self.summary()
+        n, volume, tonnes, metal, metal_grade = summary["moments"]
+        model_mean = metal / tonnes if tonnes else float("nan")
+        model_var = metal_grade / tonnes - model_mean ** 2 if tonnes else float("nan")
+        comp_mean = float(np.average(self.values, weights=self.weights)) if len(self.values) else float("nan")
+        comp_var = (float(np.average((self.values - comp_mean) ** 2, weights=self.weights))
+                    if len(self.values) else float("nan"))
+
+        report = {
+            "model_hash": self.model.fingerprint(),
+            "swath_plots": self._swaths(summary, swath_cells),
+            "grade_tonnage": self._grade_tonnage(summary, cutoffs),
+            "qq_plot_est": {
+                "quantiles": quantiles,
+                "model": _histogram_quantiles(summary["histogram_count"], quantiles).tolist(),
+                "composites": (_weighted_quantiles(self.values, self.weights, quantiles).tolist()
+                               if len(self.values) else [])
+            },
+            "mean_comparison": {
+                "model_mean": model_mean,
+                "composite_mean": comp_mean,
+                "difference_pct": 100.0 * (model_mean - comp_mean) / comp_mean if comp_mean else None
+            },
+            "metal_balance_final": {
+                "model_tonnes": tonnes,
+                "model_metal": metal,
+                "composite_metal": tonnes * comp_mean,
+                "balance_pct": 100.0 * (metal - tonnes * comp_mean) / (tonnes * comp_mean)
+                               if tonnes and comp_mean else None
+            },
+            "variance_reduction": {
+                "model_variance": model_var,
+                "composite_variance": comp_var,
+                "factor": model_var / comp_var if comp_var else None
+            },
+            "blocks": int(n),
+            "volume": volume
+        }
+
+        # NaN/inf become null so the cached file is valid JSON and reads back the same
+        report = _json_safe(report)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, "w") as f:
+            json.dump(report, f, allow_nan=False)
+        return report
+
+    def _swaths(self, summary: dict, swath_cells) -> dict:
+        model = self.model
+        swaths = {}
+        for column, (axis, width) in enumerate(zip("xyz", swath_cells)):
+            n = model.dims[column]
+            groups = np.arange(n) // width
+            n_groups = groups[-1] + 1
+            tonnes = np.bincount(groups, weights=summary[f"swath_{axis}_tonnes"], minlength=n_groups)
+            metal = np.bincount(groups, weights=summary[f"swath_{axis}_metal"], minlength=n_groups)
+            size = model.cell_size[column] * width
+            centres = model.origin[column] + (np.arange(n_groups) + 0.5) * size
+
+            comp_group = np.floor((self.coords[:, column] - model.origin[column]) / size).astype(np.int64)
+            inside = (comp_group >= 0) & (comp_group < n_groups)
+            comp_w = np.bincount(comp_group[inside], weights=self.weights[inside], minlength=n_groups)
+            comp_sum = np.bincount(comp_group[inside], weights=(self.weights * self.values)[inside],
+                                   minlength=n_groups)
+            comp_n = np.bincount(comp_group[inside], minlength=n_groups)
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                swaths[axis] = {
+                    "centre": centres.tolist(),
+                    "model_mean": np.where(tonnes > 0, metal / tonnes, np.nan).tolist(),
+                    "composite_mean": np.where(comp_w > 0, comp_sum / comp_w, np.nan).tolist(),
+                    "composite_count": comp_n.tolist()
+                }
+        return swaths
+
+    def _grade_tonnage(self, summary: dict, cutoffs: list) -> dict:
+        # Tonnes and metal at grade >= cutoff. Negative grades never count; the bin
+        # holding the cutoff contributes the part above it, assuming grades spread
+        # uniformly within the bin
+        cutoff = np.maximum(np.asarray(cutoffs, dtype=np.float64), 0.0)
+        tonnes_above = np.append(np.cumsum(summary["histogram_tonnes"][::-1])[::-1], 0.0)
+        metal_above = np.append(np.cumsum(summary["histogram_metal"][::-1])[::-1], 0.0)
+        b = np.minimum(np.searchsorted(HISTOGRAM_EDGES, cutoff, side="right"), len(HISTOGRAM_EDGES) - 1) - 1
+        lower, upper = HISTOGRAM_EDGES[b], HISTOGRAM_EDGES[b + 1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            finite = np.isfinite(upper)
+            tonnes_share = np.where(finite, (upper - cutoff) / (upper - lower), cutoff <= lower)
+            metal_share = np.where(finite, (upper ** 2 - cutoff ** 2) / (upper ** 2 - lower ** 2), cutoff <= lower)
+        tonnes = tonnes_above[b + 1] + tonnes_share * summary["histogram_tonnes"][b]
+        metal = metal_above[b + 1] + metal_share * summary["histogram_metal"][b]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grade = np.where(tonnes > 0, metal / tonnes, np.nan)
+        return {"cutoff": cutoffs, "tonnes": tonnes.tolist(), "grade": grade.tolist(), "metal": metal.tolist()}
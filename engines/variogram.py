@@ -0,0 +1,218 @@
+"""
+Experimental variogram engine.
+
+Computes omni-directional, directional, downhole and 2D map variograms for
+the `variography`, `directional_variogram`, `downhole_variogram` and
+`variogram_map` workflow nodes. Pairs are enumerated with a KD-tree up to the
+maximum lag only, binned with `np.bincount`, and the pair work is split in
+index chunks across a process pool. Partial bin sums are merged in the parent.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4096
+
+# Per-worker state, set once by _init_worker so chunks don't re-send arrays
+_coords = None
+_values = None
+_tree = None
+
+
+def _init_worker(coords, values):
+    global _coords, _values, _tree
+    _coords = coords
+    _values = values
+    _tree = cKDTree(coords)
+
+
+def direction_vector(azimuth: float, dip: float) -> np.ndarray:
+    """Unit vector for azimuth (clockwise from north) and dip (positive down), in degrees."""
+    az, dp = np.radians(azimuth), np.radians(dip)
+    return np.array([np.sin(az) * np.cos(dp), np.cos(az) * np.cos(dp), -np.sin(dp)])
+
+
+def _max_distance(spec: dict) -> float:
+    if spec["kind"] == "map":
+        return np.sqrt(2.0) * (spec["n_lags"] + 0.5) * spec["lag"]
+    return spec["n_lags"] * spec["lag"] + spec["lag_tol"]
+
+
+def _bin_pairs(spec: dict, h: np.ndarray, dist: np.ndarray, sq: np.ndarray):
+    """Accumulate (pairs, distance sum, squared difference sum) for one spec."""
+    if spec["kind"] == "map":
+        n = spec["n_lags"]
+        size = 2 * n + 1
+        ix = np.rint(h[:, 0] / spec["lag"]).astype(np.int64)
+        iy = np.rint(h[:, 1] / spec["lag"]).astype(np.int64)
+        keep = (np.abs(ix) <= n) & (np.abs(iy) <= n)
+        ix, iy, d, s = ix[keep], iy[keep], dist[keep], sq[keep]
+        # Each pair counts for h and -h so the map is symmetric
+        cells = np.concatenate([(iy + n) * size + (ix + n), (n - iy) * size + (n - ix)])
+        d, s = np.concatenate([d, d]), np.concatenate([s, s])
+        nbins = size * size
+    else:
+        keep = np.ones(len(dist), dtype=bool)
+        if spec["kind"] == "directional":
+            along = h @ spec["direction"]
+            cos_angle = np.abs(along) / np.maximum(dist, 1e-12)
+            keep &= cos_angle >= spec["cos_tol"]
+            if spec.get("bandwidth") is not None:
+                perpendicular = np.sqrt(np.maximum(dist ** 2 - along ** 2, 0.0))
+                keep &= perpendicular <= spec["bandwidth"]
+        k = np.rint(dist / spec["lag"]).astype(np.int64)
+        keep &= (np.abs(dist - k * spec["lag"]) <= spec["lag_tol"]) & (k <= spec["n_lags"])
+        cells, d, s = k[keep], dist[keep], sq[keep]
+        nbins = spec["n_lags"] + 1
+
+    return (np.bincount(cells, minlength=nbins),
+            np.bincount(cells, weights=d, minlength=nbins),
+            np.bincount(cells, weights=s, minlength=nbins))
+
+
+def _pair_chunk(start: int, stop: int, max_dist: float, specs: list) -> list:
+    """Bin every pair (i, j) with start <= i < stop, i < j and |h| <= max_dist."""
+    # Search the worker's shared tree, built once in _init_worker; pairs with
+    # j <= i belong to an earlier chunk (or are self pairs) and are dropped
+    chunk_tree = cKDTree(_coords[start:stop])
+    pairs = chunk_tree.sparse_distance_matrix(_tree, max_dist, output_type="ndarray")
+    i = pairs["i"].astype(np.int64) + start
+    j = pairs["j"].astype(np.int64)
+    keep = i < j
+    i, j, dist = i[keep], j[keep], pairs["v"][keep]
+
+    h = _coords[j] - _coords[i]
+    sq = (_values[j] - _values[i]) ** 2
+    return [_bin_pairs(spec, h, dist, sq) for spec in specs]
+
+
+def _finalize(spec: dict, counts, dist_sums, sq_sums) -> dict:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gamma = np.where(counts > 0, 0.5 * sq_sums / counts, np.nan)
+        distance = np.where(counts > 0, dist_sums / counts, np.nan)
+
+    if spec["kind"] == "map":
+        size = 2 * spec["n_lags"] + 1
+        offsets = (np.arange(size) - spec["n_lags"]) * spec["lag"]
+        return {
+            "hx": offsets,
+            "hy": offsets,
+            "gamma": gamma.reshape(size, size),
+            "pairs": counts.reshape(size, size)
+        }
+    return {
+        "lag": np.arange(spec["n_lags"] + 1) * spec["lag"],
+        "distance": distance,
+        "gamma": gamma,
+        "pairs": counts
+    }
+
+
+class VariogramEngine:
+    """Experimental variograms over a set of composites."""
+
+    def __init__(self, coords, values, hole_ids=None, depths=None,
+                 workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(self.values) & np.all(np.isfinite(self.coords), axis=1)
+        self.coords, self.values = self.coords[valid], self.values[valid]
+        self.hole_ids = np.asarray(hole_ids)[valid] if hole_ids is not None else None
+        self.depths = np.asarray(depths, dtype=np.float64)[valid] if depths is not None else None
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    # ========== VARIOGRAMAS ==========
+
+    def omnidirectional(self, lag: float, n_lags: int, lag_tol: float = None) -> dict:
+        spec = self._lag_spec("omni", lag, n_lags, lag_tol)
+        return self._compute(self.coords, self.values, [spec])[0]
+
+    def directional(self, directions: list, lag: float, n_lags: int, lag_tol: float = None,
+                    angle_tol: float = 22.5, bandwidth: float = None) -> list:
+        """One variogram per (azimuth, dip) direction, all from a single pair pass."""
+        specs = []
+        for azimuth, dip in directions:
+            spec = self._lag_spec("directional", lag, n_lags, lag_tol)
+            spec.update({
+                "azimuth": azimuth,
+                "dip": dip,
+                "direction": direction_vector(azimuth, dip),
+                "cos_tol": np.cos(np.radians(angle_tol)),
+                "bandwidth": bandwidth
+            })
+            specs.append(spec)
+        results = self._compute(self.coords, self.values, specs)
+        for spec, result in zip(specs, results):
+            result.update({"azimuth": spec["azimuth"], "dip": spec["dip"]})
+        return results
+
+    def downhole(self, lag: float, n_lags: int, lag_tol: float = None) -> dict:
+        """Variogram along each hole, pairing only samples of the same hole."""
+        if self.hole_ids is None or self.depths is None:
+            raise ValueError("Downhole variogram requires hole_ids and depths")
+
+        spec = self._lag_spec("omni", lag, n_lags, lag_tol)
+        # Lay holes end to end on one axis with a gap larger than the search
+        # distance, so a 1D pair search never crosses hole boundaries
+        _, hole_index = np.unique(self.hole_ids, return_inverse=True)
+        span = np.ptp(self.depths) if len(self.depths) else 0.0
+        gap = span + 2 * _max_distance(spec) + 1.0
+        position = hole_index * gap + self.depths
+        return self._compute(position[:, None], self.values, [spec])[0]
+
+    def variogram_map(self, lag: float, n_lags: int) -> dict:
+        """2D variogram map on the XY plane, (2 * n_lags + 1)² cells of size lag."""
+        spec = {"kind": "map", "lag": lag, "n_lags": n_lags}
+        return self._compute(np.ascontiguousarray(self.coords[:, :2]), self.values, [spec])[0]
+
+    # ========== EXECUÇÃO ==========
+
+    def _lag_spec(self, kind: str, lag: float, n_lags: int, lag_tol: float = None) -> dict:
+        if lag <= 0 or n_lags < 1:
+            raise ValueError("lag must be positive and n_lags >= 1")
+        return {"kind": kind, "lag": lag, "n_lags": n_lags,
+                "lag_tol": lag / 2.0 if lag_tol is None else lag_tol}
+
+    def _compute(self, coords: np.ndarray, values: np.ndarray, specs: list) -> list:
+        max_dist = max(_max_distance(spec) for spec in specs)
+        # Pair bins don't depend on sample order: in KD-tree leaf order each
+        # chunk is spatially compact, so its search prunes most of the shared tree
+        order = cKDTree(coords).indices
+        coords, values = np.ascontiguousarray(coords[order]), values[order]
+        chunks = [(start, min(start + self.chunk_size, len(values)))
+                  for start in range(0, len(values), self.chunk_size)]
+        totals = None
+
+        def merge(partial):
+            nonlocal totals
+            if totals is None:
+                totals = [list(arrays) for arrays in partial]
+            else:
+                for acc, arrays in zip(totals, partial):
+                    for k in range(3):
+                        acc[k] += arrays[k]
+
+        if self.workers <= 1 or len(chunks) <= 1:
+            _init_worker(coords, values)
+            for start, stop in chunks:
+                merge(_pair_chunk(start, stop, max_dist, specs))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(coords, values)) as pool:
+                futures = [pool.submit(_pair_chunk, start, stop, max_dist, specs)
+                           for start, stop in chunks]
+                for future in futures:
+                    merge(future.result())
+
+        if totals is None:
+            totals = [_bin_pairs(spec, np.empty((0, coords.shape[1])), np.empty(0), np.empty(0))
+                      for spec in specs]
+        logger.info(f"Variogram pass: {len(values)} samples, {len(chunks)} chunks, "
+                    f"max distance {max_dist:.1f}")
+        return [_finalize(spec, *acc) for spec, acc in zip(specs, totals)]
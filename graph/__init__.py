@@ -0,0 +1,3 @@
+"""
+Python-side services over the Neo4j knowledge graph.
+"""
@@ -0,0 +1,53 @@
+"""
+Thin Neo4j client shared by the graph services.
+Reads the same environment variables as the migrations and the API.
+"""
+from neo4j import GraphDatabase
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+class GraphClient:
+    """Connection to the knowledge graph database."""
+    
+    def __init__(self, database: str = None):
+        self.uri = os.getenv("NEO4J_URI", "neo4j://localhost:7687")
+        self.user = os.getenv("NEO4J_USER", "neo4j")
+        self.password = os.getenv("NEO4J_PASSWORD", "knowledge_tree_2024")
+        self.database = database or os.getenv("NEO4J_DATABASE", "geoai")
+        self.driver = None
+    
+    def connect(self):
+        """Connect to Neo4j database."""
+        try:
+            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver.verify_connectivity()
+            logger.info(f"Connected to Neo4j database: {self.database}")
+        except Exception as e:
+            logger.error(f"Failed to connect to Neo4j: {e}")
+            raise
+    
+    def close(self):
+        """Close Neo4j connection."""
+        if self.driver:
+            self.driver.close()
+            self.driver = None
+    
+    def run_query(self, query: str, params: dict = None) -> list:
+        """Run a Cypher query and return all records."""
+        with self.driver.session(database=self.database) as session:
+            try:
+                return list(session.run(query, params or {}))
+            except Exception as e:
+                logger.error(f"Query failed: {e}")
+                raise
+    
+    def __enter__(self):
+        self.connect()
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,253 @@
+"""
+Graph change events for live clients.
+
+Writers (migrations, the rule engine, the job queue) append small events to
+an append-only SQLite log shared by every process on the machine. Each Neo4j
+database has its own log (`log_path`), so projects migrated side by side
+(batch.py) never mix their events:
+
+    {"type": "node_added" | "node_updated" | "node_removed", "id", "label", "title", "node_type"}
+    {"type": "edge_added" | "edge_removed", "source", "rel", "target"}
+    {"type": "job", "id", "kind", "status"}
+    {"type": "graph_reset"}     (the whole graph was cleared or replaced)
+
+`EventStream` tails the log with one poller thread per API process and
+hands SSE clients everything after their last event id, coalesced: several
+changes to the same node or edge within a batch collapse into one. Events
+are ordered by their integer id, which is the SSE `id:` and what a client
+resumes from with `Last-Event-ID`. Background consumers (the lineage index)
+keep their position in the log's `cursors` table.
+"""
+from collections import deque
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DB = os.getenv("EVENTS_DB", ".graph_events.db")    # <root>.<database>.db per database
+KEEP_EVENTS = 100_000
+BUFFER_EVENTS = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    name TEXT PRIMARY KEY,
+    event_id INTEGER NOT NULL
+);
+"""
+
+
+def log_path(database: str = None) -> str:
+    """Event log file of a Neo4j database (default: NEO4J_DATABASE)."""
+    database = database or os.getenv("NEO4J_DATABASE", "geoai")
+    root, ext = os.path.splitext(EVENTS_DB)
+    return f"{root}.{database}{ext}"
+
+
+def node_event(type_: str, node_id: str, label: str, **fields) -> dict:
+    return {"type": type_, "id": node_id, "label": label, **{k: v for k, v in fields.items() if v is not None}}
+
+
+def edge_event(type_: str, source: str, rel: str, target: str) -> dict:
+    return {"type": type_, "source": source, "rel": rel, "target": target}
+
+
+def _key(event: dict) -> tuple:
+    if event["type"].startswith("edge_"):
+        return ("edge", event["source"], event["rel"], event["target"])
+    if event["type"] == "job":
+        return ("job", event["id"])
+    if event["type"] == "graph_reset":
+        return ("reset",)
+    return ("node", event["id"])
+
+
+def coalesce(events: list) -> list:
+    """
+    Collapse events on the same node/edge/job, keeping first-seen order.
+
+    added + updated -> added (fields merged); anything + removed -> removed;
+    removed + added -> added; otherwise the last event wins.
+    """
+    merged = {}
+    for event in events:
+        key = _key(event)
+        previous = merged.get(key)
+        if previous is not None and previous["type"] == "node_added" and event["type"] == "node_updated":
+            event = {**previous, **event, "type": "node_added"}
+        merged[key] = event
+    return list(merged.values())
+
+
+class EventLog:
+    """Append-only event table (WAL mode, safe for concurrent processes)."""
+
+    def __init__(self, path: str = None):
+        self.path = path or log_path()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def append(self, events: list) -> int:
+        """Append events in one transaction; returns the last id."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("INSERT INTO events (ts, event) VALUES (?, ?)",
+                                     [(now, json.dumps(event, default=str)) for event in events])
+                last = self._db.execute("SELECT max(id) FROM events").fetchone()[0]
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return last
+
+    def since(self, last_id: int, limit: int = 1000) -> list:
+        """[(id, event)] with id > last_id, oldest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT id, event FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                    (last_id, limit)).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def latest_id(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT coalesce(max(id), 0) FROM events").fetchone()[0]
+
+    def oldest_id(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT coalesce(min(id), 0) FROM events").fetchone()[0]
+
+    def cursor(self, name: str):
+        """Last event id a named consumer has processed, or None if it never ran on this log."""
+        with self._lock:
+            row = self._db.execute("SELECT event_id FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, name: str, event_id: int):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cursors (name, event_id) VALUES (?, ?)", (name, event_id))
+
+    def prune(self, keep: int = KEEP_EVENTS):
+        with self._lock:
+            self._db.execute("DELETE FROM events WHERE id <= (SELECT max(id) FROM events) - ?", (keep,))
+
+
+def events_between(log: EventLog, after: int, until: int, limit: int = None):
+    """
+    Events with after < id <= until, oldest first; None when the log was
+    pruned past `after` or more than `limit` events would be returned.
+    """
+    if log.oldest_id() > after + 1:
+        return None
+    found = []
+    while after < until:
+        batch = log.since(after, limit=BUFFER_EVENTS)
+        if not batch:
+            break
+        found += [event for event_id, event in batch if event_id <= until]
+        after = batch[-1][0]
+        if limit is not None and len(found) > limit:
+            return None
+    return found
+
+
+_logs = {}    # path -> EventLog shared by this process
+_log_lock = threading.Lock()
+
+
+def default_log(database: str = None) -> EventLog:
+    """This process's EventLog for a database (default: NEO4J_DATABASE)."""
+    path = log_path(database)
+    with _log_lock:
+        if path not in _logs:
+            _logs[path] = EventLog(path)
+        return _logs[path]
+
+
+def emit(events: list, database: str = None):
+    """Best-effort append to a database's log; a failure never breaks the writer."""
+    if not events:
+        return
+    try:
+        default_log(database).append(events)
+    except Exception as e:
+        logger.warning(f"Could not record {len(events)} graph events: {e}")
+
+
+def latest_id(database: str = None):
+    """Id of the newest event in a database's log, or None when the log is unavailable."""
+    try:
+        return default_log(database).latest_id()
+    except Exception as e:
+        logger.warning(f"Could not read the graph event log: {e}")
+        return None
+
+
+class EventStream:
+    """Shared tail of an EventLog for SSE clients in this process."""
+
+    def __init__(self, log: EventLog = None, interval: float = 0.25, buffer: int = BUFFER_EVENTS):
+        self.log = log or EventLog()
+        self.interval = interval
+        self.buffer = deque(maxlen=buffer)     # (id, event), newest last
+        self.latest = self.log.latest_id()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="event-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self):
+        polls = 0
+        while not self._stop.is_set():
+            try:
+                events = self.log.since(self.latest, limit=BUFFER_EVENTS)
+                polls += 1
+                if polls % 10_000 == 0:
+                    self.log.prune()
+            except Exception as e:
+                logger.warning(f"Event poll failed: {e}")
+                events = []
+            if events:
+                with self._condition:
+                    self.buffer.extend(events)
+                    self.latest = events[-1][0]
+                    self._condition.notify_all()
+            if len(events) < BUFFER_EVENTS:
+                time.sleep(self.interval)
+
+    def wait(self, last_id: int, timeout: float) -> tuple:
+        """
+        (new last id, coalesced events after last_id), waiting up to timeout
+        for something new. Clients further behind than the buffer read from the log.
+        """
+        with self._condition:
+            if self.latest <= last_id:
+                self._condition.wait(timeout)
+            if self.latest <= last_id:
+                return last_id, []
+            if self.buffer and self.buffer[0][0] <= last_id + 1:
+                events = [(i, e) for i, e in self.buffer if i > last_id]
+            else:
+                events = None
+        if events is None:
+            events = self.log.since(last_id, limit=BUFFER_EVENTS)
+            if not events:
+                return last_id, []
+        return events[-1][0], coalesce([event for _, event in events])
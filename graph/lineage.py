@@ -0,0 +1,293 @@
+"""
+In-memory lineage cache of the knowledge graph.
+
+Loads every DataNode/Inference and the SUPPORTS/LEADS_TO edges once into
+integer CSR adjacency arrays (forward and reverse), so multi-hop lineage
+questions are answered from memory instead of variable-length Cypher:
+ancestors ("which raw columns support contained_metal?"), descendants
+("what is downstream of assay.elements.Ni?"), topological order and
+shortest paths. The cache reloads when the graph's structure changes: a
+different set of applied Migration versions or DataNode/Inference and
+SUPPORTS/LEADS_TO counts, or a node/edge addition or removal (or a
+graph_reset) recorded in the graph event log since the last load. The counts
+are only queried once the log has moved past the loaded snapshot. Each load
+builds a new immutable `LineageSnapshot` and swaps it in with one
+assignment; queries read a single snapshot, so API threads never see a
+half-built cache.
+"""
+from collections import deque
+import logging
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
+
+from .client import GraphClient
+from .events import default_log, events_between
+
+logger = logging.getLogger(__name__)
+
+NO_PREDECESSOR = -9999   # scipy's marker in predecessor arrays
+STRUCTURE_EVENTS = {"node_added", "node_removed", "edge_added", "edge_removed", "graph_reset"}
+
+
+def migration_version(client: GraphClient) -> str:
+    """Comma-separated applied Migration versions, the cache's freshness key."""
+    records = client.run_query("""
+        MATCH (m:Migration)
+        RETURN m.version AS version
+        ORDER BY version
+    """)
+    return ",".join(str(record["version"]) for record in records)
+
+
+def structure_signature(client: GraphClient) -> str:
+    """Applied migrations plus node and edge counts of the lineage graph."""
+    record = client.run_query("""
+        CALL { MATCH (n) WHERE n:DataNode OR n:Inference RETURN count(n) AS nodes }
+        CALL { MATCH ()-[r:SUPPORTS|LEADS_TO]->() RETURN count(r) AS edges }
+        RETURN nodes, edges
+    """)[0]
+    return f"{migration_version(client)}|{record['nodes']}|{record['edges']}"
+
+
+def latest_event_id(database: str = None):
+    try:
+        return default_log(database).latest_id()
+    except Exception as e:
+        logger.warning(f"Lineage cache: event log unavailable ({e})")
+        return None
+
+
+def structure_changed(after: int, until: int, database: str = None) -> bool:
+    """True when the event log records (or may have lost) a structural change in (after, until]."""
+    if after is None or until is None:
+        return after != until
+    if until <= after:
+        return False
+    try:
+        events = events_between(default_log(database), after, until)
+    except Exception as e:
+        logger.warning(f"Lineage cache: event log unreadable ({e})")
+        return True
+    return events is None or any(event["type"] in STRUCTURE_EVENTS for event in events)
+
+
+class LineageSnapshot:
+    """One immutable build of the lineage graph; never modified after construction."""
+
+    __slots__ = ("version", "event_id", "ids", "index", "labels", "forward", "reverse")
+
+    def __init__(self, version, event_id, ids, index, labels, forward, reverse):
+        self.version = version
+        self.event_id = event_id
+        self.ids = ids            # node index -> id
+        self.index = index        # id -> node index
+        self.labels = labels      # 0 DataNode, 1 Inference
+        self.forward = forward
+        self.reverse = reverse
+
+    @classmethod
+    def build(cls, nodes: list, edges: list, version: str = None, event_id: int = None) -> "LineageSnapshot":
+        """CSR arrays from [(id, is_data_node)] and [(source, target)]."""
+        ids = [node_id for node_id, _ in nodes]
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        labels = np.array([0 if is_data else 1 for _, is_data in nodes], dtype=np.int8)
+        n = len(ids)
+        pairs = np.array([(index[a], index[b]) for a, b in edges
+                          if a in index and b in index], dtype=np.int32).reshape(-1, 2)
+        data = np.ones(len(pairs), dtype=np.int8)
+        forward = csr_matrix((data, (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+        forward.sum_duplicates()
+        return cls(version, event_id, ids, index, labels, forward, forward.T.tocsr())
+
+
+EMPTY = LineageSnapshot.build([], [])
+
+
+class LineageGraph:
+    """Lineage queries over the current LineageSnapshot of the DataNode/Inference graph."""
+
+    def __init__(self, client: GraphClient = None, snapshot: LineageSnapshot = None):
+        self.client = client or GraphClient()
+        self.snapshot = snapshot or EMPTY
+        self._lock = threading.Lock()
+
+    def pinned(self) -> "LineageGraph":
+        """A view fixed to the current snapshot, for several queries that must agree."""
+        return LineageGraph(self.client, self.snapshot)
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def ids(self) -> list:
+        return self.snapshot.ids
+
+    @property
+    def index(self) -> dict:
+        return self.snapshot.index
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.snapshot.labels
+
+    @property
+    def forward(self) -> csr_matrix:
+        return self.snapshot.forward
+
+    @property
+    def reverse(self) -> csr_matrix:
+        return self.snapshot.reverse
+
+    # ========== CARGA ==========
+
+    def _stale(self, version: str, event_id) -> bool:
+        current = self.snapshot
+        return version != current.version or structure_changed(current.event_id, event_id, self.client.database)
+
+    def refresh(self) -> bool:
+        """
+        Reload if the graph structure changed; returns True when reloaded.
+        Nothing is queried while the event log has not moved past the snapshot.
+        """
+        event_id = latest_event_id(self.client.database)
+        if event_id is not None and event_id == self.snapshot.event_id and self.snapshot.version is not None:
+            return False
+        version = structure_signature(self.client)
+        with self._lock:
+            if self._stale(version, event_id):
+                self.load(version, event_id)
+                return True
+            # Only non-structural events: same arrays, newer log position
+            current = self.snapshot
+            self.snapshot = LineageSnapshot(current.version, event_id, current.ids, current.index,
+                                            current.labels, current.forward, current.reverse)
+        return False
+
+    def load(self, version: str = None, event_id: int = None):
+        if version is None:
+            event_id = latest_event_id(self.client.database)
+            version = structure_signature(self.client)
+        nodes = self.client.run_query("""
+            MATCH (n)
+            WHERE n:DataNode OR n:Inference
+            RETURN n.id AS id, n:DataNode AS is_data
+            ORDER BY id
+        """)
+        edges = self.client.run_query("""
+            MATCH (a)-[:SUPPORTS|LEADS_TO]->(b)
+            WHERE (a:DataNode OR a:Inference) AND (b:DataNode OR b:Inference)
+            RETURN DISTINCT a.id AS source, b.id AS target
+        """)
+        self.build([(r["id"], r["is_data"]) for r in nodes], [(r["source"], r["target"]) for r in edges],
+                   version, event_id)
+        snapshot = self.snapshot
+        logger.info(f"Lineage cache: {len(snapshot.ids)} nodes, {snapshot.forward.nnz} edges "
+                    f"(revision {snapshot.version}, event {snapshot.event_id})")
+
+    def build(self, nodes: list, edges: list, version: str = None, event_id: int = None):
+        """Build a snapshot from [(id, is_data_node)] and [(source, target)] and swap it in."""
+        self.snapshot = LineageSnapshot.build(nodes, edges, version, event_id)
+
+    # ========== CONSULTAS ==========
+    # Each query reads self.snapshot once and works on that object only.
+
+    @staticmethod
+    def _node(snapshot: LineageSnapshot, node_id: str) -> int:
+        if node_id not in snapshot.index:
+            raise KeyError(f"Unknown node '{node_id}'")
+        return snapshot.index[node_id]
+
+    def _reachable(self, snapshot: LineageSnapshot, matrix: csr_matrix, node_id: str,
+                   max_depth: int = None) -> dict:
+        """id -> hop distance for nodes reachable from node_id (excluding itself)."""
+        start = self._node(snapshot, node_id)
+        if max_depth is None:
+            depth = self._depths(matrix, start)
+        else:
+            depth = self._bounded_bfs(matrix, start, max_depth)
+        return {snapshot.ids[i]: int(d) for i, d in depth.items() if i != start}
+
+    def _depths(self, matrix: csr_matrix, start: int) -> dict:
+        order, predecessors = breadth_first_order(matrix, start, directed=True, return_predecessors=True)
+        depth = {start: 0}
+        for i in order[1:]:
+            depth[int(i)] = depth[int(predecessors[i])] + 1
+        return depth
+
+    def _bounded_bfs(self, matrix: csr_matrix, start: int, max_depth: int) -> dict:
+        indptr, indices = matrix.indptr, matrix.indices
+        depth = {start: 0}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            if depth[i] >= max_depth:
+                continue
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                j = int(j)
+                if j not in depth:
+                    depth[j] = depth[i] + 1
+                    queue.append(j)
+        return depth
+
+    def ancestors(self, node_id: str, max_depth: int = None, kind: str = None) -> dict:
+        """Upstream nodes -> hops; kind="DataNode" keeps only raw data columns."""
+        snapshot = self.snapshot
+        return self._filter(snapshot, self._reachable(snapshot, snapshot.reverse, node_id, max_depth), kind)
+
+    def descendants(self, node_id: str, max_depth: int = None, kind: str = None) -> dict:
+        """Downstream nodes -> hops."""
+        snapshot = self.snapshot
+        return self._filter(snapshot, self._reachable(snapshot, snapshot.forward, node_id, max_depth), kind)
+
+    @staticmethod
+    def _filter(snapshot: LineageSnapshot, nodes: dict, kind: str = None) -> dict:
+        if kind is None:
+            return nodes
+        label = {"DataNode": 0, "Inference": 1}[kind]
+        return {node_id: d for node_id, d in nodes.items() if snapshot.labels[snapshot.index[node_id]] == label}
+
+    def shortest_path(self, source: str, target: str, directed: bool = True) -> list:
+        """Fewest-hop path of ids from source to target, or [] when unreachable."""
+        snapshot = self.snapshot
+        start, end = self._node(snapshot, source), self._node(snapshot, target)
+        matrix = snapshot.forward if directed else (snapshot.forward + snapshot.reverse).tocsr()
+        _, predecessors = breadth_first_order(matrix, start, directed=True, return_predecessors=True)
+        if start != end and predecessors[end] == NO_PREDECESSOR:
+            return []
+        path = [end]
+        while path[-1] != start:
+            path.append(int(predecessors[path[-1]]))
+        return [snapshot.ids[i] for i in reversed(path)]
+
+    def topological_order(self, snapshot: LineageSnapshot = None) -> list:
+        """All ids with every node after its sources (Kahn's algorithm)."""
+        snapshot = snapshot or self.snapshot
+        indptr, indices = snapshot.forward.indptr, snapshot.forward.indices
+        in_degree = np.bincount(indices, minlength=len(snapshot.ids))
+        queue = deque(np.flatnonzero(in_degree == 0).tolist())
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            targets = indices[indptr[i]:indptr[i + 1]]
+            in_degree[targets] -= 1
+            queue.extend(int(j) for j in targets[in_degree[targets] == 0])
+        if len(order) < len(snapshot.ids):
+            cyclic = sorted(snapshot.ids[i] for i in np.flatnonzero(in_degree > 0))
+            raise ValueError(f"Lineage graph has cycles through {cyclic[:10]}")
+        return [snapshot.ids[i] for i in order]
+
+    def depths(self, snapshot: LineageSnapshot = None) -> dict:
+        """id -> longest distance from any root (DAG depth)."""
+        snapshot = snapshot or self.snapshot
+        reverse = snapshot.reverse
+        depth = {}
+        for node_id in self.topological_order(snapshot):
+            i = snapshot.index[node_id]
+            sources = reverse.indices[reverse.indptr[i]:reverse.indptr[i + 1]]
+            depth[node_id] = 1 + max((depth[snapshot.ids[j]] for j in sources), default=-1)
+        return depth
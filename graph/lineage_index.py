@@ -0,0 +1,313 @@
+"""
+Materialized transitive-closure lineage index.
+
+Post-migration step that stores, for every Inference, the root DataNodes it
+ultimately depends on and its depth in the DAG:
+
+    (d:DataNode)-[:ROOT_OF]->(i:Inference)    denormalized closure edges
+    i.dag_depth, i.root_count                 indexed properties
+    i.lineage_hash                            hash of the direct sources
+
+"Which inferences depend on Ni?" then becomes one index lookup plus a
+single-hop expand:
+
+    MATCH (:DataNode {id: 'assay.elements.Ni'})-[:ROOT_OF]->(i) RETURN i
+
+Updates are incremental. The index keeps a cursor in the database's graph
+event log (graph.events); the structural events after it name the nodes
+whose sources changed (new nodes from a migration such as m004, new or
+removed edges). Only their descendants are read back, level by level, and
+recomputed from the stored dag_depth/ROOT_OF of their unaffected sources.
+The whole DAG is loaded and every lineage_hash compared only on the first
+run, after a graph_reset, when the log was pruned past the cursor, or with
+--full.
+
+These properties are index internals; /api/data leaves INDEX_PROPERTIES out.
+"""
+import hashlib
+import logging
+
+from .client import GraphClient
+from .events import default_log, events_between
+from .lineage import LineageGraph
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH = 500
+READ_BATCH = 5000
+CURSOR = "lineage_index"
+MAX_EVENT_CHANGES = 20_000  # past this many events a full update is cheaper
+INDEX_PROPERTIES = ("dag_depth", "root_count", "lineage_hash")
+STRUCTURE_EVENTS = {"node_added", "node_removed", "edge_added", "edge_removed"}
+
+INDEXES = [
+    "CREATE INDEX datanode_id IF NOT EXISTS FOR (n:DataNode) ON (n.id)",
+    "CREATE INDEX inference_id IF NOT EXISTS FOR (i:Inference) ON (i.id)",
+    "CREATE INDEX inference_dag_depth IF NOT EXISTS FOR (i:Inference) ON (i.dag_depth)"
+]
+
+
+def sources_hash(sources: list) -> str:
+    return hashlib.sha1("\n".join(sorted(sources)).encode()).hexdigest()[:16]
+
+
+def changed_nodes(log, after: int, until: int):
+    """
+    Ids whose lineage sources may have changed after `after` up to `until`
+    (added nodes and the targets of added/removed edges), or None when the
+    events cannot be trusted for an incremental update.
+    """
+    events = events_between(log, after, until, limit=MAX_EVENT_CHANGES)
+    if events is None or any(event["type"] == "graph_reset" for event in events):
+        return None
+    changed = set()
+    for event in events:
+        if event["type"] in ("node_added", "node_removed"):
+            changed.add(event["id"])
+        elif event["type"] in STRUCTURE_EVENTS:
+            changed.add(event["target"])
+    return changed
+
+
+class LineageIndex:
+    """Keeps ROOT_OF edges and dag_depth in sync with the SUPPORTS/LEADS_TO DAG."""
+
+    def __init__(self, client: GraphClient = None):
+        self.client = client or GraphClient()
+        self.graph = LineageGraph(self.client)
+
+    def ensure_indexes(self):
+        for statement in INDEXES:
+            self.client.run_query(statement)
+
+    def _sources(self, i: int) -> list:
+        reverse = self.graph.reverse
+        return [self.graph.ids[j] for j in reverse.indices[reverse.indptr[i]:reverse.indptr[i + 1]]]
+
+    def stale(self) -> set:
+        """Inferences whose stored lineage_hash no longer matches their direct sources."""
+        stored = {
+            record["id"]: record["hash"]
+            for record in self.client.run_query("""
+                MATCH (i:Inference)
+                RETURN i.id AS id, i.lineage_hash AS hash
+            """)
+        }
+        return {
+            node_id for node_id, hash_ in stored.items()
+            if node_id in self.graph.index and hash_ != sources_hash(self._sources(self.graph.index[node_id]))
+        }
+
+    def compute(self, node_ids: set) -> dict:
+        """id -> {"roots", "depth"} for node_ids, computed in topological order."""
+        graph = self.graph
+        # Only node_ids and their ancestors are needed
+        needed = set(node_ids)
+        stack = [graph.index[node_id] for node_id in node_ids]
+        while stack:
+            i = stack.pop()
+            for j in graph.reverse.indices[graph.reverse.indptr[i]:graph.reverse.indptr[i + 1]]:
+                if graph.ids[j] not in needed:
+                    needed.add(graph.ids[j])
+                    stack.append(j)
+
+        roots, depth = {}, {}
+        for node_id in graph.topological_order():
+            if node_id not in needed:
+                continue
+            i = graph.index[node_id]
+            if graph.labels[i] == 0:
+                roots[node_id] = {node_id}
+                depth[node_id] = 0
+                continue
+            sources = self._sources(i)
+            roots[node_id] = set().union(*(roots[s] for s in sources)) if sources else set()
+            depth[node_id] = 1 + max((depth[s] for s in sources), default=-1)
+        return {
+            node_id: {"roots": sorted(roots[node_id]), "depth": depth[node_id]}
+            for node_id in node_ids
+        }
+
+    def update(self, changed: list = None, full: bool = False) -> int:
+        """
+        Recompute the index for the affected subgraph; returns rows written.
+
+        Changes come from the event log since the last update plus `changed`
+        (node ids known to have changed). `full` reloads the DAG and rewrites
+        everything.
+        """
+        try:
+            log = default_log(self.client.database)
+            until = log.latest_id()
+            after = log.cursor(CURSOR)
+        except Exception as e:
+            logger.warning(f"Lineage index: event log unavailable ({e}), checking every inference")
+            log = until = after = None
+
+        seeds = None
+        if not full and after is not None:
+            seeds = changed_nodes(log, after, until)
+        if seeds is None:
+            written = self._update_all(changed, full)
+        else:
+            written = self._update_descendants(seeds | set(changed or []))
+        if log is not None:
+            log.set_cursor(CURSOR, until)
+        return written
+
+    def _update_all(self, changed: list = None, full: bool = False) -> int:
+        """Load the whole DAG; recompute stale inferences (all with `full`) and their descendants."""
+        self.graph.load()
+        inferences = {node_id for node_id, i in self.graph.index.items() if self.graph.labels[i] == 1}
+        if full:
+            seeds = inferences
+        else:
+            seeds = self.stale() | {node_id for node_id in (changed or []) if node_id in self.graph.index}
+
+        affected = set(seeds)
+        for node_id in seeds:
+            affected.update(self.graph.descendants(node_id))
+        affected &= inferences
+        if not affected:
+            logger.info("Lineage index up to date")
+            return 0
+
+        values = self.compute(affected)
+        rows = [{
+            "id": node_id,
+            "roots": values[node_id]["roots"],
+            "depth": values[node_id]["depth"],
+            "hash": sources_hash(self._sources(self.graph.index[node_id]))
+        } for node_id in sorted(affected)]
+        self._write(rows)
+        logger.info(f"Lineage index: {len(rows)} inferences recomputed "
+                    f"({len(seeds)} changed, {len(inferences)} total)")
+        return len(rows)
+
+    def _descendants(self, seeds: set) -> set:
+        """Inferences among or downstream of seeds, one query per DAG level."""
+        ids = sorted(seeds)
+        affected = {record["id"] for record in self.client.run_query(
+            "MATCH (i:Inference) WHERE i.id IN $ids RETURN i.id AS id", {"ids": ids})}
+        frontier = ids
+        while frontier:
+            found = set()
+            for start in range(0, len(frontier), READ_BATCH):
+                found.update(record["id"] for record in self.client.run_query("""
+                    CALL {
+                        MATCH (s:DataNode) WHERE s.id IN $ids RETURN s
+                        UNION
+                        MATCH (s:Inference) WHERE s.id IN $ids RETURN s
+                    }
+                    MATCH (s)-[:SUPPORTS|LEADS_TO]->(i:Inference)
+                    RETURN DISTINCT i.id AS id
+                """, {"ids": frontier[start:start + READ_BATCH]}))
+            frontier = sorted(found - affected)
+            affected.update(found)
+        return affected
+
+    def _update_descendants(self, seeds: set) -> int:
+        """
+        Recompute the inferences downstream of seeds. Sources outside that set
+        keep their stored values, so only the affected subgraph is read.
+        """
+        affected = self._descendants(seeds) if seeds else set()
+        if not affected:
+            logger.info("Lineage index up to date")
+            return 0
+
+        sources = {node_id: [] for node_id in affected}
+        stored = {}     # unaffected source id -> (roots, depth)
+        ids = sorted(affected)
+        for start in range(0, len(ids), READ_BATCH):
+            for record in self.client.run_query("""
+                MATCH (s)-[:SUPPORTS|LEADS_TO]->(i:Inference)
+                WHERE i.id IN $ids AND (s:DataNode OR s:Inference)
+                RETURN DISTINCT i.id AS id, s.id AS source, s:DataNode AS is_data, s.dag_depth AS depth,
+                       [(d:DataNode)-[:ROOT_OF]->(s) | d.id] AS roots
+            """, {"ids": ids[start:start + READ_BATCH]}):
+                sources[record["id"]].append(record["source"])
+                if record["source"] in affected:
+                    continue
+                if record["is_data"]:
+                    stored[record["source"]] = ({record["source"]}, 0)
+                elif record["depth"] is None:
+                    # An upstream inference was never indexed: the stored values cannot be trusted
+                    logger.info(f"Lineage index: '{record['source']}' is not indexed, checking every inference")
+                    return self._update_all(list(seeds))
+                else:
+                    stored[record["source"]] = (set(record["roots"]), record["depth"])
+
+        # Kahn's order within the affected subgraph
+        waiting = {node_id: len(set(node_sources) & affected) for node_id, node_sources in sources.items()}
+        children = {}
+        for node_id, node_sources in sources.items():
+            for source in set(node_sources):
+                if source in affected:
+                    children.setdefault(source, []).append(node_id)
+        ready = sorted(node_id for node_id, count in waiting.items() if count == 0)
+        roots, depth = {}, {}
+        while ready:
+            node_id = ready.pop()
+            known = [stored[s] if s in stored else (roots[s], depth[s]) for s in set(sources[node_id])]
+            roots[node_id] = set().union(*(r for r, _ in known)) if known else set()
+            depth[node_id] = 1 + max((d for _, d in known), default=-1)
+            for child in children.get(node_id, []):
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+        if len(roots) < len(affected):
+            cyclic = sorted(node_id for node_id in affected if node_id not in roots)
+            raise ValueError(f"Lineage graph has cycles through {cyclic[:10]}")
+
+        rows = [{"id": node_id, "roots": sorted(roots[node_id]), "depth": depth[node_id],
+                 "hash": sources_hash(sources[node_id])} for node_id in ids]
+        self._write(rows)
+        logger.info(f"Lineage index: {len(rows)} inferences recomputed ({len(seeds)} changed nodes)")
+        return len(rows)
+
+    def _write(self, rows: list):
+        self.ensure_indexes()
+        for start in range(0, len(rows), WRITE_BATCH):
+            self.client.run_query("""
+                UNWIND $rows AS row
+                MATCH (i:Inference {id: row.id})
+                SET i.dag_depth = row.depth,
+                    i.root_count = size(row.roots),
+                    i.lineage_hash = row.hash
+                WITH i, row
+                CALL {
+                    WITH i
+                    MATCH (:DataNode)-[old:ROOT_OF]->(i)
+                    DELETE old
+                    RETURN count(*) AS removed
+                }
+                CALL {
+                    WITH i, row
+                    UNWIND row.roots AS root_id
+                    MATCH (d:DataNode {id: root_id})
+                    MERGE (d)-[:ROOT_OF]->(i)
+                    RETURN count(*) AS added
+                }
+                RETURN count(*) AS updated
+            """, {"rows": rows[start:start + WRITE_BATCH]})
+
+    # ========== CONSULTAS ==========
+
+    def dependents(self, data_node_id: str, max_depth: int = None) -> list:
+        """Inferences depending on a DataNode, shallowest first."""
+        return [dict(record) for record in self.client.run_query("""
+            MATCH (:DataNode {id: $id})-[:ROOT_OF]->(i:Inference)
+            WHERE $max_depth IS NULL OR i.dag_depth <= $max_depth
+            RETURN i.id AS id, i.title AS title, i.dag_depth AS depth
+            ORDER BY depth, id
+        """, {"id": data_node_id, "max_depth": max_depth})]
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    with GraphClient() as client:
+        LineageIndex(client).update(full="--full" in sys.argv)
@@ -0,0 +1,424 @@
+"""
+Incremental inference rule engine.
+
+Inference trigger conditions are declared in RULES and checked against the
+`stats`/`distribution` properties of DataNodes. Inferences whose conditions
+hold are created (with their SUPPORTS edges); inferences whose conditions no
+longer hold are retracted. When a DataNode changes, only rules reachable from
+it through SUPPORTS/LEADS_TO are re-evaluated.
+
+Uso:
+    python -m graph.rule_engine          # Avalia todas as regras
+"""
+from collections import deque
+import json
+import logging
+import operator
+
+from migrations.m002_inferences import InferencesMigration
+from migrations.m004_knowledge_web import KnowledgeWebMigration
+from .client import GraphClient
+from . import events
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Evidence keys written from data (pipeline ranking, job write-backs); an
+# assertion keeps the stored values instead of resetting them to the static content
+DERIVED_EVIDENCE = ("ranking", "ranking_posterior", "analyses")
+
+# ========== REGRAS DE INFERÊNCIA ==========
+# Condition kinds:
+#   {"node", "stat", "op", "value"}   -> DataNode.stats[stat] <op> value
+#   {"node", "share", "op", "value"}  -> sum of DataNode.distribution[keys] <op> value
+#   {"inference"}                     -> another rule-driven inference is active
+RULES = [
+    {
+        "inference": "ni_lateritico",
+        "conditions": [
+            {"node": "assay.elements.Ni", "stat": "mean", "op": ">", "value": 0},
+            {"node": "assay.elements.Si", "stat": "mean", "op": ">", "value": 0},
+            {"node": "assay.elements.Mg", "stat": "mean", "op": ">", "value": 0},
+            {"node": "lithology.LITO", "share": ["SAP", "LAT"], "op": ">=", "value": 50},
+        ]
+    },
+    {
+        "inference": "underground",
+        "conditions": [
+            {"node": "collar.z", "stat": "mean", "op": "<", "value": 0},
+            {"node": "survey.dip", "stat": "max", "op": ">", "value": 0},
+        ]
+    },
+    {
+        "inference": "capping",
+        "conditions": [
+            {"node": "assay.elements.Ni", "stat": "cv", "op": ">", "value": 3},
+        ]
+    },
+    {
+        "inference": "variograma",
+        "conditions": [
+            {"inference": "ni_lateritico"},
+        ]
+    },
+    {
+        "inference": "krigagem",
+        "conditions": [
+            {"inference": "variograma"},
+        ]
+    },
+    {
+        "inference": "trend_vertical",
+        "conditions": [
+            {"inference": "ni_lateritico"},
+            {"node": "assay.elements.Ni", "stat": "mean", "op": ">", "value": 0.65},
+        ]
+    },
+]
+
+
+def condition_source(condition: dict) -> str:
+    """Graph id the condition reads from."""
+    return condition.get("node") or condition["inference"]
+
+
+class InferenceRuleEngine:
+    """Evaluates RULES against the graph and keeps Inference nodes in sync."""
+
+    def __init__(self, client: GraphClient = None, rules: list = None):
+        self.client = client or GraphClient()
+        self.rules = {rule["inference"]: rule for rule in (rules or RULES)}
+        self.order = self._topological_order()
+        self.content = {inf["id"]: inf for inf in InferencesMigration.INFERENCES}
+
+        # source id -> rule ids whose conditions read it
+        self.rule_deps = {}
+        for inf_id, rule in self.rules.items():
+            for condition in rule["conditions"]:
+                self.rule_deps.setdefault(condition_source(condition), set()).add(inf_id)
+
+        self.nodes = {}        # DataNode id -> {"stats": {...}, "distribution": {...}}
+        self.edges = {}        # id -> ids reached by SUPPORTS/LEADS_TO
+        self.active = set()    # Inference ids present in the graph
+        self.observed = {}     # rule id -> last written observation
+        self.computed = {}     # rule id -> evidence fields computed from data, kept on re-assertion
+        self.pending = []      # change events emitted at the end of evaluate()
+
+    def _topological_order(self) -> list:
+        """Rule ids ordered so that prerequisite inferences come first."""
+        order, visiting, done = [], set(), set()
+
+        def visit(inf_id):
+            if inf_id in done:
+                return
+            if inf_id in visiting:
+                raise ValueError(f"Cyclic inference rules at '{inf_id}'")
+            visiting.add(inf_id)
+            for condition in self.rules[inf_id]["conditions"]:
+                if condition.get("inference") in self.rules:
+                    visit(condition["inference"])
+            visiting.discard(inf_id)
+            done.add(inf_id)
+            order.append(inf_id)
+
+        for inf_id in self.rules:
+            visit(inf_id)
+        return order
+
+    # ========== ESTADO DO GRAFO ==========
+
+    def load(self):
+        """Load DataNode stats, Inference ids and edges from the graph."""
+        self.nodes = {
+            record["id"]: {
+                "stats": json.loads(record["stats"]) if record["stats"] else {},
+                "distribution": json.loads(record["distribution"]) if record["distribution"] else {}
+            }
+            for record in self.client.run_query("""
+                MATCH (n:DataNode)
+                RETURN n.id AS id, n.stats AS stats, n.distribution AS distribution
+            """)
+        }
+        self.active = {
+            record["id"] for record in self.client.run_query("""
+                MATCH (i:Inference)
+                RETURN i.id AS id
+            """)
+        }
+        self.edges = {}
+        for record in self.client.run_query("""
+            MATCH (a)-[:SUPPORTS|LEADS_TO]->(b)
+            RETURN a.id AS source, b.id AS target
+        """):
+            self.edges.setdefault(record["source"], set()).add(record["target"])
+        self.observed = {}
+
+    def affected_rules(self, node_id: str) -> list:
+        """Rules downstream of node_id, in evaluation order."""
+        seen = {node_id}
+        queue = deque([node_id])
+        while queue:
+            current = queue.popleft()
+            for nxt in self.edges.get(current, set()) | self.rule_deps.get(current, set()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return [inf_id for inf_id in self.order if inf_id in seen]
+
+    # ========== AVALIAÇÃO ==========
+
+    def check(self, condition: dict):
+        """Return (holds, observation) for a single condition."""
+        if "inference" in condition:
+            holds = condition["inference"] in self.active
+            return holds, f"{condition['inference']} {'active' if holds else 'inactive'}"
+
+        node = self.nodes.get(condition["node"], {})
+        if "share" in condition:
+            distribution = node.get("distribution", {})
+            value = sum(distribution.get(key, 0) for key in condition["share"])
+            label = f"{condition['node']} {'+'.join(condition['share'])}"
+        else:
+            value = node.get("stats", {}).get(condition["stat"])
+            label = f"{condition['node']} {condition['stat']}"
+
+        if value is None:
+            return False, f"{label} missing"
+        holds = OPERATORS[condition["op"]](value, condition["value"])
+        return holds, f"{label} = {value} ({condition['op']} {condition['value']})"
+
+    def evaluate(self, inf_ids: list = None) -> dict:
+        """Evaluate the given rules (default: all) and sync the graph."""
+        changes = {"asserted": [], "retracted": []}
+        for inf_id in (inf_ids if inf_ids is not None else self.order):
+            results = [self.check(c) for c in self.rules[inf_id]["conditions"]]
+            holds = all(ok for ok, _ in results)
+            observation = "; ".join(text for _, text in results)
+
+            if holds:
+                if inf_id not in self.active:
+                    changes["asserted"].append(inf_id)
+                if inf_id not in self.active or self.observed.get(inf_id) != observation:
+                    self._assert(inf_id, observation)
+            elif inf_id in self.active:
+                self._retract(inf_id)
+                changes["retracted"].append(inf_id)
+
+        if changes["asserted"] or changes["retracted"]:
+            logger.info(f"Rule engine: asserted {changes['asserted']}, retracted {changes['retracted']}")
+        events.emit(events.coalesce(self.pending), self.client.database)
+        self.pending = []
+        return changes
+
+    def update_stats(self, node_id: str, stats: dict = None, distribution: dict = None) -> dict:
+        """Write new DataNode stats and re-evaluate only the affected rules."""
+        node = self.nodes.setdefault(node_id, {"stats": {}, "distribution": {}})
+        if stats is not None:
+            node["stats"] = stats
+        if distribution is not None:
+            node["distribution"] = distribution
+
+        self.client.run_query("""
+            MATCH (n:DataNode {id: $id})
+            SET n.stats = coalesce($stats, n.stats),
+                n.distribution = coalesce($distribution, n.distribution)
+        """, {
+            "id": node_id,
+            "stats": json.dumps(stats) if stats is not None else None,
+            "distribution": json.dumps(distribution) if distribution is not None else None
+        })
+        return self.evaluate(self.affected_rules(node_id))
+
+    def set_evidence(self, inf_id: str, fields: dict) -> bool:
+        """
+        Merge data-derived fields into an inference's evidence (and keep them
+        when the rule re-asserts it). Returns whether the graph changed.
+        """
+        self.computed[inf_id] = {**self.computed.get(inf_id, {}), **fields}
+        if inf_id not in self.active:
+            return False
+        records = self.client.run_query("MATCH (i:Inference {id: $id}) RETURN i.evidence AS evidence", {"id": inf_id})
+        current = json.loads(records[0]["evidence"] or "{}") if records else {}
+        if all(current.get(key) == value for key, value in fields.items()):
+            return False
+        self.client.run_query("MATCH (i:Inference {id: $id}) SET i.evidence = $evidence",
+                              {"id": inf_id, "evidence": json.dumps({**current, **fields})})
+        events.emit([events.node_event("node_updated", inf_id, "Inference")], self.client.database)
+        return True
+
+    # ========== ESCRITA NO GRAFO ==========
+
+    def _sources(self, inf_id: str) -> list:
+        rels = InferencesMigration.RELATIONSHIPS.get(inf_id, {})
+        sources = list(rels.get("sources", []))
+        for condition in self.rules[inf_id]["conditions"]:
+            if condition_source(condition) not in sources:
+                sources.append(condition_source(condition))
+        return sources
+
+    def _dependents(self, inf_id: str) -> list:
+        """Knowledge-web inferences that list inf_id as a source."""
+        return [node["id"] for node in KnowledgeWebMigration.MOCK_NODES if inf_id in node["sources"]]
+
+    def _stored_evidence(self, inf_id: str) -> dict:
+        """DERIVED_EVIDENCE fields currently stored on the inference ({} if absent)."""
+        if inf_id not in self.active:
+            return {}
+        records = self.client.run_query("MATCH (i:Inference {id: $id}) RETURN i.evidence AS evidence", {"id": inf_id})
+        try:
+            stored = json.loads(records[0]["evidence"] or "{}") if records else {}
+        except ValueError:
+            return {}
+        if not isinstance(stored, dict):
+            return {}
+        # Only data-derived ranking (with its posterior) replaces the static text
+        keys = [k for k in DERIVED_EVIDENCE if k in stored and (k != "ranking" or "ranking_posterior" in stored)]
+        return {k: stored[k] for k in keys}
+
+    def _retracted_edges(self, inf_id: str) -> list:
+        """[{"source", "rel", "target"}] saved when inf_id was last retracted."""
+        if inf_id in self.active:
+            return []
+        records = self.client.run_query("MATCH (s:RetractedInference {id: $id}) RETURN s.edges AS edges",
+                                        {"id": inf_id})
+        return json.loads(records[0]["edges"] or "[]") if records else []
+
+    def _stash_edges(self, inf_id: str, edges: list):
+        self.client.run_query("""
+            MERGE (stash:RetractedInference {id: $id})
+            SET stash.edges = $edges
+        """, {"id": inf_id, "edges": json.dumps(edges)})
+
+    def _assert(self, inf_id: str, observation: str):
+        content = self.content.get(inf_id, {"title": inf_id, "type": "interpretation",
+                                            "evidence": {}, "implications": [], "recommendations": []})
+        evidence = {**content["evidence"], **self._stored_evidence(inf_id), **self.computed.get(inf_id, {}),
+                    "observed": observation}
+        targets = InferencesMigration.RELATIONSHIPS.get(inf_id, {}).get("targets", [])
+        sources = self._sources(inf_id)
+        dependents = self._dependents(inf_id)
+        restored, deferred = [], {}
+        present = set(self.nodes) | self.active | {inf_id}
+        for edge in self._retracted_edges(inf_id):
+            if edge["source"] in present and edge["target"] in present:
+                restored.append(edge)
+            else:
+                # The other end is retracted too: hand the edge to its stash
+                other = edge["target"] if edge["source"] == inf_id else edge["source"]
+                deferred.setdefault(other, []).append(edge)
+        for other, edges in deferred.items():
+            self._stash_edges(other, self._retracted_edges(other) + edges)
+
+        self.client.run_query("""
+            MERGE (i:Inference {id: $id})
+            SET i.title = $title,
+                i.type = $type,
+                i.evidence = $evidence,
+                i.implications = $implications,
+                i.recommendations = $recommendations
+            WITH i
+            CALL {
+                WITH i
+                UNWIND $sources AS source_id
+                MATCH (source {id: source_id})
+                WHERE source:DataNode OR source:Inference
+                MERGE (source)-[:SUPPORTS]->(i)
+                RETURN count(*) AS supports
+            }
+            CALL {
+                WITH i
+                UNWIND $targets AS target_id
+                MATCH (target:Inference {id: target_id})
+                MERGE (i)-[:LEADS_TO]->(target)
+                RETURN count(*) AS leads
+            }
+            CALL {
+                WITH i
+                UNWIND $dependents AS dependent_id
+                MATCH (dependent:Inference {id: dependent_id})
+                MERGE (i)-[:SUPPORTS]->(dependent)
+                RETURN count(*) AS dependents
+            }
+            CALL {
+                WITH i
+                UNWIND $restored AS edge
+                MATCH (a {id: edge.source}), (b {id: edge.target})
+                WHERE (a:DataNode OR a:Inference) AND (b:DataNode OR b:Inference)
+                FOREACH (_ IN CASE WHEN edge.rel = 'SUPPORTS' THEN [1] ELSE [] END | MERGE (a)-[:SUPPORTS]->(b))
+                FOREACH (_ IN CASE WHEN edge.rel = 'LEADS_TO' THEN [1] ELSE [] END | MERGE (a)-[:LEADS_TO]->(b))
+                RETURN count(*) AS restored
+            }
+            OPTIONAL MATCH (stash:RetractedInference {id: $id})
+            DETACH DELETE stash
+            RETURN supports, leads, dependents, restored
+        """, {
+            "id": inf_id,
+            "title": content["title"],
+            "type": content["type"],
+            "evidence": json.dumps(evidence),
+            "implications": json.dumps(content["implications"]),
+            "recommendations": json.dumps(content["recommendations"]),
+            "sources": sources,
+            "targets": targets,
+            "dependents": dependents,
+            "restored": restored
+        })
+
+        change = "node_updated" if inf_id in self.active else "node_added"
+        self.pending.append(events.node_event(change, inf_id, "Inference",
+                                              title=content["title"], node_type=content["type"]))
+        self.pending.extend(events.edge_event("edge_added", s, "SUPPORTS", inf_id) for s in sources)
+        self.pending.extend(events.edge_event("edge_added", inf_id, "LEADS_TO", t) for t in targets
+                            if t in self.active)
+        self.pending.extend(events.edge_event("edge_added", inf_id, "SUPPORTS", d) for d in dependents
+                            if d in self.active)
+        self.pending.extend(events.edge_event("edge_added", e["source"], e["rel"], e["target"]) for e in restored)
+
+        self.active.add(inf_id)
+        self.observed[inf_id] = observation
+        for source_id in sources:
+            self.edges.setdefault(source_id, set()).add(inf_id)
+        self.edges.setdefault(inf_id, set()).update(
+            t for t in targets + dependents if t in self.active
+        )
+        for edge in restored:
+            self.edges.setdefault(edge["source"], set()).add(edge["target"])
+
+    def _retract(self, inf_id: str):
+        # Keep every structural edge (m002-m004 and rule-written) for a later re-assertion
+        edges = [dict(record) for record in self.client.run_query("""
+            MATCH (i:Inference {id: $id})-[r:SUPPORTS|LEADS_TO]-()
+            RETURN startNode(r).id AS source, type(r) AS rel, endNode(r).id AS target
+        """, {"id": inf_id})]
+        self._stash_edges(inf_id, edges)
+        self.client.run_query("""
+            MATCH (i:Inference {id: $id})
+            DETACH DELETE i
+        """, {"id": inf_id})
+        self.pending.append(events.node_event("node_removed", inf_id, "Inference"))
+        self.pending.extend(events.edge_event("edge_removed", e["source"], e["rel"], e["target"]) for e in edges)
+
+        self.active.discard(inf_id)
+        self.observed.pop(inf_id, None)
+        self.edges.pop(inf_id, None)
+        for targets in self.edges.values():
+            targets.discard(inf_id)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    with GraphClient() as client:
+        engine = InferenceRuleEngine(client)
+        engine.load()
+        changes = engine.evaluate()
+        logger.info(f"✨ Rules evaluated: {len(engine.order)} "
+                    f"(asserted {len(changes['asserted'])}, retracted {len(changes['retracted'])})")
@@ -0,0 +1,329 @@
+"""
+In-process full-text search over Inference nodes.
+
+An inverted index over the decoded `title`, `evidence`, `implications` and
+`recommendations` properties, ranked with BM25 (title terms weighted
+higher). Query tokens of two or more characters also match as prefixes
+("satur" -> "saturation"), through a sorted vocabulary and bisect, capped at
+MAX_PREFIX_TERMS terms. Posting lists are compiled to slot-sorted numpy
+arrays on first use. A multi-term query starts from the rarest term's
+postings and keeps the documents that contain every other term (binary
+search in each posting), so only those candidates are scored; when no
+document has them all it falls back to ranking documents with any term.
+
+The index is synced incrementally from the graph event log (graph.events):
+only inferences named in node events since the last refresh are re-read and
+re-tokenized. A full re-read happens on first use, after a migration, a
+snapshot import or clear (graph_reset), when the log was pruned past the
+last refresh, or when the inference count disagrees with the index (a
+writer that bypassed the log). While the log has not moved, a refresh issues
+no query at all.
+"""
+from bisect import bisect_left
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+
+import numpy as np
+
+from .client import GraphClient
+from .events import default_log, events_between
+from .lineage import migration_version
+
+logger = logging.getLogger(__name__)
+
+FIELDS = {"title": 2.0, "evidence": 1.0, "implications": 1.0, "recommendations": 1.0}
+K1 = 1.2
+B = 0.75
+PREFIX_WEIGHT = 0.5         # prefix-only matches count half of an exact match
+MAX_PREFIX_TERMS = 16
+MIN_PREFIX_LENGTH = 2       # shorter tokens only match exactly
+DENSE_FRACTION = 16         # terms in at least 1/16 of the documents get a dense weight vector
+MAX_EVENT_CHANGES = 20_000  # past this many events a full re-read is cheaper
+TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+
+def decode_text(value) -> str:
+    """Flatten a property (plain text or JSON-encoded dict/list) into text."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    if isinstance(value, dict):
+        return " ".join(decode_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(decode_text(v) for v in value)
+    return str(value)
+
+
+def graph_signature(client: GraphClient) -> tuple:
+    """(migrations, inference count): a change in either forces a full re-read."""
+    record = client.run_query("MATCH (i:Inference) RETURN count(i) AS n")[0]
+    return migration_version(client), record["n"]
+
+
+def changed_inferences(log, after: int, until: int):
+    """
+    Ids of inferences named in node events after `after` up to `until`, or
+    None when the events cannot be trusted for an incremental sync.
+    """
+    events = events_between(log, after, until, limit=MAX_EVENT_CHANGES)
+    if events is None or any(event["type"] == "graph_reset" for event in events):
+        return None
+    return {event["id"] for event in events
+            if event["type"].startswith("node_") and event.get("label") == "Inference"}
+
+
+class SearchIndex:
+    """Incrementally maintained BM25 inverted index of inferences."""
+
+    def __init__(self, client: GraphClient = None):
+        self.client = client
+        self.version = None       # graph_signature() at the last refresh
+        self.event_id = None      # event log id the index is current with
+        self.slots = {}           # inference id -> doc slot
+        self.docs = []            # slot -> {"id", "title", "type"} or None when deleted
+        self.hashes = {}          # inference id -> text hash
+        self.terms = {}           # slot -> {term: weighted tf}
+        self.postings = {}        # term -> {slot: weighted tf}
+        self._compiled = {}       # term -> (sorted slots, BM25 weights) arrays
+        self.lengths = np.zeros(0)
+        self.total_length = 0.0
+        self._vocabulary = None   # sorted terms, rebuilt lazily
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    # ========== ATUALIZAÇÃO ==========
+
+    def refresh(self) -> bool:
+        """Sync changes since the last refresh; returns True when anything was read."""
+        try:
+            log = default_log(self.client.database)
+            event_id = log.latest_id()
+        except Exception as e:
+            logger.warning(f"Search index: event log unavailable ({e}), re-reading all inferences")
+            log = event_id = None
+        if event_id is not None and event_id == self.event_id and self.version is not None:
+            return False
+        signature = graph_signature(self.client)
+        if self.version == signature and event_id is not None and event_id == self.event_id:
+            return False
+
+        changed = None
+        if self.version is not None and self.version[0] == signature[0] and self.event_id is not None:
+            changed = changed_inferences(log, self.event_id, event_id) if event_id is not None else None
+        if changed is None:
+            self.sync({record["id"]: dict(record) for record in self._read()})
+        else:
+            if changed:
+                documents = {record["id"]: dict(record) for record in self._read(sorted(changed))}
+                self.update(documents, [doc_id for doc_id in changed if doc_id not in documents])
+            if self.size != signature[1]:
+                logger.info("Search index: inference count drifted from the event log, re-reading all")
+                self.sync({record["id"]: dict(record) for record in self._read()})
+        self.version, self.event_id = signature, event_id
+        return True
+
+    def _read(self, ids: list = None) -> list:
+        where = "WHERE i.id IN $ids" if ids is not None else ""
+        return self.client.run_query(f"""
+            MATCH (i:Inference) {where}
+            RETURN i.id AS id, i.type AS type, i.title AS title, i.evidence AS evidence,
+                   i.implications AS implications, i.recommendations AS recommendations
+        """, {"ids": ids})
+
+    def sync(self, documents: dict) -> dict:
+        """Make the index match documents (id -> properties); returns change counts."""
+        return self.update(documents, [doc_id for doc_id in self.slots if doc_id not in documents])
+
+    def update(self, documents: dict, removed: list = ()) -> dict:
+        """Index or re-index documents (id -> properties) and drop removed ids; returns change counts."""
+        with self._lock:
+            removed = [doc_id for doc_id in removed if doc_id in self.slots]
+            for doc_id in removed:
+                self._remove(doc_id)
+            updated = 0
+            for doc_id, properties in documents.items():
+                raw = [str(properties.get(field)) for field in FIELDS] + [str(properties.get("type"))]
+                digest = hashlib.sha1("\x1f".join(raw).encode()).hexdigest()
+                if self.hashes.get(doc_id) == digest:
+                    continue
+                if doc_id in self.slots:
+                    self._remove(doc_id)
+                text = {field: decode_text(properties.get(field)) for field in FIELDS}
+                self._add(doc_id, properties, text, digest)
+                updated += 1
+            if removed or updated:
+                # BM25 weights depend on the collection size and average length
+                self._compiled = {}
+            if len(self.docs) > 2 * self.size + 1024:
+                self._compact()
+        if removed or updated:
+            logger.info(f"Search index: {updated} inferences indexed, {len(removed)} removed, {self.size} total")
+        return {"updated": updated, "removed": len(removed)}
+
+    def _add(self, doc_id: str, properties: dict, text: dict, digest: str):
+        counts = {}
+        for field, weight in FIELDS.items():
+            for term in tokenize(text[field]):
+                counts[term] = counts.get(term, 0.0) + weight
+        slot = len(self.docs)
+        self.docs.append({"id": doc_id, "title": properties.get("title"), "type": properties.get("type")})
+        self.slots[doc_id] = slot
+        self.hashes[doc_id] = digest
+        self.terms[slot] = counts
+        length = sum(counts.values())
+        if slot >= len(self.lengths):
+            self.lengths = np.concatenate([self.lengths, np.zeros(max(1024, len(self.lengths)))])
+        self.lengths[slot] = length
+        self.total_length += length
+        for term, tf in counts.items():
+            if term not in self.postings:
+                self._vocabulary = None
+            self.postings.setdefault(term, {})[slot] = tf
+
+    def _remove(self, doc_id: str):
+        slot = self.slots.pop(doc_id)
+        self.hashes.pop(doc_id, None)
+        self.docs[slot] = None
+        self.total_length -= self.lengths[slot]
+        self.lengths[slot] = 0.0
+        for term in self.terms.pop(slot, {}):
+            postings = self.postings[term]
+            postings.pop(slot, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+
+    def _compact(self):
+        """Renumber slots once deleted documents pile up."""
+        live = [slot for slot, doc in enumerate(self.docs) if doc is not None]
+        remap = {old: new for new, old in enumerate(live)}
+        self.docs = [self.docs[slot] for slot in live]
+        self.slots = {doc["id"]: slot for slot, doc in enumerate(self.docs)}
+        self.terms = {remap[slot]: counts for slot, counts in self.terms.items()}
+        self.lengths = self.lengths[live] if live else np.zeros(0)
+        self.postings = {
+            term: {remap[slot]: tf for slot, tf in postings.items()}
+            for term, postings in self.postings.items()
+        }
+        self._compiled = {}
+
+    # ========== CONSULTA ==========
+
+    def _posting(self, term: str):
+        """
+        (sorted slots, BM25 weights, dense) of a term, compiled once per index
+        version. Common terms also get `dense`, their weight per slot (0 where
+        absent), so looking candidates up is one gather instead of a search.
+        """
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            postings = self.postings[term]
+            slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            order = np.argsort(slots)
+            slots, tfs = slots[order], tfs[order]
+            n, df = self.size, len(slots)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = K1 * (1.0 - B + B * self.lengths[slots] * n / self.total_length)
+            weights = idf * tfs * (K1 + 1.0) / (tfs + norm)
+            dense = None
+            if df * DENSE_FRACTION >= n:
+                dense = np.zeros(len(self.docs))
+                dense[slots] = weights
+            compiled = (slots, weights, dense)
+            self._compiled[term] = compiled
+        return compiled
+
+    def _expand(self, token: str) -> list:
+        """(term, weight) pairs: the exact term plus up to MAX_PREFIX_TERMS terms it prefixes."""
+        if len(token) < MIN_PREFIX_LENGTH:
+            return [(token, 1.0)] if token in self.postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        matches = []
+        i = bisect_left(vocabulary, token)
+        while i < len(vocabulary) and vocabulary[i].startswith(token) and len(matches) < MAX_PREFIX_TERMS:
+            term = vocabulary[i]
+            matches.append((term, 1.0 if term == token else PREFIX_WEIGHT))
+            i += 1
+        return matches
+
+    def _token_postings(self, token: str) -> list:
+        """[(weight, compiled posting)] of every term a query token matches."""
+        return [(weight, self._posting(term)) for term, weight in self._expand(token)]
+
+    @staticmethod
+    def _lookup(group: list, candidates: np.ndarray) -> np.ndarray:
+        """Score of one query token for each (sorted) candidate slot, 0 where it does not match."""
+        scores = np.zeros(len(candidates))
+        for weight, (slots, weights, dense) in group:
+            if dense is not None:
+                scores += weight * dense[candidates]
+                continue
+            index = np.minimum(np.searchsorted(slots, candidates), len(slots) - 1)
+            hit = slots[index] == candidates
+            scores[hit] += weight * weights[index[hit]]
+        return scores
+
+    def _accumulate(self, groups: list) -> tuple:
+        """(slots matching any term, their summed scores), scattered into one array over all slots."""
+        scores = np.zeros(len(self.docs))
+        for group in groups:
+            for weight, (slots, weights, _) in group:
+                scores[slots] += weight * weights
+        candidates = np.sort(np.concatenate([posting[0] for group in groups for _, posting in group]))
+        candidates = candidates[np.r_[True, candidates[1:] != candidates[:-1]]]
+        return candidates, scores[candidates]
+
+    def search(self, query: str, limit: int = 20, type_: str = None) -> list:
+        """Top inferences by BM25 score: [{"id", "title", "type", "score"}]."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        n = self.size
+        if not tokens or not n:
+            return []
+        with self._lock:
+            groups = [group for group in (self._token_postings(token) for token in tokens) if group]
+            if not groups:
+                return []
+            # Every token must match, checked from the rarest one; with no
+            # such document, rank those matching any token instead.
+            groups.sort(key=lambda group: sum(len(posting[0]) for _, posting in group))
+            candidates = np.zeros(0, dtype=np.int64)
+            if len(groups) == len(tokens):
+                first = groups[0]
+                if len(first) == 1:
+                    candidates, scores = first[0][1][0], first[0][0] * first[0][1][1]
+                else:
+                    candidates, scores = self._accumulate([first])
+                for group in groups[1:]:
+                    token_scores = self._lookup(group, candidates)
+                    keep = token_scores > 0
+                    candidates, scores = candidates[keep], scores[keep] + token_scores[keep]
+                    if not len(candidates):
+                        break
+            if not len(candidates):
+                candidates, scores = self._accumulate(groups)
+
+            hits = np.arange(len(candidates))
+            if type_ is not None:
+                hits = hits[[self.docs[candidates[i]]["type"] == type_ for i in hits]]
+            if len(hits) > limit:
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            hits = hits[np.argsort(-scores[hits], kind="stable")]
+            return [{**self.docs[candidates[i]], "score": round(float(scores[i]), 4)} for i in hits]
@@ -0,0 +1,442 @@
+"""
+Graph snapshot export/import for fast environment bootstrap.
+
+A snapshot is a directory in the `neo4j-admin database import` CSV layout:
+
+    snapshot.json                     manifest (counts, migration versions)
+    nodes_<Label>.csv                 :ID,:LABEL,<prop>:<type>,...
+    rels_<TYPE>.csv                   :START_ID,:END_ID,:TYPE,<prop>:<type>,...
+
+or a single gzip-compressed JSON file (`--binary`). Array values are joined
+with ARRAY_DELIMITER (U+001F), which text properties do not contain; export
+refuses values that do. Import goes either through batched UNWIND writes (any
+database, online) or, for CSV snapshots, through the offline bulk importer:
+when the target is empty (or replaced) and neo4j-admin is available, the
+database is stopped, bulk imported and started again automatically.
+
+Usage:
+    python -m graph.snapshot export snapshot/            # CSV
+    python -m graph.snapshot export snapshot.json.gz --binary
+    python -m graph.snapshot import snapshot/ [--replace] [--no-bulk]
+    python -m graph.snapshot import snapshot/ --bulk     # database must be stopped
+"""
+import csv
+import datetime
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+
+from neo4j.time import Date, DateTime
+
+from migrations.marker import clear_marker
+
+from .client import GraphClient
+from .events import emit
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "snapshot.json"
+ARRAY_DELIMITER = "\x1f"          # unit separator; neo4j-admin takes it as U+001F
+LEGACY_ARRAY_DELIMITER = ";"      # snapshots whose manifest has no "array_delimiter"
+IMPORT_BATCH = 5000
+KEY_PROPERTY = "_snapshot_key"
+KEY_LABEL = "_SnapshotImport"     # on every node while importing, so lookups by key use one index
+
+PARSERS = {
+    "string": str,
+    "long": int,
+    "int": int,
+    "double": float,
+    "float": float,
+    "boolean": lambda v: v.lower() == "true",
+    "datetime": str,
+    "date": str
+}
+
+
+# ========== TIPOS ==========
+
+def value_type(value) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, (DateTime, datetime.datetime)):
+        return "datetime"
+    if isinstance(value, (Date, datetime.date)):
+        return "date"
+    if isinstance(value, (list, tuple)):
+        inner = {value_type(v) for v in value} or {"string"}
+        return (inner.pop() if len(inner) == 1 else "string") + "[]"
+    return "string"
+
+
+def merge_types(a: str, b: str) -> str:
+    if a is None or a == b:
+        return b
+    if {a, b} == {"long", "double"}:
+        return "double"
+    if a.endswith("[]") or b.endswith("[]"):
+        return "string[]"
+    return "string"
+
+
+def encode(value, kind: str):
+    """Property value as a JSON/CSV-safe primitive."""
+    if value is None:
+        return None
+    if kind.endswith("[]"):
+        return [encode(v, kind[:-2]) for v in value]
+    if kind in ("datetime", "date"):
+        return value.isoformat()
+    if kind == "string" and not isinstance(value, str):
+        return json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+    if kind == "double":
+        return float(value)
+    return value
+
+
+def _property_types(records: list) -> dict:
+    types = {}
+    for record in records:
+        for key, value in record["props"].items():
+            types[key] = merge_types(types.get(key), value_type(value))
+    return types
+
+
+# ========== EXPORTAÇÃO ==========
+
+def read_graph(client: GraphClient) -> dict:
+    """All nodes and relationships as plain records keyed by sequential ids."""
+    nodes = client.run_query("""
+        MATCH (n)
+        RETURN elementId(n) AS eid, labels(n) AS labels, properties(n) AS props
+    """)
+    keys = {record["eid"]: i for i, record in enumerate(nodes)}
+    rels = client.run_query("""
+        MATCH (a)-[r]->(b)
+        RETURN elementId(a) AS start, type(r) AS type, elementId(b) AS end, properties(r) AS props
+    """)
+    versions = sorted(
+        str(record["props"].get("version")) for record in nodes if "Migration" in record["labels"]
+    )
+    return {
+        "nodes": [{"key": keys[r["eid"]], "labels": sorted(r["labels"]), "props": dict(r["props"])}
+                  for r in nodes],
+        "relationships": [{"start": keys[r["start"]], "end": keys[r["end"]], "type": r["type"],
+                           "props": dict(r["props"])} for r in rels],
+        "migrations": versions
+    }
+
+
+def _node_groups(nodes: list) -> dict:
+    groups = {}
+    for node in nodes:
+        groups.setdefault(":".join(node["labels"]) or "_", []).append(node)
+    return groups
+
+
+def _rel_groups(rels: list) -> dict:
+    groups = {}
+    for rel in rels:
+        groups.setdefault(rel["type"], []).append(rel)
+    return groups
+
+
+def export_csv(graph: dict, directory: str) -> dict:
+    """Write the admin-import CSV layout; returns the manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"format": "csv", "migrations": graph["migrations"], "array_delimiter": ARRAY_DELIMITER,
+                "nodes": {}, "relationships": {}}
+
+    for labels, nodes in _node_groups(graph["nodes"]).items():
+        types = _property_types(nodes)
+        name = f"nodes_{labels.replace(':', '_')}.csv"
+        with open(os.path.join(directory, name), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([":ID", ":LABEL"] + [f"{key}:{kind}" for key, kind in types.items()])
+            for node in nodes:
+                writer.writerow([node["key"], labels.replace(":", ARRAY_DELIMITER)] +
+                                [_csv_value(node["props"].get(key), kind) for key, kind in types.items()])
+        manifest["nodes"][name] = {"labels": labels.split(":") if labels != "_" else [],
+                                   "count": len(nodes), "types": types}
+
+    for rel_type, rels in _rel_groups(graph["relationships"]).items():
+        types = _property_types(rels)
+        name = f"rels_{rel_type}.csv"
+        with open(os.path.join(directory, name), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([":START_ID", ":END_ID", ":TYPE"] + [f"{key}:{kind}" for key, kind in types.items()])
+            for rel in rels:
+                writer.writerow([rel["start"], rel["end"], rel_type] +
+                                [_csv_value(rel["props"].get(key), kind) for key, kind in types.items()])
+        manifest["relationships"][name] = {"type": rel_type, "count": len(rels), "types": types}
+
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _csv_value(value, kind: str) -> str:
+    value = encode(value, kind)
+    if value is None:
+        return ""
+    if kind.endswith("[]"):
+        items = [str(v).lower() if isinstance(v, bool) else str(v) for v in value]
+        if any(ARRAY_DELIMITER in item for item in items):
+            raise ValueError(f"Array value {value!r} contains the CSV array delimiter; export with --binary")
+        return ARRAY_DELIMITER.join(items)
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def export_binary(graph: dict, path: str) -> dict:
+    """Write the graph as one gzip-compressed JSON document."""
+    nodes_types = {labels: _property_types(nodes) for labels, nodes in _node_groups(graph["nodes"]).items()}
+    rel_types = {rel_type: _property_types(rels) for rel_type, rels in _rel_groups(graph["relationships"]).items()}
+    document = {
+        "format": "binary",
+        "migrations": graph["migrations"],
+        "types": {"nodes": nodes_types, "relationships": rel_types},
+        "nodes": [{**node, "props": {k: encode(v, nodes_types[":".join(node["labels"]) or "_"][k])
+                                     for k, v in node["props"].items()}} for node in graph["nodes"]],
+        "relationships": [{**rel, "props": {k: encode(v, rel_types[rel["type"]][k])
+                                            for k, v in rel["props"].items()}} for rel in graph["relationships"]]
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(document, f, separators=(",", ":"))
+    return {key: document[key] for key in ("format", "migrations", "types")}
+
+
+def export_snapshot(client: GraphClient, path: str, binary: bool = False) -> dict:
+    graph = read_graph(client)
+    manifest = export_binary(graph, path) if binary else export_csv(graph, path)
+    logger.info(f"Exported {len(graph['nodes'])} nodes, {len(graph['relationships'])} relationships to {path}")
+    return manifest
+
+
+# ========== LEITURA DO SNAPSHOT ==========
+
+def load_snapshot(path: str) -> dict:
+    """Snapshot as {"nodes", "relationships", "types", "migrations"} regardless of format."""
+    if os.path.isdir(path):
+        return _load_csv(path)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse(value: str, kind: str, delimiter: str = ARRAY_DELIMITER):
+    if value == "":
+        return None
+    if kind.endswith("[]"):
+        return [PARSERS.get(kind[:-2], str)(v) for v in value.split(delimiter)]
+    return PARSERS.get(kind, str)(value)
+
+
+def _read_rows(path: str, fixed: int, delimiter: str = ARRAY_DELIMITER) -> tuple:
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [h.rsplit(":", 1) for h in header[fixed:]]
+        for row in reader:
+            props = {key: _parse(value, kind, delimiter) for (key, kind), value in zip(columns, row[fixed:])}
+            yield row[:fixed], {k: v for k, v in props.items() if v is not None}
+
+
+def _load_csv(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    graph = {"nodes": [], "relationships": [], "migrations": manifest["migrations"],
+             "types": {"nodes": {}, "relationships": {}}}
+    delimiter = manifest.get("array_delimiter", LEGACY_ARRAY_DELIMITER)
+    for name, info in manifest["nodes"].items():
+        graph["types"]["nodes"][":".join(info["labels"]) or "_"] = info["types"]
+        for (key, _), props in _read_rows(os.path.join(directory, name), 2, delimiter):
+            graph["nodes"].append({"key": int(key), "labels": info["labels"], "props": props})
+    for name, info in manifest["relationships"].items():
+        graph["types"]["relationships"][info["type"]] = info["types"]
+        for (start, end, rel_type), props in _read_rows(os.path.join(directory, name), 3, delimiter):
+            graph["relationships"].append({"start": int(start), "end": int(end), "type": rel_type, "props": props})
+    return graph
+
+
+# ========== IMPORTAÇÃO ==========
+
+def is_empty(client: GraphClient) -> bool:
+    return not client.run_query("MATCH (n) RETURN n LIMIT 1")
+
+
+def clear(client: GraphClient):
+    client.run_query("""
+        MATCH (n)
+        CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+    """)
+    clear_marker()
+    emit([{"type": "graph_reset"}], client.database)
+
+
+def _temporal_sets(alias: str, types: dict) -> str:
+    """SET clauses turning ISO strings back into temporal values."""
+    return "".join(
+        f"\nSET {alias}.`{key}` = {kind}({alias}.`{key}`)"
+        for key, kind in types.items() if kind in ("datetime", "date")
+    )
+
+
+def import_unwind(client: GraphClient, snapshot: dict, batch: int = IMPORT_BATCH):
+    """Create all nodes and relationships with batched UNWIND writes."""
+    groups = {}
+    for node in snapshot["nodes"]:
+        groups.setdefault(tuple(node["labels"]), []).append(node)
+
+    # Every node carries KEY_LABEL until the end, so relationship endpoints are
+    # index lookups whatever their labels (label-less nodes included)
+    client.run_query(f"CREATE INDEX snapshot_key IF NOT EXISTS FOR (n:`{KEY_LABEL}`) ON (n.{KEY_PROPERTY})")
+    client.run_query("CALL db.awaitIndexes()")
+
+    for labels, nodes in groups.items():
+        label_clause = "".join(f":`{label}`" for label in labels + (KEY_LABEL,))
+        temporal = _temporal_sets("n", snapshot["types"]["nodes"].get(":".join(labels) or "_", {}))
+        query = f"""
+            UNWIND $rows AS row
+            CREATE (n{label_clause})
+            SET n = row.props, n.{KEY_PROPERTY} = row.key{temporal}
+        """
+        for start in range(0, len(nodes), batch):
+            client.run_query(query, {"rows": [{"key": n["key"], "props": n["props"]}
+                                              for n in nodes[start:start + batch]]})
+
+    for rel_type, rels in _rel_groups(snapshot["relationships"]).items():
+        temporal = _temporal_sets("r", snapshot["types"]["relationships"].get(rel_type, {}))
+        query = f"""
+            UNWIND $rows AS row
+            MATCH (a:`{KEY_LABEL}` {{{KEY_PROPERTY}: row.start}})
+            MATCH (b:`{KEY_LABEL}` {{{KEY_PROPERTY}: row.end}})
+            CREATE (a)-[r:`{rel_type}`]->(b)
+            SET r = row.props{temporal}
+        """
+        for start in range(0, len(rels), batch):
+            client.run_query(query, {"rows": rels[start:start + batch]})
+
+    client.run_query(f"""
+        MATCH (n:`{KEY_LABEL}`)
+        CALL {{ WITH n REMOVE n:`{KEY_LABEL}`, n.{KEY_PROPERTY} }} IN TRANSACTIONS OF 10000 ROWS
+    """)
+    client.run_query("DROP INDEX snapshot_key IF EXISTS")
+
+
+def admin_path() -> str:
+    """neo4j-admin executable (NEO4J_ADMIN or on PATH), or None."""
+    admin = os.getenv("NEO4J_ADMIN") or shutil.which("neo4j-admin")
+    return admin if admin and os.path.exists(admin) else None
+
+
+def bulk_import_command(directory: str, database: str, admin: str = None) -> list:
+    """neo4j-admin command line for an offline full import of a CSV snapshot."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    admin = admin or admin_path() or "neo4j-admin"
+    delimiter = manifest.get("array_delimiter", LEGACY_ARRAY_DELIMITER)
+    return (
+        [admin, "database", "import", "full", database, "--overwrite-destination=true",
+         "--multiline-fields=true", f"--array-delimiter=U+{ord(delimiter):04X}"]
+        + [f"--nodes={os.path.join(directory, name)}" for name in manifest["nodes"]]
+        + [f"--relationships={os.path.join(directory, name)}" for name in manifest["relationships"]]
+    )
+
+
+def _bulk_import(path: str, database: str):
+    command = bulk_import_command(path, database)
+    logger.info(f"Running offline import: {' '.join(command[:5])} ...")
+    subprocess.run(command, check=True)
+
+
+def _bulk_import_online(path: str, database: str) -> bool:
+    """
+    Stop `database`, bulk import the CSV snapshot and start it again. Returns
+    False, leaving the database running, when it cannot be stopped (e.g. the
+    default database of a Community server).
+    """
+    with GraphClient(database="system") as system:
+        try:
+            system.run_query(f"STOP DATABASE `{database}` WAIT")
+        except Exception as e:
+            logger.info(f"Cannot stop '{database}' for a bulk import ({e}); using UNWIND writes")
+            return False
+        try:
+            _bulk_import(path, database)
+        finally:
+            system.run_query(f"START DATABASE `{database}` WAIT")
+    return True
+
+
+def import_snapshot(path: str, database: str = None, bulk: bool = None, replace: bool = False):
+    """
+    Load a snapshot into `database`.
+
+    bulk=True runs the offline importer (CSV snapshots only, database stopped,
+    contents overwritten). bulk=False writes nodes and relationships with
+    UNWIND batches; the target must be empty unless replace=True. By default
+    (bulk=None) a CSV snapshot going into an empty or replaced database is
+    bulk imported when neo4j-admin is available, stopping and restarting the
+    database around it, and falls back to UNWIND writes otherwise.
+    """
+    database = database or os.getenv("NEO4J_DATABASE", "geoai")
+    if bulk:
+        if not os.path.isdir(path):
+            raise ValueError("The bulk importer needs a CSV snapshot directory")
+        _bulk_import(path, database)
+        clear_marker()
+        emit([{"type": "graph_reset"}], database)
+        return
+
+    with GraphClient(database=database) as client:
+        empty = is_empty(client)
+        if not empty and not replace:
+            raise RuntimeError("Target database is not empty (use replace=True / --replace)")
+    if bulk is None and os.path.isdir(path) and admin_path() and _bulk_import_online(path, database):
+        clear_marker()
+        emit([{"type": "graph_reset"}], database)
+        logger.info(f"Bulk imported {path} into an {'empty' if empty else 'replaced'} database")
+        return
+
+    snapshot = load_snapshot(path)
+    with GraphClient(database=database) as client:
+        if not empty:
+            clear(client)
+        import_unwind(client, snapshot)
+    clear_marker()
+    emit([{"type": "graph_reset"}], database)
+    logger.info(f"Imported {len(snapshot['nodes'])} nodes, {len(snapshot['relationships'])} relationships "
+                f"(migrations {', '.join(snapshot['migrations'])})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Export or import a graph snapshot")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--binary", action="store_true", help="export as one gzip-compressed JSON file")
+    parser.add_argument("--bulk", action="store_true", default=None,
+                        help="import with neo4j-admin (database stopped)")
+    parser.add_argument("--no-bulk", dest="bulk", action="store_false",
+                        help="always import with UNWIND writes, never with neo4j-admin")
+    parser.set_defaults(bulk=None)
+    parser.add_argument("--replace", action="store_true", help="clear a non-empty database before importing")
+    args = parser.parse_args()
+
+    if args.action == "export":
+        with GraphClient(database=args.database) as client:
+            export_snapshot(client, args.path, binary=args.binary)
+    else:
+        import_snapshot(args.path, args.database, bulk=args.bulk, replace=args.replace)
@@ -0,0 +1,4 @@
+"""
+Background jobs for long-running analyses (clustering, variography,
+declustering, block estimation, validation).
+"""
@@ -0,0 +1,233 @@
+"""
+Background job queue.
+
+A dispatcher thread starts up to `workers` job processes (forkserver, so
+forking never copies the server's threads), collects their results through
+pipes and records every transition in the JobStore. Submissions are keyed
+by input hash: a finished result with the same hash is returned at once as
+a cached job (except for tasks marked "cacheable": False, such as
+block_estimation, whose side effects must happen on every submission), and
+an identical queued/running job is reused instead of starting another. Cancelling a running job terminates its process.
+
+On completion the task's evidence summary is merged into the `analyses`
+entry of its Inference's evidence.
+"""
+import json
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import threading
+import time
+
+from .store import JobStore
+from .tasks import TASKS, input_hash, run_task
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = os.getenv("JOBS_DB", ".jobs.db")
+
+
+def _context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _run(kind: str, params: dict, conn):
+    """Job process entry point: sends ("done", output) or ("failed", message)."""
+    try:
+        conn.send(("done", run_task(kind, params)))
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def write_evidence(client, inference_id: str, kind: str, job_id: str, evidence: dict) -> bool:
+    """Merge a job summary into Inference.evidence["analyses"][kind]; False if the inference is missing."""
+    records = client.run_query("MATCH (i:Inference {id: $id}) RETURN i.evidence AS evidence", {"id": inference_id})
+    if not records:
+        return False
+    try:
+        current = json.loads(records[0]["evidence"] or "{}")
+    except ValueError:
+        current = {"text": records[0]["evidence"]}
+    if not isinstance(current, dict):
+        current = {"text": current}
+    analyses = current.setdefault("analyses", {})
+    analyses[kind] = {**evidence, "job_id": job_id, "computed_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    client.run_query("MATCH (i:Inference {id: $id}) SET i.evidence = $evidence",
+                     {"id": inference_id, "evidence": json.dumps(current)})
+    return True
+
+
+class JobQueue:
+    """Worker processes fed from the persistent job table."""
+
+    def __init__(self, store: JobStore = None, workers: int = None, client_factory=None, poll: float = 1.0):
+        self.store = store or JobStore(JOBS_DB)
+        self.workers = workers or int(os.getenv("JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+        # Called with no arguments for a connected GraphClient; None disables write-back
+        self.client_factory = client_factory
+        self.poll = poll
+        self.running = {}        # job id -> (process, connection)
+        self.listeners = []      # callables(job) notified on every transition
+        self._ctx = _context()
+        self._wake_r, self._wake_w = multiprocessing.Pipe(duplex=False)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ========== API ==========
+
+    def start(self):
+        if self._thread is not None:
+            return
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        self._thread = threading.Thread(target=self._loop, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, cancel_running: bool = True):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if cancel_running:
+            for job_id in list(self.running):
+                self._terminate(job_id)
+                # Back to the queue so a restart runs it again
+                self.store.transition(job_id, ("running",), "queued", started_at=None, finished_at=None)
+
+    def submit(self, kind: str, params: dict = None) -> dict:
+        """Queue a job (or return a cached/identical one). Raises ValueError on bad input."""
+        params = dict(params or {})
+        key = input_hash(kind, params)
+        if TASKS[kind].get("cacheable", True) and self.store.has_result(key):
+            job = self.store.create(kind, params, key, status="done", cached=True)
+            self._notify(job)
+            return job
+        active = self.store.active_for(key)
+        if active is not None:
+            return active
+        job = self.store.create(kind, params, key)
+        self._notify(job)
+        self._wake()
+        return job
+
+    def get(self, job_id: str) -> dict:
+        return self.store.get(job_id)
+
+    def result(self, job_id: str) -> dict:
+        """{"job", "result", "evidence"}; raises KeyError for unknown jobs, ValueError if not done."""
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job '{job_id}'")
+        if job["status"] != "done":
+            raise ValueError(f"Job {job_id} is {job['status']}")
+        return {"job": job, **self.store.get_result(job["input_hash"])}
+
+    def cancel(self, job_id: str) -> dict:
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job '{job_id}'")
+        if self.store.transition(job_id, ("queued",), "cancelled"):
+            logger.info(f"Cancelled queued job {job_id}")
+        elif job["status"] == "running":
+            with self._lock:
+                self._terminate(job_id)
+                self.store.transition(job_id, ("running",), "cancelled")
+            logger.info(f"Cancelled running job {job_id}")
+        job = self.store.get(job_id)
+        self._notify(job)
+        return job
+
+    # ========== DESPACHO ==========
+
+    def _wake(self):
+        self._wake_w.send_bytes(b"!")
+
+    def _notify(self, job: dict):
+        for listener in self.listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                logger.warning(f"Job listener failed: {e}")
+
+    def _terminate(self, job_id: str):
+        entry = self.running.pop(job_id, None)
+        if entry is None:
+            return
+        process, conn = entry
+        process.terminate()
+        process.join(5)
+        conn.close()
+
+    def _launch(self):
+        free = self.workers - len(self.running)
+        if free <= 0:
+            return
+        for job in self.store.next_queued(free):
+            with self._lock:
+                if not self.store.transition(job["id"], ("queued",), "running"):
+                    continue
+                parent, child = self._ctx.Pipe(duplex=False)
+                process = self._ctx.Process(target=_run, args=(job["kind"], job["params"], child),
+                                            name=f"job-{job['id']}")
+                process.start()
+                child.close()
+                self.running[job["id"]] = (process, parent)
+            logger.info(f"▶️  Job {job['id']} ({job['kind']}) started")
+            self._notify(self.store.get(job["id"]))
+
+    def _collect(self, job_id: str):
+        with self._lock:
+            entry = self.running.pop(job_id, None)
+        if entry is None:
+            return
+        process, conn = entry
+        try:
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            status, payload = "failed", f"Worker exited with code {process.exitcode}"
+        conn.close()
+        process.join()
+
+        job = self.store.get(job_id)
+        if status == "done":
+            self.store.put_result(job["input_hash"], job["kind"], payload["result"], payload["evidence"])
+            if self.store.transition(job_id, ("running",), "done"):
+                self._write_back(job, payload["evidence"])
+            logger.info(f"✅ Job {job_id} ({job['kind']}) done")
+        else:
+            self.store.transition(job_id, ("running",), "failed", error=payload)
+            logger.error(f"❌ Job {job_id} ({job['kind']}) failed: {payload}")
+        self._notify(self.store.get(job_id))
+
+    def _write_back(self, job: dict, evidence: dict):
+        inference_id = TASKS[job["kind"]]["inference"]
+        if self.client_factory is None or not inference_id:
+            return
+        try:
+            client = self.client_factory()
+            if write_evidence(client, inference_id, job["kind"], job["id"], evidence):
+                self.store.update(job["id"], written_back=1)
+            else:
+                logger.warning(f"Inference '{inference_id}' not found; job {job['id']} evidence not written")
+        except Exception as e:
+            logger.error(f"Could not write job {job['id']} evidence to '{inference_id}': {e}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._launch()
+            with self._lock:
+                handles = {conn: job_id for job_id, (_, conn) in self.running.items()}
+                handles.update({process.sentinel: job_id for job_id, (process, _) in self.running.items()})
+            ready = wait(list(handles) + [self._wake_r], timeout=self.poll)
+            if self._wake_r in ready:
+                while self._wake_r.poll():
+                    self._wake_r.recv_bytes()
+            for job_id in {handles[h] for h in ready if h in handles}:
+                self._collect(job_id)
@@ -0,0 +1,152 @@
+"""
+Persistent job table (SQLite).
+
+    jobs     one row per submission: kind, params, input hash, status,
+             timestamps, error, whether the result came from the cache
+    results  finished results keyed by input hash, shared by every job with
+             the same inputs
+
+Status flow: queued -> running -> done | failed | cancelled.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    written_back INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at);
+CREATE TABLE IF NOT EXISTS results (
+    input_hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    evidence TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class JobStore:
+    """Thread-safe access to the job and result tables."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _job(row) -> dict:
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["cached"] = bool(job["cached"])
+        job["written_back"] = bool(job["written_back"])
+        return job
+
+    # ========== JOBS ==========
+
+    def create(self, kind: str, params: dict, input_hash: str, status: str = "queued",
+               cached: bool = False) -> dict:
+        job_id = uuid.uuid4().hex[:16]
+        now = time.time()
+        finished = now if status in FINISHED else None
+        self._execute("""
+            INSERT INTO jobs (id, kind, params, input_hash, status, cached, submitted_at, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (job_id, kind, json.dumps(params), input_hash, status, int(cached), now, finished))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._job(rows[0] if rows else None)
+
+    def list(self, status: str = None, limit: int = 100) -> list:
+        if status:
+            rows = self._execute("SELECT * FROM jobs WHERE status = ? ORDER BY submitted_at DESC LIMIT ?",
+                                 (status, limit))
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY submitted_at DESC LIMIT ?", (limit,))
+        return [self._job(row) for row in rows]
+
+    def active_for(self, input_hash: str) -> dict:
+        """A queued or running job with these inputs, if any."""
+        rows = self._execute("""
+            SELECT * FROM jobs WHERE input_hash = ? AND status IN ('queued', 'running')
+            ORDER BY submitted_at LIMIT 1
+        """, (input_hash,))
+        return self._job(rows[0] if rows else None)
+
+    def next_queued(self, limit: int) -> list:
+        rows = self._execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY submitted_at LIMIT ?", (limit,))
+        return [self._job(row) for row in rows]
+
+    def update(self, job_id: str, **fields):
+        if not fields:
+            return
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id: str, current: tuple, status: str, **fields) -> bool:
+        """Set status only if the job is in one of `current`; returns whether it changed."""
+        fields["status"] = status
+        if status == "running":
+            fields["started_at"] = time.time()
+        if status in FINISHED:
+            fields["finished_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        marks = ", ".join("?" for _ in current)
+        with self._lock:
+            cursor = self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND status IN ({marks})",
+                                      (*fields.values(), job_id, *current))
+            return cursor.rowcount == 1
+
+    def requeue_interrupted(self) -> int:
+        """Jobs left 'running' by a stopped server go back to the queue."""
+        with self._lock:
+            cursor = self._db.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            return cursor.rowcount
+
+    # ========== RESULTADOS ==========
+
+    def put_result(self, input_hash: str, kind: str, result, evidence):
+        self._execute("""
+            INSERT OR REPLACE INTO results (input_hash, kind, result, evidence, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (input_hash, kind, json.dumps(result), json.dumps(evidence), time.time()))
+
+    def get_result(self, input_hash: str) -> dict:
+        rows = self._execute("SELECT result, evidence FROM results WHERE input_hash = ?", (input_hash,))
+        if not rows:
+            return None
+        return {"result": json.loads(rows[0]["result"]), "evidence": json.loads(rows[0]["evidence"])}
+
+    def has_result(self, input_hash: str) -> bool:
+        return bool(self._execute("SELECT 1 FROM results WHERE input_hash = ?", (input_hash,)))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
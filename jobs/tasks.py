@@ -0,0 +1,426 @@
+"""
+Long-running analyses runnable as background jobs.
+
+Each task takes a JSON params dict and returns {"result": ..., "evidence":
+...}: the full (JSON-safe) output stored with the job and a small summary
+merged into the evidence of the task's Inference when the job completes.
+Tasks run in a worker process and use one core by default (the queue is
+the parallelism); pass "workers" to let an engine use its own pool.
+
+Project-based tasks read the drillhole tables from the pipeline's columnar
+store (ingesting first if needed) and desurvey samples by minimum curvature
+over every survey station of each hole.
+"""
+from contextlib import contextmanager
+import json
+import os
+
+import numpy as np
+
+from engines.block_model import BlockModel
+from engines.declustering import DeclusteringEngine
+from engines.downhole import DownholeEngine, assign_lithology
+from engines.estimation import EstimationEngine
+from engines.validation_report import ValidationReport
+from engines.variogram import VariogramEngine, direction_vector
+from pipeline.cache import stage_key
+from pipeline.runner import Pipeline, project_files
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HOLE_COLUMNS = ("BHID", "HOLEID", "HOLE_ID")
+INGEST_LOCK = ".ingest.lock"
+
+_file_hashes = {}   # CSV path -> ((size, mtime_ns), sha256), see project_inputs
+
+
+def to_json(value):
+    """numpy-containing structure -> JSON-safe structure (NaN/inf -> None)."""
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return to_json(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+# ========== AMOSTRAS ==========
+
+def _hole_column(columns) -> str:
+    column = next((c for c in HOLE_COLUMNS if c in columns), None)
+    if column is None:
+        raise ValueError(f"No hole id column ({', '.join(HOLE_COLUMNS)}) found")
+    return column
+
+
+@contextmanager
+def _ingest_lock(project_dir: str):
+    """Serialize ingestion of one project across job processes (POSIX only)."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(project_dir, INGEST_LOCK), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def dips_down(dips) -> np.ndarray:
+    """
+    Survey dips as positive-down degrees. Exports store dips either negative
+    down (most of them) or positive down; the convention is taken from the
+    majority sign, so up-holes keep the opposite sign in either one.
+    """
+    dips = np.asarray(dips, dtype=np.float64)
+    finite = dips[np.isfinite(dips)]
+    return -dips if len(finite) and np.median(finite) < 0 else dips
+
+
+def _arc_chord(t0: np.ndarray, t1: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """Minimum-curvature displacement over `length` along an arc from tangent t0 to t1 (rows)."""
+    angle = np.arccos(np.clip((t0 * t1).sum(axis=1), -1.0, 1.0))
+    small = angle < 1e-9
+    ratio = np.where(small, 1.0, 2.0 / np.where(small, 1.0, angle) * np.tan(angle / 2.0))
+    return (length * ratio / 2.0)[:, None] * (t0 + t1)
+
+
+def desurvey(holes: np.ndarray, stations: tuple, hole_index: np.ndarray, depth: np.ndarray) -> np.ndarray:
+    """
+    Minimum-curvature offsets from the collar of points at `depth` down holes
+    `hole_index` (indices into `holes`). `stations` is (hole ids, AT, dip
+    positive-down, azimuth) over all survey records. Holes without survey are
+    vertical; the first station's direction holds up to the collar and the
+    last one's past the bottom station.
+    """
+    survey_ids, at, dip, azimuth = (np.asarray(a) for a in stations)
+    index = np.searchsorted(holes, survey_ids)
+    known = (index < len(holes)) & (holes[np.minimum(index, len(holes) - 1)] == survey_ids)
+    known &= np.isfinite(np.asarray(at, dtype=np.float64)) & np.isfinite(dip) & np.isfinite(azimuth)
+    # One collar station per hole (AT 0, direction of the first record, vertical if none)
+    first = np.full(len(holes), -1)
+    index, at, dip, azimuth = index[known], np.asarray(at, dtype=np.float64)[known], dip[known], azimuth[known]
+    order = np.lexsort((at, index))
+    index, at, dip, azimuth = index[order], at[order], dip[order], azimuth[order]
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]]) if len(index) else np.zeros(0, dtype=np.int64)
+    first[index[starts]] = starts
+    head_dip = np.where(first >= 0, dip[np.maximum(first, 0)] if len(dip) else 90.0, 90.0)
+    head_azimuth = np.where(first >= 0, azimuth[np.maximum(first, 0)] if len(azimuth) else 0.0, 0.0)
+    below = at > 0
+    station_hole = np.r_[np.arange(len(holes)), index[below]]
+    station_at = np.r_[np.zeros(len(holes)), at[below]]
+    station_dip = np.r_[head_dip, dip[below]]
+    station_azimuth = np.r_[head_azimuth, azimuth[below]]
+    order = np.lexsort((station_at, station_hole))
+    station_hole, station_at = station_hole[order], station_at[order]
+    tangent = np.stack([direction_vector(a, d) for a, d in zip(station_azimuth[order], station_dip[order])]) \
+        if len(order) else np.zeros((0, 3))
+
+    # Station offsets: cumulative arc chords, restarting at each hole's collar station
+    same = np.r_[station_hole[1:] == station_hole[:-1], False]
+    step = np.zeros((len(order), 3))
+    if len(order) > 1:
+        step[1:] = _arc_chord(tangent[:-1], tangent[1:], np.diff(station_at)) * same[:-1, None]
+    offset = np.cumsum(step, axis=0)
+    hole_start = np.searchsorted(station_hole, np.arange(len(holes)))
+    offset -= np.repeat(offset[hole_start], np.diff(np.r_[hole_start, len(order)]), axis=0)
+
+    # Segment of each point: last station of its hole at or above it
+    span = max(float(station_at.max(initial=0.0)), float(np.nanmax(depth, initial=0.0))) + 1.0
+    k = np.searchsorted(station_hole * span + station_at, hole_index * span + np.maximum(depth, 0.0),
+                        side="right") - 1
+    hole_end = np.r_[hole_start[1:], len(order)]
+    k = np.clip(k, hole_start[hole_index], hole_end[hole_index] - 1)
+    along = depth - station_at[k]
+    inside = same[k]
+    nxt = np.minimum(k + 1, len(order) - 1)
+    t0, t1 = tangent[k], tangent[nxt]
+    # Tangent at the point: slerp between the segment's stations
+    angle = np.arccos(np.clip((t0 * t1).sum(axis=1), -1.0, 1.0))
+    length = np.where(inside, station_at[nxt] - station_at[k], 1.0)
+    fraction = np.where(inside & (length > 0), along / np.where(length > 0, length, 1.0), 0.0)
+    curved = inside & (angle > 1e-9)
+    sin = np.where(curved, np.sin(angle), 1.0)
+    w0 = np.where(curved, np.sin((1.0 - fraction) * angle) / sin, 1.0 - fraction)
+    w1 = np.where(curved, np.sin(fraction * angle) / sin, fraction)
+    t = w0[:, None] * t0 + w1[:, None] * t1
+    t /= np.linalg.norm(t, axis=1, keepdims=True)
+    return offset[k] + np.where(inside[:, None], _arc_chord(t0, t, along), t0 * along[:, None])
+
+
+def samples(project_dir: str, columns: list) -> dict:
+    """
+    Assay intervals with desurveyed mid-point coordinates.
+
+    Returns {"coords": (n, 3), "hole": (n,), "depth": (n,), <column>: (n,)}.
+    Intervals of holes without a collar are dropped.
+    """
+    pipeline = Pipeline(project_dir)
+    with _ingest_lock(project_dir):
+        pipeline.ingest()
+    store = pipeline.store
+
+    assay_hole = _hole_column(store.columns("assay"))
+    assay = store.read("assay", [assay_hole, "FROM", "TO"] + [c.upper() for c in columns])
+    collar_hole = _hole_column(store.columns("collar"))
+    collar = store.read("collar", [collar_hole, "XCOLLAR", "YCOLLAR", "ZCOLLAR"])
+
+    holes, first = np.unique(np.asarray(collar[collar_hole]), return_index=True)
+    stations = (np.zeros(0, dtype=holes.dtype), np.zeros(0), np.zeros(0), np.zeros(0))
+    if "survey" in store.tables():
+        survey_hole = _hole_column(store.columns("survey"))
+        survey = store.read("survey", [survey_hole, "AT", "DIP", "BRG"])
+        stations = (np.asarray(survey[survey_hole]), np.asarray(survey["AT"], dtype=np.float64),
+                    dips_down(survey["DIP"]), np.asarray(survey["BRG"], dtype=np.float64))
+
+    ids = np.asarray(assay[assay_hole])
+    index = np.searchsorted(holes, ids)
+    found = (index < len(holes)) & (holes[np.minimum(index, len(holes) - 1)] == ids)
+    index = index[found]
+    depth = (np.asarray(assay["FROM"])[found] + np.asarray(assay["TO"])[found]) / 2.0
+    collars = np.column_stack([np.asarray(collar[c])[first] for c in ("XCOLLAR", "YCOLLAR", "ZCOLLAR")])
+    result = {
+        "coords": collars[index] + desurvey(holes, stations, index, depth),
+        "hole": ids[found],
+        "depth": depth
+    }
+    for column in columns:
+        result[column] = np.asarray(assay[column.upper()])[found]
+    return result
+
+
+def intervals(project_dir: str, element: str) -> dict:
+    """
+    Assay intervals as {"hole", "from", "to", "grade", "lithology"}. The
+    lithology is the assays' LITO column, or else the lithology table's code
+    at each interval mid-point (None when neither exists).
+    """
+    pipeline = Pipeline(project_dir)
+    with _ingest_lock(project_dir):
+        pipeline.ingest()
+    store = pipeline.store
+
+    assay_columns = store.columns("assay")
+    assay_hole = _hole_column(assay_columns)
+    columns = [assay_hole, "FROM", "TO", element.upper()] + (["LITO"] if "LITO" in assay_columns else [])
+    assay = store.read("assay", columns)
+    result = {"hole": np.asarray(assay[assay_hole]), "from": np.asarray(assay["FROM"], dtype=np.float64),
+              "to": np.asarray(assay["TO"], dtype=np.float64), "grade": np.asarray(assay[element.upper()]),
+              "lithology": np.asarray(assay["LITO"]) if "LITO" in assay else None}
+    if result["lithology"] is None and "lithology" in store.tables():
+        lith_hole = _hole_column(store.columns("lithology"))
+        lith = store.read("lithology", [lith_hole, "FROM", "TO", "LITO"])
+        result["lithology"] = assign_lithology(result["hole"], (result["from"] + result["to"]) / 2.0,
+                                               lith[lith_hole], lith["FROM"], lith["TO"], lith["LITO"])
+    return result
+
+
+def project_inputs(project_dir: str) -> dict:
+    """
+    Content hashes of the project's CSVs (for job input hashes). Hashes are
+    kept per process by size and mtime, so a submit only stats the files; the
+    pipeline's file index is consulted for the ones that changed.
+    """
+    hashes, pipeline = {}, None
+    for paths in project_files(project_dir).values():
+        for path in paths:
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            known = _file_hashes.get(path)
+            if known is None or known[0] != signature:
+                pipeline = pipeline or Pipeline(project_dir)
+                known = _file_hashes[path] = (signature, pipeline.cache.file_hash(path))
+            hashes[os.path.basename(path)] = known[1]
+    return hashes
+
+
+# ========== TAREFAS ==========
+
+def variography(params: dict) -> dict:
+    """Omni, directional and downhole experimental variograms of one element."""
+    element = params.get("element", "NI")
+    data = samples(params["project"], [element])
+    engine = VariogramEngine(data["coords"], data[element], data["hole"], data["depth"],
+                             workers=params.get("workers", 1))
+    lag, n_lags = float(params.get("lag", 25.0)), int(params.get("n_lags", 10))
+    result = {"omnidirectional": engine.omnidirectional(lag, n_lags)}
+    if params.get("directions"):
+        result["directional"] = engine.directional([tuple(d) for d in params["directions"]], lag, n_lags)
+    downhole_lag = float(params.get("downhole_lag", 1.0))
+    result["downhole"] = engine.downhole(downhole_lag, int(params.get("downhole_lags", 20)))
+    omni, downhole = result["omnidirectional"], result["downhole"]["gamma"]
+    sill = float(np.nanmax(omni["gamma"])) if np.isfinite(omni["gamma"]).any() else None
+    evidence = {"element": element, "samples": len(engine.values), "lag": lag, "n_lags": n_lags,
+                "experimental_sill": sill,
+                "downhole_first_lag_gamma": downhole[1] if len(downhole) > 1 else None}
+    return {"result": to_json(result), "evidence": to_json(evidence)}
+
+
+def downhole_trend(params: dict) -> dict:
+    """Per-hole regression of grade on depth; evidence keeps the pooled trend."""
+    element = params.get("element", "NI")
+    data = intervals(params["project"], element)
+    engine = DownholeEngine(data["hole"], data["from"], data["to"], data["grade"])
+    trends = engine.trends(bool(params.get("log", False)), int(params.get("min_samples", 3)))
+    evidence = {"element": element, **DownholeEngine.trend_summary(trends, float(params.get("interval", 50.0)))}
+    return {"result": to_json(trends), "evidence": to_json(evidence)}
+
+
+def contact_analysis(params: dict) -> dict:
+    """Lithology contacts with the grade change across each; evidence keeps the per-transition summary."""
+    element = params.get("element", "NI")
+    data = intervals(params["project"], element)
+    if data["lithology"] is None:
+        raise ValueError("No lithology column (assay LITO or a lithology table) in the project")
+    engine = DownholeEngine(data["hole"], data["from"], data["to"], data["grade"], data["lithology"])
+    window = params.get("window")
+    contacts = engine.contacts(float(window) if window is not None else None)
+    summary = DownholeEngine.contact_summary(contacts)
+    table = {k: v for k, v in contacts.items() if k not in ("lithologies", "above_code", "below_code", "hole_code")}
+    evidence = {"element": element, "window": window, "contacts": summary["contacts"],
+                "sap_lat": summary["groups"]["sap_lat"], "lat_fresh": summary["groups"]["lat_fresh"]}
+    return {"result": to_json({"contacts": table, "summary": summary}), "evidence": to_json(evidence)}
+
+
+def declustering(params: dict) -> dict:
+    """Cell declustering sweep; weights are returned, evidence keeps the optimum."""
+    element = params.get("element", "NI")
+    data = samples(params["project"], [element])
+    cell_sizes = params.get("cell_sizes") or list(np.linspace(10.0, 200.0, 20))
+    engine = DeclusteringEngine(data["coords"], data[element], workers=params.get("workers", 1))
+    result = engine.optimize(cell_sizes, params.get("anisotropy"), int(params.get("n_offsets", 8)),
+                             params.get("minimize", True))
+    evidence = {key: result[key] for key in ("naive_mean", "best_cell_size", "best_mean")}
+    evidence["element"] = element
+    return {"result": to_json(result), "evidence": to_json(evidence)}
+
+
+def kmeans(values: np.ndarray, k: int, seed: int = 0, max_iter: int = 100) -> tuple:
+    """Lloyd's k-means with k-means++ seeding; returns (centroids, labels, inertia, iterations)."""
+    rng = np.random.default_rng(seed)
+    centroids = values[[rng.integers(len(values))]]
+    for _ in range(1, k):
+        d2 = ((values[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        total = d2.sum()
+        choice = rng.choice(len(values), p=d2 / total) if total > 0 else rng.integers(len(values))
+        centroids = np.vstack([centroids, values[choice]])
+    labels = np.zeros(len(values), dtype=np.int64)
+    for iteration in range(1, max_iter + 1):
+        d2 = ((values[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = d2.argmin(axis=1)
+        counts = np.bincount(new_labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, new_labels, values)
+        moved = counts > 0
+        centroids[moved] = sums[moved] / counts[moved, None]
+        if iteration > 1 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    inertia = float(((values - centroids[labels]) ** 2).sum())
+    return centroids, labels, inertia, iteration
+
+
+def cluster_analysis(params: dict) -> dict:
+    """k-means on standardized element grades (geochemical populations)."""
+    elements = [e.upper() for e in params.get("elements", ["NI", "SI", "MG"])]
+    k = int(params.get("k", 3))
+    data = samples(params["project"], elements)
+    values = np.column_stack([data[e] for e in elements])
+    valid = np.all(np.isfinite(values), axis=1)
+    values = values[valid]
+    if len(values) < k:
+        raise ValueError(f"Need at least {k} complete samples, found {len(values)}")
+    mean, std = values.mean(axis=0), values.std(axis=0)
+    std[std == 0] = 1.0
+    centroids, labels, inertia, iterations = kmeans((values - mean) / std, k, int(params.get("seed", 0)))
+    sizes = np.bincount(labels, minlength=k)
+    clusters = [{"size": int(size), "centroid": dict(zip(elements, centroid * std + mean))}
+                for size, centroid in zip(sizes, centroids)]
+    clusters.sort(key=lambda c: -c["size"])
+    result = {"elements": elements, "k": k, "samples": int(valid.sum()), "inertia": inertia,
+              "iterations": iterations, "clusters": clusters}
+    evidence = {"k": k, "samples": int(valid.sum()),
+                "clusters": [{"share_pct": round(100.0 * c["size"] / len(values), 1),
+                              **{e: round(float(v), 3) for e, v in c["centroid"].items()}} for c in clusters]}
+    return {"result": to_json(result), "evidence": to_json(evidence)}
+
+
+def block_estimation(params: dict) -> dict:
+    """Estimate a BlockModel (OK/ID/NN) from the project's composites."""
+    element = params.get("element", "NI")
+    data = samples(params["project"], [element])
+    engine = EstimationEngine(data["coords"], data[element], params.get("variogram"), params.get("search"),
+                              power=float(params.get("power", 2.0)), workers=params.get("workers", 1))
+    model = BlockModel.open(params["model"])
+    try:
+        written = engine.estimate_model(model, params.get("method", "ok"), params.get("tiles"),
+                                        params.get("domain"), tuple(params.get("discretization", (4, 4, 4))))
+    finally:
+        model.close()
+    result = {"model": params["model"], "method": params.get("method", "ok"), "element": element,
+              "cells_written": written, "samples": len(engine.values)}
+    return {"result": result, "evidence": dict(result)}
+
+
+def validation(params: dict) -> dict:
+    """Block model validation report against the project's composites."""
+    element = params.get("element", "NI")
+    data = samples(params["project"], [element])
+    model = BlockModel.open(params["model"], mode="r")
+    try:
+        report = ValidationReport(model, data["coords"], data[element], domain=params.get("domain"),
+                                  grade=params.get("grade", "grade"))
+        result = report.build(tuple(params.get("swath_cells", (1, 1, 1))), params.get("cutoffs"),
+                              params.get("quantiles"))
+    finally:
+        model.close()
+    result = to_json(result)
+    evidence = {key: result[key] for key in ("mean_comparison", "metal_balance_final") if key in result}
+    return {"result": result, "evidence": evidence}
+
+
+# kind -> {"run", "inference" (evidence target), "version" (bump to invalidate cached results),
+#          "cacheable" (default True; False for tasks with side effects, which always run)}
+TASKS = {
+    "variography": {"run": variography, "inference": "variography", "version": "1"},
+    "declustering": {"run": declustering, "inference": "decluster_weights", "version": "1"},
+    "cluster_analysis": {"run": cluster_analysis, "inference": "cluster_analysis", "version": "1"},
+    "block_estimation": {"run": block_estimation, "inference": "estimation", "version": "1",
+                         "cacheable": False},
+    "validation": {"run": validation, "inference": "validation", "version": "1"},
+    "downhole_trend": {"run": downhole_trend, "inference": "depth_grade_trend", "version": "1"},
+    "contact_analysis": {"run": contact_analysis, "inference": "contact_analysis", "version": "1"},
+}
+
+
+def input_hash(kind: str, params: dict) -> str:
+    """Key of a job's inputs: task version, params and the content of the files it reads."""
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind '{kind}'. Available: {', '.join(sorted(TASKS))}")
+    inputs = {}
+    if "project" in params:
+        if not os.path.isdir(params["project"]):
+            raise ValueError(f"Project directory not found: {params['project']}")
+        inputs["project"] = project_inputs(params["project"])
+    if "model" in params:
+        model = BlockModel.open(params["model"], mode="r")
+        try:
+            inputs["model"] = model.fingerprint()
+        finally:
+            model.close()
+    # Runtime-only options don't change the result
+    params = {k: v for k, v in params.items() if k != "workers"}
+    return stage_key(f"job:{kind}", TASKS[kind]["version"], inputs, json.loads(json.dumps(params)))
+
+
+def run_task(kind: str, params: dict) -> dict:
+    return TASKS[kind]["run"](params)
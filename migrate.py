@@ -3,6 +3,7 @@ Migration runner for Neo4j knowledge tree.
 """
 
 import logging
+from migrations.marker import clear_marker, marker_key, read_marker, write_marker
 from migrations.m001_initial_structure import InitialStructureMigration
 from migrations.m002_inferences import InferencesMigration
 from migrations.m003_workflow_pipeline import WorkflowPipelineMigration
@@ -11,28 +12,92 @@ from migrations.m004_knowledge_web import KnowledgeWebMigration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# List all migrations in order
-MIGRATIONS = [
-    InitialStructureMigration(),
-    InferencesMigration(),
-    WorkflowPipelineMigration(),
-    KnowledgeWebMigration()
+# All migrations in order
+MIGRATION_CLASSES = [
+    InitialStructureMigration,
+    InferencesMigration,
+    WorkflowPipelineMigration,
+    KnowledgeWebMigration
 ]
 
-def run_migrations():
-    """Run all pending migrations."""
+def build_migrations(database: str = None) -> list:
+    """Migration instances targeting `database` (defaults to NEO4J_DATABASE)."""
+    return [cls(database) for cls in MIGRATION_CLASSES]
+
+MIGRATIONS = build_migrations()
+
+def _client(database: str = None):
+    from graph.client import GraphClient
+
+    return GraphClient(database=database)
+
+def update_lineage_index(database: str = None, client=None):
+    """Post-migration step: refresh ROOT_OF edges and dag_depth for changed inferences."""
+    from graph.lineage_index import LineageIndex
+
+    if client is not None:
+        LineageIndex(client).update()
+        return
+    with _client(database) as client:
+        LineageIndex(client).update()
+
+# ========== VERIFICAÇÃO RÁPIDA ==========
+
+def applied_versions(database: str = None, client=None) -> set:
+    """Versions of all applied migrations, in one query."""
+    if client is None:
+        with _client(database) as client:
+            return applied_versions(database, client)
+    records = client.run_query("MATCH (m:Migration) RETURN collect(m.version) AS versions")
+    return {str(version) for version in records[0]["versions"]}
+
+def pending_migrations(migrations: list = None, client=None) -> list:
+    """Migrations whose version has no Migration node yet."""
+    migrations = migrations or MIGRATIONS
+    applied = applied_versions(migrations[0].database, client)
+    return [m for m in migrations if str(m.version) not in applied]
+
+def migrate_if_pending(migrations: list = None, trust_marker: bool = False) -> list:
+    """
+    Startup fast path: skip the migration machinery when nothing is pending.
+
+    One query compares applied and expected versions, so a wiped or replaced
+    database is always noticed. trust_marker=True opts in to skipping even
+    that query when the local marker (migrations.marker) records the same
+    uri/database/version set. The check, the pending migrations and the
+    lineage index update share one connection. Returns the versions that
+    were applied.
+    """
+    migrations = migrations or MIGRATIONS
+    if trust_marker and read_marker() == marker_key(migrations):
+        logger.info("✨ Migrations up to date (local marker)")
+        return []
+    with _client(migrations[0].database) as client:
+        pending = pending_migrations(migrations, client)
+        if pending:
+            run_migrations(pending, client)
+        else:
+            logger.info("✨ Migrations up to date")
+    write_marker(migrations)
+    return [m.version for m in pending]
+
+def run_migrations(migrations: list = None, client=None):
+    """Run all pending migrations, on `client`'s connection when given."""
+    migrations = migrations or MIGRATIONS
     try:
-        for migration in MIGRATIONS:
-            migration.migrate()
+        for migration in migrations:
+            migration.migrate(client.driver if client is not None else None)
+        update_lineage_index(migrations[0].database, client)
         logger.info("✨ All migrations completed successfully!")
     except Exception as e:
         logger.error(f"Migration failed: {e}")
         raise
 
-def rollback_all():
+def rollback_all(migrations: list = None):
     """Rollback all migrations in reverse order."""
+    clear_marker()
     try:
-        for migration in reversed(MIGRATIONS):
+        for migration in reversed(migrations or MIGRATIONS):
             migration.rollback()
         logger.info("✨ All migrations rolled back successfully!")
     except Exception as e:
@@ -44,5 +109,7 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
         rollback_all()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--if-pending":
+        migrate_if_pending()
     else:
         run_migrations()
\ No newline at end of file
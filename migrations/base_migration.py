@@ -11,11 +11,11 @@ logger = logging.getLogger(__name__)
 class BaseMigration(ABC):
     """Base class for all migrations."""
     
-    def __init__(self):
+    def __init__(self, database: str = None):
         self.uri = os.getenv("NEO4J_URI", "neo4j://localhost:7687")
         self.user = os.getenv("NEO4J_USER", "neo4j")
         self.password = os.getenv("NEO4J_PASSWORD", "knowledge_tree_2024")
-        self.database = os.getenv("NEO4J_DATABASE", "geoai")
+        self.database = database or os.getenv("NEO4J_DATABASE", "geoai")
         self.driver = None
     
     @property
@@ -81,6 +81,40 @@ class BaseMigration(ABC):
             "description": self.description
         })
     
+    def graph_state(self) -> tuple:
+        """({node id: (label, title, type)}, {(source, rel, target)}) for DataNodes and Inferences."""
+        # Records are fetched inside the session: run_query's Result is consumed once its session closes
+        with self.driver.session(database=self.database) as session:
+            node_records = list(session.run("""
+                MATCH (n) WHERE n:DataNode OR n:Inference
+                RETURN n.id AS id, CASE WHEN n:Inference THEN 'Inference' ELSE 'DataNode' END AS label,
+                       n.title AS title, n.type AS type
+            """))
+            edge_records = list(session.run("""
+                MATCH (a)-[r:SUPPORTS|LEADS_TO]->(b)
+                RETURN a.id AS source, type(r) AS rel, b.id AS target
+            """))
+        nodes = {record["id"]: (record["label"], record["title"], record["type"]) for record in node_records}
+        edges = {(record["source"], record["rel"], record["target"]) for record in edge_records}
+        return nodes, edges
+
+    def emit_changes(self, before: tuple, after: tuple):
+        """Record node/edge additions and removals for live clients (graph.events)."""
+        from graph import events
+
+        (nodes_before, edges_before), (nodes_after, edges_after) = before, after
+        changes = []
+        for node_id, (label, title, type_) in nodes_after.items():
+            if node_id not in nodes_before:
+                changes.append(events.node_event("node_added", node_id, label, title=title, node_type=type_))
+            elif nodes_before[node_id] != (label, title, type_):
+                changes.append(events.node_event("node_updated", node_id, label, title=title, node_type=type_))
+        changes.extend(events.node_event("node_removed", node_id, label)
+                       for node_id, (label, _, _) in nodes_before.items() if node_id not in nodes_after)
+        changes.extend(events.edge_event("edge_added", *edge) for edge in edges_after - edges_before)
+        changes.extend(events.edge_event("edge_removed", *edge) for edge in edges_before - edges_after)
+        events.emit(changes, self.database)
+
     @abstractmethod
     def up(self):
         """Apply the migration."""
@@ -91,42 +125,61 @@ class BaseMigration(ABC):
         """Revert the migration."""
         pass
     
-    def migrate(self):
-        """Run the migration if not already applied."""
-        try:
+    def _open(self, driver):
+        """Use `driver` if given (owned by the caller), else connect; True when the connection is ours."""
+        if driver is None:
             self.connect()
+            return True
+        self.driver = driver
+        return False
+
+    def _release(self, owned: bool):
+        if owned:
+            self.close()
+        self.driver = None
+
+    def migrate(self, driver=None):
+        """Run the migration if not already applied (on `driver` when given, else on a new connection)."""
+        owned = False
+        try:
+            owned = self._open(driver)
             
             if self.check_if_applied():
                 logger.info(f"Migration {self.version} already applied")
                 return
             
             logger.info(f"Applying migration {self.version}: {self.description}")
+            before = self.graph_state()
             self.up()
             self.mark_as_applied()
+            self.emit_changes(before, self.graph_state())
             logger.info(f"Successfully applied migration {self.version}")
             
         except Exception as e:
             logger.error(f"Migration {self.version} failed: {e}")
             raise
         finally:
-            self.close()
+            self._release(owned)
     
-    def rollback(self):
-        """Rollback the migration if applied."""
+    def rollback(self, driver=None):
+        """Rollback the migration if applied (on `driver` when given, else on a new connection)."""
+        owned = False
         try:
-            self.connect()
+            owned = self._open(driver)
             
             if not self.check_if_applied():
                 logger.info(f"Migration {self.version} not applied")
                 return
             
             logger.info(f"Rolling back migration {self.version}")
+            before = self.graph_state()
             self.down()
             
             self.run_query("""
                 MATCH (m:Migration {version: $version})
                 DELETE m
             """, {"version": self.version})
+            self.emit_changes(before, self.graph_state())
             
             logger.info(f"Successfully rolled back migration {self.version}")
             
@@ -134,4 +187,4 @@ class BaseMigration(ABC):
             logger.error(f"Rollback of migration {self.version} failed: {e}")
             raise
         finally:
-            self.close()
+            self._release(owned)
@@ -461,8 +461,9 @@ class InferencesMigration(BaseMigration):
                 })
     
     def down(self):
-        # Remove all inference nodes
+        # Remove all inference nodes (and the edges kept for retracted ones)
         self.run_query("""
-            MATCH (n:Inference)
+            MATCH (n)
+            WHERE n:Inference OR n:RetractedInference
             DETACH DELETE n
         """)
@@ -0,0 +1,36 @@
+"""
+Local marker of the last fully migrated uri/database/version set.
+
+Only an opt-in shortcut for start.py: anything that replaces or wipes the
+graph (snapshot import, clear, rollback) removes it, so the next start
+queries Neo4j for the applied versions again.
+"""
+import json
+import os
+
+MARKER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           ".migrations_applied.json")
+
+
+def marker_key(migrations: list) -> dict:
+    first = migrations[0]
+    return {"uri": first.uri, "database": first.database,
+            "versions": sorted(str(m.version) for m in migrations)}
+
+
+def read_marker() -> dict:
+    try:
+        with open(MARKER_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_marker(migrations: list):
+    with open(MARKER_PATH, "w") as f:
+        json.dump(marker_key(migrations), f)
+
+
+def clear_marker():
+    if os.path.exists(MARKER_PATH):
+        os.remove(MARKER_PATH)
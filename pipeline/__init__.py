@@ -0,0 +1,3 @@
+"""
+Analysis pipeline: drillhole CSVs -> cached stage artifacts -> DataNode stats.
+"""
@@ -0,0 +1,165 @@
+"""
+Content-addressed artifact cache for pipeline stages.
+
+Artifacts are keyed by a hash of the stage name and version, the content
+hashes of its input files, the keys of upstream artifacts and the stage
+parameters. They are pickled under `<root>/<key[:2]>/<key>.pkl`; a stage
+result of None is stored as a NoneResult marker so it is a hit like any
+other value. The store is size-bounded: its total size is measured once and
+then tracked on every put and removal, and only when it grows past
+`max_bytes` is the store walked to evict the least recently used artifacts
+(by file mtime, refreshed on every hit) and the total re-measured, which
+also picks up artifacts written by other processes.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+FILE_INDEX = "files.json"
+
+
+def stage_key(stage: str, version: str, inputs: dict = None, params: dict = None) -> str:
+    """Deterministic key for a stage run."""
+    payload = json.dumps({
+        "stage": stage,
+        "version": version,
+        "inputs": inputs or {},
+        "params": params or {}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class NoneResult:
+    """Pickled in place of a stage result of None."""
+
+
+class ArtifactCache:
+    """Size-bounded on-disk LRU store of stage artifacts."""
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._file_index_path = os.path.join(root, FILE_INDEX)
+        self._file_index = self._load_file_index()
+        self._total = None        # bytes of artifacts, measured on first put
+
+    # ========== HASH DE ARQUIVOS ==========
+
+    def _load_file_index(self) -> dict:
+        try:
+            with open(self._file_index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_file_index(self):
+        self._atomic_write(self._file_index_path, json.dumps(self._file_index).encode())
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 of a file, re-hashed only when its size or mtime changes."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        entry = self._file_index.get(path)
+        if entry and entry["signature"] == signature:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        self._file_index[path] = {"signature": signature, "sha256": digest.hexdigest()}
+        self._save_file_index()
+        return digest.hexdigest()
+
+    # ========== ARTEFATOS ==========
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def _load(self, key: str) -> tuple:
+        """(found, value); a hit marks the artifact as recently used."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Discarding unreadable artifact {key}: {e}")
+            self._remove(path)
+            return False, None
+        os.utime(path)
+        return True, None if isinstance(value, NoneResult) else value
+
+    def get(self, key: str):
+        """Cached artifact or None; a hit marks the artifact as recently used."""
+        return self._load(key)[1]
+
+    def put(self, key: str, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = pickle.dumps(NoneResult() if value is None else value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._total is None:
+            self._total = self._measure()[0]
+        try:
+            self._total -= os.path.getsize(path)
+        except OSError:
+            pass
+        self._atomic_write(path, data)
+        self._total += len(data)
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key: str, compute):
+        """Return (value, hit)."""
+        found, value = self._load(key)
+        if found:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def _measure(self) -> tuple:
+        """(total bytes, [(mtime, size, path)]) of every artifact on disk."""
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return sum(size for _, size, _ in entries), entries
+
+    def evict(self):
+        """Drop least recently used artifacts until the store fits max_bytes."""
+        total, entries = self._measure()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            logger.info(f"Evicted artifact {os.path.basename(path)}")
+        self._total = total
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _atomic_write(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
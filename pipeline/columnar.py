@@ -0,0 +1,378 @@
+"""
+Columnar intermediate store for ingested drillhole tables.
+
+CSV tables are parsed once, normalized (upper-case column names, numeric
+columns as float64, the rest as fixed-width strings) and persisted with one
+file per column. Rows are sorted by partition key (hole or campaign) and a
+partition is a row range (offset, rows) recorded in the manifest, so a table
+has one file per column however many holes it has. Hole and campaign ids
+always stay strings ("0012" is not 12.0). Ingestion streams the CSVs in
+chunks, spilling each chunk sorted by partition key, then assembles the
+partitions one at a time from memory-mapped slices of the spilled chunks
+into their offsets of the output, so memory holds one chunk or one
+partition, never the whole table. Readers ask only for the columns they
+need and get memory-mapped arrays back, so repeated analyses pay I/O for
+those columns only.
+
+A view is a table stored as the list of the tables it unions (one per
+source CSV, see Pipeline), so a changed file is parsed again on its own and
+the rows are stored once.
+
+With pyarrow installed, a table is one zstd-compressed Parquet file whose
+row groups hold whole partitions (about ROW_GROUP_ROWS rows each), read
+with column projection and memory mapping. Without it, each column is a
+`.npy` file opened with `mmap_mode="r"`.
+
+Layout:
+    <root>/<table>/table.json          manifest (partitions as row ranges, or the parts of a view)
+    <root>/<table>/<COLUMN>.npy        numpy backend
+    <root>/<table>/table.parquet       parquet backend
+"""
+import json
+import logging
+import os
+import re
+import shutil
+
+import numpy as np
+
+from engines.tables import DEFAULT_CHUNK_ROWS, MISSING, iter_csv_chunks, read_header, to_float
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "table.json"
+PARQUET_FILE = "table.parquet"
+SINGLE_PARTITION = "all"
+FORMAT = 4                # bump when the stored layout or typing changes
+ID_COLUMNS = {"BHID", "HOLEID", "HOLE_ID", "CAMPAIGN"}
+ROW_GROUP_ROWS = 65536    # parquet row groups gather whole partitions up to about this size
+
+
+def partition_name(value: str) -> str:
+    """Filesystem-safe partition directory name for a hole id or campaign."""
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(value).strip()) or "_"
+    return name.lstrip(".") or "_"
+
+
+def _parse_numeric(values: np.ndarray):
+    """float64 array, or None when some non-missing entry is not a number."""
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        pass
+    parsed = to_float(values)
+    invalid = np.isnan(parsed) & ~np.isin(np.char.lower(values), list(MISSING))
+    return None if invalid.any() else parsed
+
+
+class ColumnStore:
+    """Column-per-file store of normalized drillhole tables, partitioned by row ranges."""
+
+    def __init__(self, root: str, backend: str = None):
+        self.root = root
+        self.backend = backend or ("parquet" if pq is not None else "numpy")
+        if self.backend == "parquet" and pq is None:
+            raise ImportError("The parquet backend requires pyarrow")
+        os.makedirs(root, exist_ok=True)
+
+    def _table_dir(self, table: str) -> str:
+        return os.path.join(self.root, table)
+
+    def manifest(self, table: str) -> dict:
+        try:
+            with open(os.path.join(self._table_dir(table), MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Table '{table}' not in store {self.root}")
+
+    def tables(self) -> list:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, MANIFEST))
+        )
+
+    def columns(self, table: str) -> dict:
+        """Column name -> "numeric" | "string"."""
+        return self.manifest(table)["columns"]
+
+    def partitions(self, table: str) -> list:
+        manifest = self.manifest(table)
+        if "parts" in manifest:
+            return [f"{part}/{name}" for part in manifest["parts"] for name in self.partitions(part)]
+        return list(manifest["partitions"])
+
+    # ========== INGESTÃO ==========
+
+    def current(self, table: str, sources: dict) -> bool:
+        """True when the table was stored from exactly these sources in the current format."""
+        try:
+            manifest = self.manifest(table)
+        except KeyError:
+            return False
+        return manifest.get("format") == FORMAT and manifest["sources"] == sources
+
+    def drop(self, table: str):
+        shutil.rmtree(self._table_dir(table), ignore_errors=True)
+
+    def define_view(self, table: str, parts: list, sources: dict = None) -> dict:
+        """Store `table` as the union of the stored tables `parts` (in order); no rows are copied."""
+        columns = {}
+        for part in parts:
+            for column, kind in self.columns(part).items():
+                columns[column] = "string" if columns.get(column, kind) != kind else kind
+        manifest = {"table": table, "format": FORMAT, "parts": list(parts), "columns": columns,
+                    "sources": sources or {}}
+        tmp_dir = f"{self._table_dir(table)}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(self._table_dir(table), ignore_errors=True)
+        os.replace(tmp_dir, self._table_dir(table))
+        return manifest
+
+    def ingest_csv(self, table: str, paths: list, partition_by: str = None, sources: dict = None,
+                   text_columns: list = (), chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+        """
+        Parse CSV files into the store, replacing any previous version of the table.
+
+        Rows are grouped by `partition_by` (e.g. BHID or CAMPAIGN); without it
+        the table is a single partition. `sources` (path -> content hash) is
+        recorded in the manifest so callers can skip unchanged inputs.
+        ID_COLUMNS and `text_columns` are stored as strings even when every
+        value looks like a number.
+        """
+        partition_by = partition_by.upper() if partition_by else None
+        header = []
+        for path in paths:
+            header += [c for c in read_header(path) if c and c not in header]
+        if partition_by and partition_by not in header:
+            raise KeyError(f"Partition column '{partition_by}' not found in {table}")
+        text = ID_COLUMNS | {c.upper() for c in text_columns}
+        numeric = {c: c not in text for c in header}
+
+        tmp_dir = f"{self._table_dir(table)}.{os.getpid()}.tmp"
+        spill_dir = os.path.join(tmp_dir, ".chunks")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(spill_dir)
+        try:
+            # Pass 1: one chunk in memory at a time, spilled sorted by partition key
+            names, spans, rows = {}, {}, 0   # key -> partition name; key -> [(chunk, lo, hi)]
+            chunk_count = 0
+            for path in paths:
+                file_header = read_header(path)
+                present = [c for c in header if c in file_header]
+                if not present:
+                    continue
+                for chunk in iter_csv_chunks(path, present, chunk_rows=chunk_rows):
+                    n = len(chunk[present[0]])
+                    rows += n
+                    chunk = {c: chunk[c] if c in chunk else np.full(n, "") for c in header}
+                    for column in header:
+                        if numeric[column] and _parse_numeric(chunk[column]) is None:
+                            numeric[column] = False
+                    # Group rows by partition key with one stable sort instead of a mask per key
+                    keys = chunk[partition_by] if partition_by else np.full(n, SINGLE_PARTITION)
+                    order = np.argsort(keys, kind="stable")
+                    for column in header:
+                        np.save(os.path.join(spill_dir, f"{chunk_count}.{column}.npy"), chunk[column][order])
+                    values, starts = np.unique(keys[order], return_index=True)
+                    for key, lo, hi in zip(values, starts, list(starts[1:]) + [n]):
+                        key = str(key)
+                        if key not in names:
+                            name = partition_name(key)
+                            while name in spans:
+                                name += "_"
+                            names[key], spans[name] = name, []
+                        spans[names[key]].append((chunk_count, int(lo), int(hi)))
+                    chunk_count += 1
+
+            # Pass 2: partitions in key order at their row offsets, typed with what pass 1 learned
+            columns = {c: "numeric" if numeric[c] else "string" for c in header}
+            spilled = {(i, c): np.load(os.path.join(spill_dir, f"{i}.{c}.npy"), mmap_mode="r")
+                       for i in range(chunk_count) for c in header}
+            partitions, offset = {}, 0
+            for key in sorted(names):
+                size = sum(hi - lo for _, lo, hi in spans[names[key]])
+                partitions[names[key]] = {"key": key, "offset": offset, "rows": size}
+                offset += size
+
+            def partition(name: str, column: str) -> np.ndarray:
+                values = np.concatenate([spilled[i, column][lo:hi] for i, lo, hi in spans[name]])
+                return _parse_numeric(values) if numeric[column] else values
+
+            if self.backend == "parquet":
+                row_groups = self._write_parquet(tmp_dir, header, partitions, partition)
+            else:
+                row_groups = None
+                self._write_numpy(tmp_dir, header, numeric, spilled, rows, partitions, partition)
+            del spilled
+            shutil.rmtree(spill_dir)
+
+            manifest = {
+                "table": table,
+                "format": FORMAT,
+                "backend": self.backend,
+                "partition_by": partition_by,
+                "columns": columns,
+                "rows": rows,
+                "partitions": partitions,
+                "row_groups": row_groups,
+                "sources": sources or {}
+            }
+            with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        shutil.rmtree(self._table_dir(table), ignore_errors=True)
+        os.replace(tmp_dir, self._table_dir(table))
+        logger.info(f"Stored {table}: {rows} rows, {len(columns)} columns, "
+                    f"{len(partitions)} partitions ({self.backend})")
+        return manifest
+
+    @staticmethod
+    def _write_numpy(table_dir: str, header: list, numeric: dict, spilled: dict, rows: int,
+                     partitions: dict, partition):
+        """One .npy per column, filled one partition at a time at its offset."""
+        for column in header:
+            if numeric[column]:
+                dtype = np.dtype(np.float64)
+            else:
+                dtype = np.result_type(*[array.dtype for (_, c), array in spilled.items() if c == column]) \
+                    if rows else np.dtype("U1")
+            path = os.path.join(table_dir, f"{column}.npy")
+            if not rows:
+                np.save(path, np.zeros(0, dtype=dtype))
+                continue
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(rows,))
+            for name, info in partitions.items():
+                out[info["offset"]:info["offset"] + info["rows"]] = partition(name, column)
+            out.flush()
+            del out
+
+    @staticmethod
+    def _write_parquet(table_dir: str, header: list, partitions: dict, partition) -> list:
+        """One Parquet file, whole partitions per row group; returns the row group offsets."""
+        path = os.path.join(table_dir, PARQUET_FILE)
+        writer, row_groups, buffered, size, offset = None, [], [], 0, 0
+
+        def flush():
+            nonlocal writer
+            data = pa.table({c: np.concatenate([part[c] for part in buffered]) for c in header})
+            writer = writer or pq.ParquetWriter(path, data.schema, compression="zstd")
+            writer.write_table(data, row_group_size=len(data) or 1)
+            row_groups.append(offset - size)
+
+        try:
+            for name, info in partitions.items():
+                buffered.append({c: partition(name, c) for c in header})
+                size += info["rows"]
+                offset += info["rows"]
+                if size >= ROW_GROUP_ROWS:
+                    flush()
+                    buffered, size = [], 0
+            if buffered or writer is None:
+                if not buffered:
+                    buffered = [{c: np.zeros(0) for c in header}]
+                flush()
+        finally:
+            if writer is not None:
+                writer.close()
+        return row_groups
+
+    # ========== LEITURA ==========
+
+    def read_partition(self, table: str, partition: str, columns: list = None) -> dict:
+        """{column: array} for one partition; only the requested columns are read."""
+        manifest = self.manifest(table)
+        if "parts" in manifest:
+            part, _, partition = partition.partition("/")
+            return self.read_partition(part, partition, columns)
+        return self._read(manifest, partition, columns)
+
+    def _columns(self, manifest: dict, columns: list = None) -> list:
+        columns = [c.upper() for c in (manifest["columns"] if columns is None else columns)]
+        missing = [c for c in columns if c not in manifest["columns"]]
+        if missing:
+            raise KeyError(f"{manifest['table']}: missing columns {missing}")
+        return columns
+
+    def _read(self, manifest: dict, partition: str = None, columns: list = None) -> dict:
+        """One partition, or the whole table when partition is None."""
+        table = manifest["table"]
+        columns = self._columns(manifest, columns)
+        info = manifest["partitions"][partition] if partition is not None else None
+
+        if manifest["backend"] == "parquet":
+            if pq is None:
+                raise ImportError(f"Table '{table}' was stored as parquet; install pyarrow to read it")
+            path = os.path.join(self._table_dir(table), PARQUET_FILE)
+            if info is None:
+                data = pq.read_table(path, columns=columns, memory_map=True)
+                return {c: data.column(c).to_numpy() for c in columns}
+            starts = manifest["row_groups"]
+            stop = info["offset"] + info["rows"]
+            first = int(np.searchsorted(starts, info["offset"], side="right")) - 1
+            last = int(np.searchsorted(starts, stop - 1, side="right")) - 1 if info["rows"] else first
+            data = pq.ParquetFile(path, memory_map=True).read_row_groups(range(first, last + 1), columns=columns)
+            lo = info["offset"] - starts[first]
+            return {c: data.column(c).to_numpy()[lo:lo + info["rows"]] for c in columns}
+
+        directory = self._table_dir(table)
+        arrays = {c: np.load(os.path.join(directory, f"{c}.npy"), mmap_mode="r") for c in columns}
+        if info is None:
+            return arrays
+        return {c: values[info["offset"]:info["offset"] + info["rows"]] for c, values in arrays.items()}
+
+    @staticmethod
+    def _fill(manifest: dict, data: dict, columns: list, rows: int) -> dict:
+        """A view part's `rows` rows, with the view's columns it lacks as NaN / empty strings."""
+        return {c: data[c] if c in data else
+                (np.full(rows, np.nan) if manifest["columns"][c] == "numeric" else np.full(rows, ""))
+                for c in columns}
+
+    def iter_partitions(self, table: str, columns: list = None, partitions: list = None):
+        """Yield (partition key, {column: array}) one partition at a time."""
+        manifest = self.manifest(table)
+        if "parts" in manifest:
+            columns = self._columns(manifest, columns)
+            for part in manifest["parts"]:
+                part_manifest = self.manifest(part)
+                present = [c for c in columns if c in part_manifest["columns"]]
+                for name, info in part_manifest["partitions"].items():
+                    if partitions is None or info["key"] in partitions:
+                        data = self._read(part_manifest, name, present)
+                        yield info["key"], self._fill(manifest, data, columns, info["rows"])
+            return
+        for name, info in manifest["partitions"].items():
+            if partitions is not None and info["key"] not in partitions:
+                continue
+            yield info["key"], self._read(manifest, name, columns)
+
+    def read(self, table: str, columns: list = None, partitions: list = None) -> dict:
+        """Requested columns over the selected partitions (memory-mapped as a whole when not filtered)."""
+        manifest = self.manifest(table)
+        if partitions is None and "parts" not in manifest:
+            return self._read(manifest, None, columns)
+        if partitions is None:
+            columns = self._columns(manifest, columns)
+            parts = []
+            for part in manifest["parts"]:
+                part_manifest = self.manifest(part)
+                data = self._read(part_manifest, None, [c for c in columns if c in part_manifest["columns"]])
+                parts.append(self._fill(manifest, data, columns, part_manifest["rows"]))
+        else:
+            parts = [data for _, data in self.iter_partitions(table, columns, partitions)]
+        if not parts:
+            return {c.upper(): np.zeros(0) for c in (columns or self.columns(table))}
+        if len(parts) == 1:
+            return parts[0]
+        return {c: np.concatenate([part[c] for part in parts]) for c in parts[0]}
@@ -0,0 +1,200 @@
+"""
+Incremental context.json generator.
+
+Builds the table sections of context.json (collar, survey, assay, lithology
+with column, render_type, stats/distribution) from the DataNodes in Neo4j or
+from pipeline results, keeping the hand-written sections (data_nodes,
+inferences, knowledge_graph) as they are. A leaf already in context.json
+only gets its stats/distribution refreshed; its column name, render_type
+and any other field stay as written (e.g. "NI_PCT", "pie_chart"). New
+leaves are added with every field of the node entry.
+
+Every top-level section is hashed on its source data and kept pre-minified in
+a sidecar cache; only sections whose hash changed are re-serialized, and the
+file is only rewritten when some section changed.
+
+Usage:
+    python -m pipeline.context --from-graph
+    python -m pipeline.context --from-project <project_dir> [--output context.json]
+"""
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from .stages import DATA_NODE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORDER = ["collar", "survey", "assay", "lithology"]
+SECTION_CACHE = ".context_sections.json"
+
+# Graph render types -> renderer names understood by transformContextToTree.js
+RENDER_TYPES = {"value": "simple_value"}
+# Leaf fields refreshed on leaves that already exist in context.json
+DATA_FIELDS = ("stats", "distribution")
+
+
+def minify(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def section_hash(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ========== FONTES ==========
+
+def nodes_from_graph(client) -> dict:
+    """DataNode id -> leaf entry, for nodes with a render_type."""
+    nodes = {}
+    for record in client.run_query("""
+        MATCH (n:DataNode)
+        WHERE n.render_type IS NOT NULL
+        RETURN n.id AS id, n.column AS column, n.render_type AS render_type,
+               n.stats AS stats, n.distribution AS distribution, n.value AS value
+    """):
+        entry = {"render_type": RENDER_TYPES.get(record["render_type"], record["render_type"])}
+        if record["column"]:
+            entry["column"] = record["column"]
+        if record["stats"]:
+            entry["stats"] = json.loads(record["stats"])
+        if record["distribution"]:
+            entry["distribution"] = json.loads(record["distribution"])
+        if record["value"] is not None:
+            entry["value"] = record["value"]
+        nodes[record["id"]] = entry
+    return nodes
+
+
+def nodes_from_pipeline(results: dict) -> dict:
+    """DataNode id -> leaf entry from Pipeline.run() stats."""
+    nodes = {}
+    for node_id, values in results["stats"].items():
+        _, column, kind = DATA_NODE_COLUMNS[node_id]
+        entry = {"column": column}
+        if kind == "stats":
+            entry["render_type"] = "stats_summary"
+            entry["stats"] = values["stats"]
+        else:
+            entry["distribution"] = values["distribution"]
+        nodes[node_id] = entry
+    return nodes
+
+
+# ========== GERAÇÃO ==========
+
+class ContextGenerator:
+    """Writes context.json, re-serializing only the sections whose sources changed."""
+
+    def __init__(self, path: str = "context.json"):
+        self.path = path
+        self.cache_path = os.path.join(os.path.dirname(os.path.abspath(path)), SECTION_CACHE)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _load_cache(self) -> dict:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge_section(self, current: dict, nodes: list) -> dict:
+        """Current section with the node entries (id = dotted path) merged into its leaves."""
+        section = copy.deepcopy(current) if isinstance(current, dict) else {}
+        for path, entry in nodes:
+            target = section
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            leaf = target.get(path[-1])
+            if isinstance(leaf, dict) and leaf:
+                leaf.update({field: entry[field] for field in DATA_FIELDS if field in entry})
+                continue
+            leaf = target[path[-1]] = dict(entry)
+            leaf.setdefault("render_type", "distribution" if "distribution" in entry else "stats_summary")
+        return section
+
+    def generate(self, nodes: dict) -> dict:
+        """Update context.json from DataNode entries; returns {"changed": [...], "written": bool}."""
+        context = self._load()
+        cache = self._load_cache()
+
+        grouped = {}
+        for node_id, entry in sorted(nodes.items()):
+            section, *path = node_id.split(".")
+            if path:
+                grouped.setdefault(section, []).append((path, entry))
+
+        order = list(context.get("display_order") or DEFAULT_ORDER)
+        order += [section for section in grouped if section not in order]
+        sections = {"display_order": order}
+        sections.update({key: value for key, value in context.items() if key != "display_order"})
+        for section in grouped:
+            sections.setdefault(section, {})
+
+        changed, fragments = [], {}
+        for key, value in sections.items():
+            source = {"current": value, "nodes": grouped.get(key)}
+            digest = section_hash(source)
+            cached = cache.get(key)
+            if cached and cached["hash"] == digest:
+                fragments[key] = cached
+                continue
+            if key in grouped:
+                merged = self._merge_section(value, grouped[key])
+                new_digest = section_hash({"current": merged, "nodes": grouped[key]})
+                if merged != value:
+                    changed.append(key)
+            else:
+                merged, new_digest = value, digest
+            # Keyed on the merged section so the next run with the same sources is a cache hit
+            fragments[key] = {"hash": new_digest, "json": minify(merged)}
+
+        stale_file = set(cache) != set(fragments)
+        if not changed and not stale_file and os.path.exists(self.path):
+            logger.info("context.json up to date")
+            return {"changed": [], "written": False}
+
+        body = "{" + ",".join(f"{minify(key)}:{fragments[key]['json']}" for key in fragments) + "}"
+        self._atomic_write(self.path, body)
+        self._atomic_write(self.cache_path, json.dumps(fragments))
+        logger.info(f"Wrote {self.path} ({len(body)} bytes); changed sections: {changed or 'none'}")
+        return {"changed": changed, "written": True}
+
+    def _atomic_write(self, path: str, text: str):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Generate context.json from the graph or a project")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-graph", action="store_true")
+    source.add_argument("--from-project", metavar="PROJECT_DIR")
+    parser.add_argument("--output", default="context.json")
+    args = parser.parse_args()
+
+    if args.from_graph:
+        from graph.client import GraphClient
+
+        with GraphClient() as client:
+            nodes = nodes_from_graph(client)
+    else:
+        from .runner import Pipeline
+
+        nodes = nodes_from_pipeline(Pipeline(args.from_project).run())
+
+    ContextGenerator(args.output).generate(nodes)
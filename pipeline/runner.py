@@ -0,0 +1,291 @@
+"""
+Incremental analysis pipeline.
+
+Discovers the drillhole CSVs of a project, runs the per-file stages through
+the artifact cache and merges the partials into DataNode stats, capping
+proposals, correlation matrices and the deposit-type ranking. Only files
+whose content changed are re-read, and each is parsed once into its own
+table of the columnar store (`<table>.<file>`), from which every per-file
+stage reads just its columns. Merge stages are keyed by the keys of
+their partials, so they are reused too when nothing upstream changed.
+`ingest` makes each drillhole table a view over its files' tables for
+column-wise reads by later analyses, so rows are stored once. `publish` writes the stats through the rule engine,
+which re-evaluates only the affected inferences, and the ranking into the
+`ni_lateritico` evidence.
+
+Usage:
+    python -m pipeline.runner <project_dir> [--ingest] [--publish]
+"""
+import argparse
+import fnmatch
+import logging
+import os
+import time
+
+from engines.capping import ALL_DOMAINS, CappingEngine
+from engines.correlation import CorrelationEngine
+from engines.tables import read_header
+
+from .cache import ArtifactCache, stage_key
+from .columnar import ColumnStore, partition_name
+from .stages import (
+    ELEMENTS, TABLE_PATTERNS, capping_file, correlation_file, data_node_stats,
+    merge_profiles, merge_rankings, profile_file, ranking_file, table_columns, text_columns
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when a stage's output format or logic changes to invalidate its artifacts
+STAGE_VERSIONS = {
+    "profile": "2",
+    "capping": "2",
+    "correlation": "2",
+    "stats": "1",
+    "capping_merge": "1",
+    "correlation_merge": "1",
+    "ranking": "3",
+    "ranking_merge": "2"
+}
+RANKING_INFERENCE = "ni_lateritico"
+CACHE_DIR = ".pipeline_cache"
+COLUMNAR_DIR = ".columnar"
+
+# Partition columns for the columnar store, first match wins; collars are small
+# so they are only split by campaign
+PARTITION_COLUMNS = {
+    "collar": ["CAMPAIGN"],
+    "survey": ["CAMPAIGN", "BHID", "HOLEID", "HOLE_ID"],
+    "assay": ["CAMPAIGN", "BHID", "HOLEID", "HOLE_ID"],
+    "lithology": ["CAMPAIGN", "BHID", "HOLEID", "HOLE_ID"]
+}
+
+
+def project_files(project_dir: str) -> dict:
+    """table -> sorted CSV paths of a project matching TABLE_PATTERNS (case-insensitive)."""
+    names = os.listdir(project_dir)
+    found = {}
+    for table, pattern in TABLE_PATTERNS.items():
+        matches = {name for name in names if fnmatch.fnmatch(name.lower(), pattern)}
+        found[table] = sorted(os.path.join(project_dir, name) for name in matches)
+    return found
+
+
+class Pipeline:
+    """Cached drillhole statistics pipeline for one project directory."""
+
+    def __init__(self, project_dir: str, cache: ArtifactCache = None, elements: list = None,
+                 store: ColumnStore = None):
+        self.project_dir = project_dir
+        self.cache = cache or ArtifactCache(os.path.join(project_dir, CACHE_DIR))
+        self.store = store or ColumnStore(os.path.join(project_dir, COLUMNAR_DIR))
+        self.elements = list(elements or ELEMENTS)
+        self.report = []   # [{"stage", "key", "file", "status", "seconds"}]
+
+    def files(self) -> dict:
+        """table -> sorted CSV paths matching TABLE_PATTERNS (case-insensitive)."""
+        return project_files(self.project_dir)
+
+    def _stage(self, stage: str, inputs: dict, params: dict, compute, label: str = ""):
+        key = stage_key(stage, STAGE_VERSIONS[stage], inputs, params)
+        start = time.time()
+        value, hit = self.cache.get_or_compute(key, compute)
+        self.report.append({
+            "stage": stage,
+            "key": key[:12],
+            "file": label,
+            "status": "cached" if hit else "computed",
+            "seconds": round(time.time() - start, 3)
+        })
+        return key, value
+
+    def _file_stage(self, stage: str, table: str, path: str, params: dict, compute):
+        """Cached per-file stage; compute(store, name) reads the file's table on a miss."""
+        inputs = {"file": os.path.basename(path), "sha256": self.cache.file_hash(path)}
+        return self._stage(stage, inputs, params, lambda: compute(self.store, self._file_table(table, path)),
+                           os.path.basename(path))
+
+    @staticmethod
+    def _file_table_name(table: str, path: str) -> str:
+        return f"{table}.{partition_name(os.path.basename(path))}"
+
+    def _file_table(self, table: str, path: str) -> str:
+        """Name of the file's table in the store, parsing the CSV only when its content changed."""
+        name = self._file_table_name(table, path)
+        sources = {os.path.basename(path): self.cache.file_hash(path)}
+        if not self.store.current(name, sources):
+            header = read_header(path)
+            partition_by = next((c for c in PARTITION_COLUMNS.get(table, []) if c in header), None)
+            self.store.ingest_csv(name, [path], partition_by, sources, text_columns(table))
+        return name
+
+    def _prune_file_tables(self, files: dict):
+        """Drop per-file tables of CSVs that no longer exist."""
+        live = {self._file_table_name(table, path) for table, paths in files.items() for path in paths}
+        for name in self.store.tables():
+            if "." in name and name not in live:
+                self.store.drop(name)
+
+    # ========== INGESTÃO ==========
+
+    def ingest(self) -> dict:
+        """
+        Make each table a view over the store tables of its files, parsing only
+        files whose content changed. Returns table -> "stored" | "unchanged".
+        """
+        status = {}
+        files = self.files()
+        self._prune_file_tables(files)
+        for table, paths in files.items():
+            if not paths:
+                continue
+            sources = {os.path.basename(path): self.cache.file_hash(path) for path in paths}
+            if self.store.current(table, sources):
+                status[table] = "unchanged"
+                continue
+            self.store.define_view(table, [self._file_table(table, path) for path in paths], sources)
+            status[table] = "stored"
+        return status
+
+    # ========== EXECUÇÃO ==========
+
+    def run(self) -> dict:
+        """Run every stage; returns {"stats", "capping", "correlation", "ranking", "report"}."""
+        self.report = []
+        files = self.files()
+        self._prune_file_tables(files)
+
+        profile_keys, profiles = {}, {}
+        for table, paths in files.items():
+            numeric, categorical = table_columns(table)
+            params = {"numeric": numeric, "categorical": categorical}
+            results = [
+                self._file_stage("profile", table, path, params,
+                                 lambda store, name: profile_file(store, name, numeric, categorical))
+                for path in paths
+            ]
+            profile_keys[table] = [key for key, _ in results]
+            profiles[table] = merge_profiles([profile for _, profile in results])
+
+        _, stats = self._stage("stats", {"profiles": profile_keys}, {},
+                               lambda: data_node_stats(profiles))
+
+        assays = files["assay"]
+        capping = [self._file_stage("capping", "assay", path, {}, capping_file) for path in assays]
+        correlation = [self._file_stage("correlation", "assay", path, {"elements": self.elements},
+                                        lambda store, name: correlation_file(store, name, self.elements))
+                       for path in assays]
+
+        _, capping_result = self._stage(
+            "capping_merge", {"partials": [key for key, _ in capping]}, {},
+            lambda: self._merge_capping([engine for _, engine in capping])
+        )
+        _, correlation_result = self._stage(
+            "correlation_merge", {"partials": [key for key, _ in correlation]}, {"elements": self.elements},
+            lambda: self._merge_correlation([engine for _, engine in correlation])
+        )
+
+        ranking = {table: [self._file_stage("ranking", table, path, {}, ranking_file) for path in files[table]]
+                   for table in ("assay", "lithology")}
+        _, ranking_result = self._stage(
+            "ranking_merge", {table: [key for key, _ in partials] for table, partials in ranking.items()}, {},
+            lambda: merge_rankings([partial for _, partial in ranking["assay"]],
+                                   [partial for _, partial in ranking["lithology"]])
+        )
+
+        computed = sum(1 for entry in self.report if entry["status"] == "computed")
+        logger.info(f"Pipeline: {len(self.report)} stages, {computed} computed, "
+                    f"{len(self.report) - computed} from cache")
+        return {
+            "stats": stats,
+            "capping": capping_result,
+            "correlation": correlation_result,
+            "ranking": ranking_result,
+            "report": self.report
+        }
+
+    def _merge_capping(self, partials: list) -> dict:
+        engine = CappingEngine()
+        for partial in partials:
+            engine.merge(partial)
+        return engine.propose() if engine.sketches else {}
+
+    def _merge_correlation(self, partials: list) -> dict:
+        engine = CorrelationEngine(self.elements)
+        for partial in partials:
+            engine.merge(partial)
+        if ALL_DOMAINS not in engine.accumulators:
+            return {}
+        return {ALL_DOMAINS: engine.result(), **{domain: engine.result(domain) for domain in engine.domains}}
+
+    # ========== PUBLICAÇÃO ==========
+
+    def publish(self, results: dict, client=None) -> dict:
+        """
+        Write changed DataNode stats (the rule engine re-evaluates affected
+        inferences) and the deposit-type ranking.
+        """
+        from graph.client import GraphClient
+        from graph.rule_engine import InferenceRuleEngine
+
+        owns_client = client is None
+        client = client or GraphClient()
+        if owns_client:
+            client.connect()
+        try:
+            engine = InferenceRuleEngine(client)
+            engine.load()
+            summary = {"updated": [], "asserted": [], "retracted": [], "ranking": None}
+            ranking = results.get("ranking")
+            ranking_fields = None
+            if ranking and ranking["samples"]:
+                ranking_fields = {"ranking": ranking["ranking"], "ranking_posterior": ranking["posterior"]}
+                # Set before the stats so a re-asserted inference is written with it
+                engine.computed[RANKING_INFERENCE] = ranking_fields
+            for node_id, values in results["stats"].items():
+                current = engine.nodes.get(node_id, {})
+                if all(current.get(kind) == value for kind, value in values.items()):
+                    continue
+                changes = engine.update_stats(node_id, values.get("stats"), values.get("distribution"))
+                summary["updated"].append(node_id)
+                summary["asserted"] += changes["asserted"]
+                summary["retracted"] += changes["retracted"]
+            if ranking_fields:
+                engine.set_evidence(RANKING_INFERENCE, ranking_fields)
+                summary["ranking"] = ranking["ranking"]
+            logger.info(f"Published {len(summary['updated'])} DataNodes "
+                        f"(asserted {summary['asserted']}, retracted {summary['retracted']})")
+            return summary
+        finally:
+            if owns_client:
+                client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the cached drillhole statistics pipeline")
+    parser.add_argument("project_dir")
+    parser.add_argument("--publish", action="store_true", help="write DataNode stats to Neo4j")
+    parser.add_argument("--ingest", action="store_true", help="persist tables in the columnar store")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--max-cache-mb", type=int, default=2048)
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or os.path.join(args.project_dir, CACHE_DIR)
+    pipeline = Pipeline(args.project_dir, ArtifactCache(cache_dir, args.max_cache_mb * 1024 ** 2))
+    if args.ingest:
+        for table, status in pipeline.ingest().items():
+            logger.info(f"🗄️  {table}: {status}")
+    results = pipeline.run()
+
+    for entry in results["report"]:
+        logger.info(f"  {entry['status']:8} {entry['stage']:18} {entry['file']} "
+                    f"({entry['seconds']}s)")
+    for node_id, values in sorted(results["stats"].items()):
+        logger.info(f"📊 {node_id}: {values.get('stats') or values.get('distribution')}")
+    if results["ranking"]["samples"]:
+        logger.info(f"🧭 Deposit type: {results['ranking']['ranking']}")
+    if ALL_DOMAINS in results["capping"]:
+        logger.info(f"✂️  Ni cap (P99): {results['capping'][ALL_DOMAINS]['cap']:.2f}")
+    if args.publish:
+        pipeline.publish(results)
@@ -0,0 +1,197 @@
+"""
+Pipeline stage functions.
+
+Per-file stages return mergeable partial states (moments, sketches,
+category counts, capping/correlation accumulators). They read one source
+file's table from the columnar store, only the columns they need. The
+runner caches them per input file and merges them, so a changed file only
+recomputes its own partials.
+"""
+from collections import Counter
+
+import numpy as np
+
+from engines.capping import CappingEngine
+from engines.correlation import CorrelationEngine
+from engines.deposit_ranking import LITHOLOGY_COLUMN, DepositRanking
+from engines.sketches import QuantileSketch, RunningMoments
+from engines.tables import to_float
+
+# ========== TABELAS E COLUNAS ==========
+TABLE_PATTERNS = {
+    "collar": "collar*.csv",
+    "survey": "survey*.csv",
+    "assay": "assay*.csv",
+    "lithology": "lith*.csv"
+}
+
+# DataNode id -> (table, column, kind), matching the nodes created by m001
+DATA_NODE_COLUMNS = {
+    "collar.x": ("collar", "XCOLLAR", "stats"),
+    "collar.y": ("collar", "YCOLLAR", "stats"),
+    "collar.z": ("collar", "ZCOLLAR", "stats"),
+    "collar.depth": ("collar", "DEPTH", "stats"),
+    "collar.drill_type": ("collar", "DTYPE", "distribution"),
+    "collar.diameter": ("collar", "DIAM", "distribution"),
+    "survey.at": ("survey", "AT", "stats"),
+    "survey.dip": ("survey", "DIP", "stats"),
+    "survey.azimuth": ("survey", "BRG", "stats"),
+    "assay.elements.Ni": ("assay", "NI", "stats"),
+    "assay.elements.Si": ("assay", "SI", "stats"),
+    "assay.elements.Mg": ("assay", "MG", "stats"),
+    "lithology.LITO": ("lithology", "LITO", "distribution"),
+}
+
+ELEMENTS = ["NI", "SI", "MG"]
+GRADE_COLUMN = "NI"
+DOMAIN_COLUMN = "LITO"
+LENGTH_COLUMNS = ("FROM", "TO")
+
+
+def table_columns(table: str) -> tuple:
+    """(numeric, categorical) columns the DataNodes read from a table."""
+    numeric = [col for t, col, kind in DATA_NODE_COLUMNS.values() if t == table and kind == "stats"]
+    categorical = [col for t, col, kind in DATA_NODE_COLUMNS.values() if t == table and kind == "distribution"]
+    return numeric, categorical
+
+
+def text_columns(table: str) -> list:
+    """Columns stored as strings even when numeric-looking (category labels keep their spelling)."""
+    return table_columns(table)[1] + [DOMAIN_COLUMN]
+
+
+def _numeric(values) -> np.ndarray:
+    """float64 column; a column stored as strings (some text in it) parses with NaN for the text."""
+    values = np.asarray(values)
+    return values.astype(np.float64) if values.dtype.kind in "fiu" else to_float(values)
+
+
+# ========== ESTÁGIOS POR ARQUIVO ==========
+
+def profile_file(store, table: str, numeric: list, categorical: list) -> dict:
+    """Moments, quantile sketch and category counts for the columns present in a stored file."""
+    header = store.columns(table)
+    numeric = [c for c in numeric if c in header]
+    categorical = [c for c in categorical if c in header]
+    profile = {
+        "rows": 0,
+        "numeric": {c: (RunningMoments(), QuantileSketch()) for c in numeric},
+        "categorical": {c: Counter() for c in categorical}
+    }
+    if not numeric and not categorical:
+        return profile
+
+    data = store.read(table, numeric + categorical)
+    profile["rows"] = len(data[(numeric + categorical)[0]])
+    for column in numeric:
+        values = _numeric(data[column])
+        moments, sketch = profile["numeric"][column]
+        moments.update(values)
+        sketch.update(values)
+    for column in categorical:
+        values = np.asarray(data[column]).astype(str)
+        labels, counts = np.unique(values[values != ""], return_counts=True)
+        profile["categorical"][column].update({str(k): int(n) for k, n in zip(labels, counts)})
+    return profile
+
+
+def capping_file(store, table: str) -> CappingEngine:
+    header = store.columns(table)
+    domain = DOMAIN_COLUMN if DOMAIN_COLUMN in header else None
+    engine = CappingEngine()
+    if GRADE_COLUMN not in header:
+        return engine
+    has_length = all(c in header for c in LENGTH_COLUMNS)
+    columns = [GRADE_COLUMN] + ([domain] if domain else []) + (list(LENGTH_COLUMNS) if has_length else [])
+    data = store.read(table, columns)
+    lengths = _numeric(data["TO"]) - _numeric(data["FROM"]) if has_length else None
+    engine.update(_numeric(data[GRADE_COLUMN]), np.asarray(data[domain]) if domain else None, lengths)
+    return engine
+
+
+def correlation_file(store, table: str, elements: list) -> CorrelationEngine:
+    header = store.columns(table)
+    present = [c for c in elements if c in header]
+    domain = DOMAIN_COLUMN if DOMAIN_COLUMN in header else None
+    engine = CorrelationEngine(elements)
+    if not present:
+        return engine
+    data = store.read(table, present + ([domain] if domain else []))
+    rows = len(data[present[0]])
+    values = np.column_stack([_numeric(data[c]) if c in data else np.full(rows, np.nan) for c in elements])
+    engine.update(values, np.asarray(data[domain]) if domain else None)
+    return engine
+
+
+def ranking_file(store, table: str) -> DepositRanking:
+    ranking = DepositRanking()
+    header = store.columns(table)
+    numeric = [e for e in ranking.elements if e in header]
+    columns = numeric + ([LITHOLOGY_COLUMN] if LITHOLOGY_COLUMN in header else [])
+    if columns:
+        data = store.read(table, columns)
+        ranking.update({c: _numeric(data[c]) if c in numeric else data[c] for c in columns})
+    return ranking
+
+
+# ========== ESTÁGIOS DE AGREGAÇÃO ==========
+
+def merge_profiles(profiles: list) -> dict:
+    merged = {"rows": 0, "numeric": {}, "categorical": {}}
+    for profile in profiles:
+        merged["rows"] += profile["rows"]
+        for column, (moments, sketch) in profile["numeric"].items():
+            if column not in merged["numeric"]:
+                merged["numeric"][column] = (RunningMoments(), QuantileSketch())
+            merged["numeric"][column][0].merge(moments)
+            merged["numeric"][column][1].merge(sketch)
+        for column, counts in profile["categorical"].items():
+            merged["categorical"].setdefault(column, Counter()).update(counts)
+    return merged
+
+
+def merge_rankings(assay_partials: list, lithology_partials: list) -> dict:
+    """
+    Deposit-type ranking over every assay file. Lithology counts come from
+    the lithology table when it has any, otherwise from the assays' LITO.
+    """
+    ranking = DepositRanking()
+    use_lithology_table = any(partial.logged for partial in lithology_partials)
+    for partial in assay_partials:
+        ranking.merge(partial, lithology=not use_lithology_table)
+    for partial in lithology_partials:
+        ranking.merge(partial)
+    return ranking.summary()
+
+
+def format_stats(moments: RunningMoments, sketch: QuantileSketch) -> dict:
+    """Stats in the shape m001 stores on DataNodes."""
+    return {
+        "mean": round(moments.mean, 2),
+        "median": round(min(max(sketch.quantile(0.5), moments.min), moments.max), 2),
+        "min": round(moments.min, 2),
+        "max": round(moments.max, 2),
+        "cv": round(abs(moments.cv), 2) if moments.mean else 0.0
+    }
+
+
+def format_distribution(counts: Counter) -> dict:
+    total = sum(counts.values())
+    return {str(key): round(100.0 * count / total, 1) for key, count in counts.most_common()} if total else {}
+
+
+def data_node_stats(table_profiles: dict) -> dict:
+    """DataNode id -> {"stats": ...} or {"distribution": ...} from merged table profiles."""
+    nodes = {}
+    for node_id, (table, column, kind) in DATA_NODE_COLUMNS.items():
+        profile = table_profiles.get(table)
+        if not profile:
+            continue
+        if kind == "stats" and column in profile["numeric"]:
+            moments, sketch = profile["numeric"][column]
+            if moments.count:
+                nodes[node_id] = {"stats": format_stats(moments, sketch)}
+        elif kind == "distribution" and column in profile["categorical"]:
+            if profile["categorical"][column]:
+                nodes[node_id] = {"distribution": format_distribution(profile["categorical"][column])}
+    return nodes
@@ -0,0 +1,228 @@
+"""
+Unified server: frontend assets and the API in one process.
+
+Replaces `python -m http.server 8000` + a separate `python api.py`:
+
+- static files (decision_tree.html, context.json, version.txt, src/, styles/)
+  are sent with sendfile(), pre-compressed once per content version (brotli
+  when the `brotli` package is installed, gzip otherwise) and cached under
+  .static_cache/
+- every asset has a content-hash ETag (304 on revalidation); requests whose
+  ?v= matches the asset hash or the current build hash are cacheable for a
+  year (immutable). decision_tree.html is served with its `Date.now()` cache
+  buster replaced by the build hash, so module URLs are stable per deploy
+- /api/* and /metrics go to the Flask app from api.py, in-process, on a
+  threaded HTTP/1.1 server
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8000]
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from urllib.parse import parse_qs, unquote
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, ".static_cache")
+INDEX = "decision_tree.html"
+STATIC_FILES = {"decision_tree.html", "context.json", "version.txt"}
+STATIC_DIRS = ("src/", "styles/")
+API_PREFIXES = ("/api/", "/metrics")
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CACHE_BUSTER = "const timestamp = Date.now();"
+
+mimetypes.add_type("application/javascript", ".js")
+
+
+class Asset:
+    """One static file at one content version, with its encoded variants on disk."""
+
+    def __init__(self, path: str, stat: os.stat_result, body_path: str, digest: str, variants: dict,
+                 build: str = None):
+        self.path = path
+        self.build = build               # build hash baked into the body (index page only)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.body_path = body_path
+        self.etag = f'"{digest}"'
+        self.digest = digest
+        self.variants = variants         # encoding -> file path
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type.endswith(("javascript", "json")):
+            self.content_type += "; charset=utf-8"
+
+
+class StaticAssets:
+    """Resolves request paths to Assets, rebuilding an entry when its file changes."""
+
+    def __init__(self, root: str = ROOT, cache_dir: str = CACHE_DIR):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.assets = {}
+        self._build = (None, None)       # (signature of all files, build hash)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def resolve(self, url_path: str) -> str:
+        """Filesystem path for an allowed URL path, else None."""
+        path = os.path.realpath(os.path.join(self.root, unquote(url_path).lstrip("/") or INDEX))
+        # Checked after normalization, so "src/../api.py" is refused
+        relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if relative not in STATIC_FILES and not relative.startswith(STATIC_DIRS):
+            return None
+        return path if os.path.isfile(path) else None
+
+    def build_hash(self) -> str:
+        """Hash over the signatures of every static file (changes on any deploy)."""
+        signature = []
+        for directory in STATIC_DIRS:
+            for base, _, names in os.walk(os.path.join(self.root, directory)):
+                for name in names:
+                    stat = os.stat(os.path.join(base, name))
+                    signature.append((base, name, stat.st_mtime_ns, stat.st_size))
+        for name in sorted(STATIC_FILES - {INDEX}):
+            path = os.path.join(self.root, name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+        signature = tuple(sorted(signature))
+        if self._build[0] != signature:
+            self._build = (signature, hashlib.sha1(repr(signature).encode()).hexdigest()[:12])
+        return self._build[1]
+
+    def get(self, path: str) -> Asset:
+        stat = os.stat(path)
+        asset = self.assets.get(path)
+        build = self.build_hash() if path.endswith(INDEX) else None
+        if asset is not None and asset.signature == (stat.st_mtime_ns, stat.st_size) \
+                and (build is None or asset.build == build):
+            return asset
+        with self._lock:
+            asset = self._load(path, stat, build)
+            self.assets[path] = asset
+        return asset
+
+    def _load(self, path: str, stat: os.stat_result, build: str) -> Asset:
+        with open(path, "rb") as f:
+            body = f.read()
+        body_path = path
+        if build is not None:
+            body = body.replace(CACHE_BUSTER.encode(), f'const timestamp = "{build}";'.encode())
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        if build is not None:
+            body_path = self._write(f"{digest}.html", body)
+
+        variants = {}
+        content_type = mimetypes.guess_type(path)[0] or ""
+        if content_type.startswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                variants["br"] = self._write(f"{digest}.br", lambda: brotli.compress(body, quality=11))
+            variants["gzip"] = self._write(f"{digest}.gz", lambda: gzip.compress(body, 9, mtime=0))
+        return Asset(path, stat, body_path, digest, variants, build)
+
+    def _write(self, name: str, data) -> str:
+        """Cache file `name` (content-addressed, so an existing one is reused)."""
+        target = os.path.join(self.cache_dir, name)
+        if not os.path.exists(target):
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data() if callable(data) else data)
+            os.replace(tmp, target)
+        return target
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Serves static assets directly; everything else goes to the WSGI app."""
+
+    assets = None
+
+    def run_wsgi(self):
+        path, _, query = self.path.partition("?")
+        if self.command not in ("GET", "HEAD") or path.startswith(API_PREFIXES):
+            return super().run_wsgi()
+        if path == "/":
+            self.send_response(302)
+            self.send_header("Location", f"/{INDEX}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        file_path = self.assets.resolve(path)
+        if file_path is None:
+            return self.send_error(404)
+        self.send_asset(self.assets.get(file_path), parse_qs(query).get("v", [None])[0])
+
+    def send_asset(self, asset: Asset, version: str):
+        versioned = version is not None and version in (asset.digest, self.assets.build_hash())
+        cache_control = IMMUTABLE if versioned else REVALIDATE
+        if self.headers.get("If-None-Match") == asset.etag:
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        accepted = {part.split(";")[0].strip() for part in self.headers.get("Accept-Encoding", "").split(",")}
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), None)
+        body_path = asset.variants[encoding] if encoding else asset.body_path
+        with open(body_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header("Content-Type", asset.content_type)
+            self.send_header("Content-Length", str(size))
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", cache_control)
+            if asset.variants:
+                self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            if self.command == "GET":
+                self.wfile.flush()
+                # Zero-copy from the page cache (falls back to send() where unsupported)
+                self.connection.sendfile(f)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8000, app=None):
+    """Threaded server with the static handler and the API app."""
+    if app is None:
+        from api import app
+    RequestHandler.assets = StaticAssets()
+    return make_server(host, port, app, threaded=True, request_handler=RequestHandler)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    server = create_server(host, port)
+    logger.info(f"🌐 Serving http://{host}:{port}/{INDEX} (API at /api, metrics at /metrics)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Serve the frontend and the API")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+
+    try:
+        serve(args.host, args.port)
+    except KeyboardInterrupt:
+        logger.info("👋 Server stopped")
@@ -0,0 +1,89 @@
+// Live graph changes from the API (/api/events, server-sent events).
+// Each message is a coalesced batch of node/edge/job events; the browser
+// resends the last event id on reconnect, so nothing is missed or re-fetched.
+// A graph_reset event (snapshot import, database cleared) cannot be merged
+// in place: onReset runs instead, reloading the page by default.
+
+export function subscribeGraphEvents({ onChanges, onReset = () => window.location.reload(), url = '/api/events' } = {}) {
+  if (!window.EventSource) {
+    console.warn('⚠️ EventSource not supported; live graph updates disabled');
+    return () => {};
+  }
+
+  const source = new EventSource(url);
+  source.addEventListener('changes', message => {
+    try {
+      const { events } = JSON.parse(message.data);
+      if (events.some(event => event.type === 'graph_reset')) {
+        onReset();
+        return;
+      }
+      onChanges(events);
+    } catch (error) {
+      console.error('Error applying graph events:', error);
+    }
+  });
+  source.onerror = () => console.warn('⚠️ Graph event stream interrupted, reconnecting...');
+
+  return () => source.close();
+}
+
+// Apply a batch to the inference list built by transformNeo4jToTree.
+// Returns true when anything visible changed.
+export function applyGraphEvents(inferenceNodes, events) {
+  const byId = new Map(inferenceNodes.map(node => [node.id, node]));
+  let changed = false;
+
+  for (const event of events) {
+    if (event.type === 'node_added' || event.type === 'node_updated') {
+      if (event.label !== 'Inference') continue;
+      const existing = byId.get(event.id);
+      if (existing) {
+        if (event.title) existing.title = event.title;
+        if (event.node_type) existing.type = event.node_type;
+      } else {
+        const node = {
+          title: event.title || event.id,
+          id: event.id,
+          type: event.node_type,
+          isInference: true,
+          evidence: {},
+          implications: [],
+          recommendations: [],
+          metadata: {},
+          sources: [],
+          targets: [],
+          result: ''
+        };
+        inferenceNodes.push(node);
+        byId.set(node.id, node);
+      }
+      changed = true;
+    } else if (event.type === 'node_removed') {
+      const index = inferenceNodes.findIndex(node => node.id === event.id);
+      if (index === -1) continue;
+      inferenceNodes.splice(index, 1);
+      byId.delete(event.id);
+      for (const node of inferenceNodes) {
+        node.sources = node.sources.filter(id => id !== event.id);
+        node.targets = node.targets.filter(id => id !== event.id);
+      }
+      changed = true;
+    } else if (event.type === 'edge_added' || event.type === 'edge_removed') {
+      // SUPPORTS a -> b: a is a source of b; LEADS_TO a -> b: b is a target of a
+      const [node, list, other] = event.rel === 'SUPPORTS'
+        ? [byId.get(event.target), 'sources', event.source]
+        : [byId.get(event.source), 'targets', event.target];
+      if (!node) continue;
+      const present = node[list].includes(other);
+      if (event.type === 'edge_added' && !present) {
+        node[list].push(other);
+        changed = true;
+      } else if (event.type === 'edge_removed' && present) {
+        node[list] = node[list].filter(id => id !== other);
+        changed = true;
+      }
+    }
+  }
+  return changed;
+}
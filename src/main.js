@@ -3,6 +3,7 @@ import { transformNeo4jToTree } from './transform/transformNeo4jToTree.js';
 import { initGrowthController } from './animation/growthController.js';
 import { initTreeRender } from './render/treeRender.js';
 import { initValidationFooter } from './validation/validation_footer.js';
+import { subscribeGraphEvents, applyGraphEvents } from './data/graphEvents.js';
 
 // Setup dimensions - usar viewport completo
 const width = window.innerWidth - 40;
@@ -63,7 +64,9 @@ transformNeo4jToTree().then(treeData => {
     const visibleNodes = [root];
 
     // Draw function
+    let inferencesShown = false;
 function draw({ readyForInferences = false } = {}) {
+  inferencesShown = readyForInferences;
   drawTree({ 
     visibleNodes, 
     currentNodes: allNodes.map(n => ({
@@ -86,6 +89,16 @@ function draw({ readyForInferences = false } = {}) {
       defaultDurationSec: 3,
     });
 
+    // Live updates: new/changed inferences are merged in place instead of re-fetching.
+    // During the growth animation they are only stored; the final draw picks them up.
+    subscribeGraphEvents({
+      onChanges: events => {
+        if (applyGraphEvents(rootNode.inferenceNodes, events) && inferencesShown) {
+          draw({ readyForInferences: true });
+        }
+      }
+    });
+
     // Initialize validation footer
     initValidationFooter();
   })
@@ -2,18 +2,30 @@
 """
 🚀 Orquestrador: Migra Neo4j e inicia servidor local
 Uso:
-    python start.py          # Apenas migra e inicia servidor
+    python start.py                 # Migra (só se houver pendentes, uma consulta ao Neo4j) e inicia servidor
+    python start.py --trust-marker  # Idem, pulando a consulta quando o marcador local confere
     python start.py --fresh  # Apaga tudo, recria e inicia servidor
+
+Com um snapshot em SNAPSHOT_PATH (padrão: snapshot/, gerado com
+`python -m graph.snapshot export snapshot/`), o --fresh importa o grafo em
+lote em vez de refazer todas as migrations.
+
+Tudo roda neste processo: migrations, frontend e API (server.py) na mesma
+porta, sem subprocessos.
 """
-import subprocess
+import os
 import sys
 
-def run_command(cmd, description):
-    """Executa comando e mostra progresso"""
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "snapshot")
+PORT = int(os.getenv("PORT", "8000"))
+
+def run_step(fn, description):
+    """Executa etapa e mostra progresso"""
     print(f"\n🔄 {description}...")
-    result = subprocess.run(cmd, shell=True)
-    if result.returncode != 0:
-        print(f"❌ Erro em: {description}")
+    try:
+        fn()
+    except Exception as e:
+        print(f"❌ Erro em: {description} ({e})")
         sys.exit(1)
     print(f"✅ {description} completo!")
 
@@ -22,22 +34,33 @@ if __name__ == "__main__":
     print("🌳 Jack and the Beanstalk - Orquestrador")
     print("=" * 60)
     
+    import migrate
+    from graph.snapshot import import_snapshot
+    import server
+    
     # Verifica se quer rollback
     if "--fresh" in sys.argv:
-        run_command("python migrate.py --rollback", "Rollback migrations (apagando tudo)")
+        if os.path.exists(SNAPSHOT_PATH):
+            run_step(lambda: import_snapshot(SNAPSHOT_PATH, replace=True), f"Import snapshot {SNAPSHOT_PATH}")
+        else:
+            run_step(migrate.rollback_all, "Rollback migrations (apagando tudo)")
     
-    # Sempre faz migrate
-    run_command("python migrate.py", "Apply migrations")
+    # Só roda migrations pendentes (após um snapshot, só as mais novas que ele). O
+    # marcador local só é usado com --trust-marker: um banco apagado ou substituído
+    # fora deste projeto não o remove
+    trust_marker = "--trust-marker" in sys.argv and "--fresh" not in sys.argv
+    run_step(lambda: migrate.migrate_if_pending(trust_marker=trust_marker), "Apply migrations")
     
     # Inicia servidor local
     print("\n" + "=" * 60)
     print("🌐 Servidor local iniciado!")
-    print("📄 Abra no navegador: http://localhost:8000/decision_tree.html")
+    print(f"📄 Abra no navegador: http://localhost:{PORT}/decision_tree.html")
+    print(f"🔌 API: http://localhost:{PORT}/api/data")
     print("⏹️  Pressione Ctrl+C para parar")
     print("=" * 60 + "\n")
     
     try:
-        subprocess.run("python -m http.server 8000", shell=True)
+        server.serve(port=PORT)
     except KeyboardInterrupt:
         print("\n\n👋 Servidor encerrado. Até logo!")
 
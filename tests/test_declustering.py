@@ -0,0 +1,49 @@
+"""Cell declustering weights on regular and clustered sample sets."""
+import numpy as np
+import pytest
+
+from engines.declustering import DeclusteringEngine
+
+
+def test_regular_grid_gets_unit_weights():
+    axis = np.arange(10, dtype=np.float64) * 10.0
+    coords = np.stack(np.meshgrid(axis, axis, indexing="ij"), axis=-1).reshape(-1, 2)
+    result = DeclusteringEngine(coords, np.arange(100.0), workers=1).optimize([10.0], n_offsets=1)
+    np.testing.assert_allclose(result["weights"], 1.0)
+    assert result["best_mean"] == pytest.approx(result["naive_mean"])
+
+
+def test_clustered_high_grades_are_down_weighted():
+    rng = np.random.default_rng(2)
+    spread = rng.uniform(0.0, 100.0, (100, 2))
+    cluster = rng.uniform(40.0, 45.0, (100, 2))
+    values = np.concatenate([np.ones(100), np.full(100, 5.0)])
+    result = DeclusteringEngine(np.vstack([spread, cluster]), values, workers=1).optimize([2.0, 10.0, 25.0])
+
+    weights = result["weights"]
+    assert np.mean(weights) == pytest.approx(1.0)
+    assert weights[100:].mean() < weights[:100].mean()
+    assert result["best_mean"] < result["naive_mean"]
+    assert result["best_mean"] == min(result["declustered_means"])
+
+
+def test_invalid_samples_get_nan_weights():
+    coords = np.array([[0.0, 0.0], [1.0, 1.0], [np.nan, 2.0], [3.0, 3.0]])
+    result = DeclusteringEngine(coords, [1.0, 2.0, 3.0, np.nan], workers=1).optimize([1.0])
+    assert np.isnan(result["weights"][[2, 3]]).all()
+    assert np.isfinite(result["weights"][:2]).all()
+
+
+def test_process_pool_matches_single_process():
+    rng = np.random.default_rng(4)
+    coords, values = rng.uniform(0.0, 50.0, (500, 3)), rng.lognormal(size=500)
+    sizes = [5.0, 10.0, 20.0]
+    single = DeclusteringEngine(coords, values, workers=1).optimize(sizes, anisotropy=(1, 1, 0.5))
+    pooled = DeclusteringEngine(coords, values, workers=2).optimize(sizes, anisotropy=(1, 1, 0.5))
+    np.testing.assert_allclose(pooled["declustered_means"], single["declustered_means"])
+    np.testing.assert_allclose(pooled["weights"], single["weights"])
+
+
+def test_rejects_non_positive_cell_sizes():
+    with pytest.raises(ValueError):
+        DeclusteringEngine(np.zeros((3, 2)), np.ones(3), workers=1).optimize([0.0])
@@ -0,0 +1,72 @@
+"""Ordinary kriging, inverse distance and nearest neighbour on small hand-checkable cases."""
+import numpy as np
+import pytest
+
+from engines.estimation import EstimationEngine, VariogramModel, discretization_offsets
+
+VARIOGRAM = {"nugget": 0.1, "structures": [{"type": "spherical", "sill": 0.9, "ranges": [60.0, 60.0, 60.0]}]}
+SEARCH = {"ranges": (80.0, 80.0, 80.0), "min_samples": 1, "max_samples": 12}
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(11)
+    return rng.uniform(0.0, 100.0, (40, 3)), rng.lognormal(0.0, 0.5, 40)
+
+
+def _kriging(coords, values, centre, block_size, discretization):
+    """Direct ordinary kriging of one block with every sample inside the isotropic search radius."""
+    model = VariogramModel.from_dict(VARIOGRAM)
+    inside = np.linalg.norm(coords - centre, axis=1) <= SEARCH["ranges"][0]
+    coords, values = coords[inside], values[inside]
+    disc = centre + discretization_offsets(block_size, discretization)
+    n = len(values)
+    lhs = np.ones((n + 1, n + 1))
+    lhs[:n, :n] = model.covariance(coords[:, None, :] - coords[None, :, :])
+    lhs[n, n] = 0.0
+    rhs = np.ones(n + 1)
+    rhs[:n] = model.covariance(coords[:, None, :] - disc[None, :, :]).mean(axis=1)
+    solution = np.linalg.solve(lhs, rhs)
+    block_cov = model.covariance(disc[:, None, :] - disc[None, :, :]).mean()
+    return solution[:n] @ values, block_cov - solution[:n] @ rhs[:n] - solution[n]
+
+
+def test_ordinary_kriging_matches_direct_solve(samples):
+    coords, values = samples
+    engine = EstimationEngine(coords, values, VARIOGRAM, {**SEARCH, "max_samples": 40}, workers=1)
+    centres = np.array([[50.0, 50.0, 50.0], [20.0, 70.0, 40.0]])
+    result = engine.estimate(centres, block_size=(10.0, 10.0, 10.0), discretization=(3, 3, 3), methods=("ok",))
+    for b, centre in enumerate(centres):
+        estimate, variance = _kriging(coords, values, centre, (10.0, 10.0, 10.0), (3, 3, 3))
+        assert result["ok"]["estimate"][b] == pytest.approx(estimate)
+        assert result["ok"]["variance"][b] == pytest.approx(variance)
+
+
+def test_ordinary_kriging_weights_sum_to_one(samples):
+    coords, _ = samples
+    engine = EstimationEngine(coords, np.full(len(coords), 2.5), VARIOGRAM, SEARCH, workers=1)
+    result = engine.estimate(np.random.default_rng(0).uniform(20.0, 80.0, (30, 3)), methods=("ok",))
+    np.testing.assert_allclose(result["ok"]["estimate"], 2.5)
+    assert np.all(result["ok"]["variance"] >= -1e-9)
+
+
+def test_point_estimates_at_a_sample_reproduce_it(samples):
+    coords, values = samples
+    engine = EstimationEngine(coords, values, {**VARIOGRAM, "nugget": 0.0}, SEARCH, workers=1)
+    result = engine.estimate(coords[:5], discretization=(1, 1, 1))
+    for method in ("ok", "id", "nn"):
+        np.testing.assert_allclose(result[method]["estimate"], values[:5], rtol=1e-7)
+
+
+def test_blocks_without_enough_samples_are_nan(samples):
+    coords, values = samples
+    engine = EstimationEngine(coords, values, VARIOGRAM, {**SEARCH, "min_samples": 3}, workers=1)
+    result = engine.estimate([[1000.0, 1000.0, 1000.0]])
+    assert result["n_samples"][0] == 0
+    assert np.isnan(result["ok"]["estimate"][0]) and np.isnan(result["id"]["estimate"][0])
+
+
+def test_collocated_samples_are_averaged():
+    engine = EstimationEngine([[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [10.0, 0.0, 0.0]], [1.0, 3.0, 5.0], workers=1)
+    assert len(engine.values) == 2
+    assert engine.estimate([[1.0, 0.0, 0.0]], methods=("nn",))["nn"]["estimate"][0] == 2.0
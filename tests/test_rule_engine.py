@@ -0,0 +1,128 @@
+"""Retract / re-assert cycle of the inference rule engine against an in-memory graph."""
+import json
+
+import pytest
+
+from graph import events
+from graph.rule_engine import InferenceRuleEngine
+
+
+class GraphStub:
+    """Answers the statements InferenceRuleEngine issues, on plain dicts."""
+
+    database = "test"
+
+    def __init__(self, data_nodes: dict, inferences: list, edges: set):
+        self.nodes = {node_id: {"labels": {"DataNode"}, "stats": json.dumps(stats), "distribution": None}
+                      for node_id, stats in data_nodes.items()}
+        for inf_id in inferences:
+            self.nodes[inf_id] = {"labels": {"Inference"}, "evidence": "{}"}
+        self.edges = set(edges)     # (source, rel, target)
+
+    def _labelled(self, label: str) -> list:
+        return [node_id for node_id, node in self.nodes.items() if label in node["labels"]]
+
+    def _edge(self, source: str, rel: str, target: str):
+        if source in self.nodes and target in self.nodes:
+            self.edges.add((source, rel, target))
+
+    def run_query(self, query: str, params: dict = None) -> list:
+        query, params = " ".join(query.split()), params or {}
+        node_id = params.get("id")
+        if query.startswith("MATCH (n:DataNode) RETURN"):
+            return [{"id": i, "stats": self.nodes[i]["stats"], "distribution": self.nodes[i]["distribution"]}
+                    for i in self._labelled("DataNode")]
+        if query.startswith("MATCH (i:Inference) RETURN"):
+            return [{"id": i} for i in self._labelled("Inference")]
+        if query.startswith("MATCH (a)-[:SUPPORTS|LEADS_TO]->(b) RETURN"):
+            return [{"source": s, "target": t} for s, rel, t in self.edges]
+        if query.startswith("MATCH (n:DataNode {id: $id}) SET"):
+            if params["stats"] is not None:
+                self.nodes[node_id]["stats"] = params["stats"]
+            return []
+        if query.startswith("MATCH (i:Inference {id: $id}) RETURN i.evidence"):
+            return [{"evidence": self.nodes[node_id]["evidence"]}] if node_id in self._labelled("Inference") else []
+        if query.startswith("MATCH (s:RetractedInference {id: $id}) RETURN s.edges"):
+            stash = self.nodes.get(f"stash:{node_id}")
+            return [{"edges": stash["edges"]}] if stash else []
+        if query.startswith("MERGE (stash:RetractedInference"):
+            self.nodes[f"stash:{node_id}"] = {"labels": {"RetractedInference"}, "edges": params["edges"]}
+            return []
+        if query.startswith("MATCH (i:Inference {id: $id})-[r:SUPPORTS|LEADS_TO]-()"):
+            return [{"source": s, "rel": rel, "target": t} for s, rel, t in self.edges if node_id in (s, t)]
+        if query.startswith("MATCH (i:Inference {id: $id}) DETACH DELETE i"):
+            self.nodes.pop(node_id, None)
+            self.edges = {e for e in self.edges if node_id not in (e[0], e[2])}
+            return []
+        if query.startswith("MERGE (i:Inference {id: $id})"):
+            self.nodes.setdefault(node_id, {"labels": {"Inference"}})["evidence"] = params["evidence"]
+            for source in params["sources"]:
+                self._edge(source, "SUPPORTS", node_id)
+            for target in params["targets"]:
+                self._edge(node_id, "LEADS_TO", target)
+            for dependent in params["dependents"]:
+                self._edge(node_id, "SUPPORTS", dependent)
+            for edge in params["restored"]:
+                self._edge(edge["source"], edge["rel"], edge["target"])
+            self.nodes.pop(f"stash:{node_id}", None)
+            return []
+        raise NotImplementedError(query)
+
+
+RULES = [
+    {"inference": "a", "conditions": [{"node": "x", "stat": "mean", "op": ">", "value": 0}]},
+    {"inference": "b", "conditions": [{"node": "y", "stat": "mean", "op": ">", "value": 0}]},
+]
+
+
+@pytest.fixture(autouse=True)
+def no_event_log(monkeypatch):
+    monkeypatch.setattr(events, "emit", lambda batch, database=None: None)
+
+
+def make_engine():
+    # "a" also carries edges written by later migrations (a LEADS_TO to a workflow
+    # step and an extra SUPPORTS), and a LEADS_TO b
+    graph = GraphStub(
+        {"x": {"mean": 1.0}, "y": {"mean": 1.0}, "z": {"mean": 1.0}},
+        ["a", "b", "step"],
+        {("x", "SUPPORTS", "a"), ("y", "SUPPORTS", "b"), ("a", "LEADS_TO", "step"),
+         ("z", "SUPPORTS", "a"), ("a", "LEADS_TO", "b")}
+    )
+    engine = InferenceRuleEngine(graph, RULES)
+    engine.load()
+    return graph, engine
+
+
+def test_reassert_restores_every_edge():
+    graph, engine = make_engine()
+    before = set(graph.edges)
+
+    assert engine.update_stats("x", {"mean": -1.0})["retracted"] == ["a"]
+    assert "a" not in graph.nodes
+    assert not any("a" in (s, t) for s, _, t in graph.edges)
+
+    assert engine.update_stats("x", {"mean": 2.0})["asserted"] == ["a"]
+    assert graph.edges == before
+    assert not graph._labelled("RetractedInference")
+    assert {"step", "b"} <= engine.edges["a"]
+
+
+def test_edge_between_two_retracted_inferences_survives_either_order():
+    graph, engine = make_engine()
+    before = set(graph.edges)
+
+    engine.update_stats("x", {"mean": -1.0})
+    engine.update_stats("y", {"mean": -1.0})
+    # "a" comes back while "b" is still retracted: a -> b must wait for b
+    engine.update_stats("x", {"mean": 2.0})
+    assert ("a", "LEADS_TO", "b") not in graph.edges
+    engine.update_stats("y", {"mean": 2.0})
+    assert graph.edges == before
+
+
+def test_unchanged_observation_writes_nothing():
+    graph, engine = make_engine()
+    engine.evaluate()
+    changes = engine.evaluate()
+    assert changes == {"asserted": [], "retracted": []}
@@ -0,0 +1,84 @@
+"""Mergeable moments, quantile sketch and pairwise-complete covariance against direct numpy results."""
+import numpy as np
+import pytest
+
+from engines.sketches import CovarianceAccumulator, QuantileSketch, RunningMoments
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def test_running_moments_merge_matches_single_pass(rng):
+    values, weights = rng.lognormal(0.0, 1.0, 5000), rng.uniform(0.5, 2.0, 5000)
+    whole = RunningMoments().update(values, weights)
+    merged = RunningMoments()
+    for part in np.array_split(np.arange(len(values)), 7):
+        merged.merge(RunningMoments().update(values[part], weights[part]))
+
+    mean = np.average(values, weights=weights)
+    for moments in (whole, merged):
+        assert moments.count == len(values)
+        assert moments.mean == pytest.approx(mean)
+        assert moments.m2 == pytest.approx(np.sum(weights * (values - mean) ** 2))
+        assert (moments.min, moments.max) == (values.min(), values.max())
+
+
+def test_running_moments_ignores_missing():
+    moments = RunningMoments().update([1.0, np.nan, 3.0, np.inf])
+    assert (moments.count, moments.mean) == (2, 2.0)
+
+
+def test_quantile_sketch_within_relative_accuracy(rng):
+    values = rng.lognormal(0.0, 1.5, 20000)
+    sketch = QuantileSketch(0.01).update(values)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = np.quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+    assert sketch.sum == pytest.approx(values.sum())
+
+
+def test_quantile_sketch_merge_equals_single_sketch(rng):
+    values = np.concatenate([-rng.lognormal(0.0, 1.0, 500), np.zeros(200), rng.lognormal(0.0, 1.0, 3000)])
+    rng.shuffle(values)
+    whole = QuantileSketch().update(values)
+    merged = QuantileSketch()
+    for part in np.array_split(values, 5):
+        merged.merge(QuantileSketch().update(part))
+    assert merged.total == whole.total == len(values)
+    for q in (0.05, 0.15, 0.5, 0.95):
+        assert merged.quantile(q) == whole.quantile(q)
+    assert merged.excess_above(2.0) == pytest.approx(whole.excess_above(2.0))
+
+
+def test_quantile_sketch_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def _pairwise_complete(values: np.ndarray) -> tuple:
+    p = values.shape[1]
+    covariance, correlation = np.empty((p, p)), np.empty((p, p))
+    for i in range(p):
+        for j in range(p):
+            both = np.isfinite(values[:, i]) & np.isfinite(values[:, j])
+            x, y = values[both, i], values[both, j]
+            covariance[i, j] = np.cov(x, y)[0, 1]
+            correlation[i, j] = np.corrcoef(x, y)[0, 1]
+    return covariance, correlation
+
+
+def test_covariance_accumulator_merge_matches_pairwise_complete(rng):
+    base = rng.normal(size=(3000, 1))
+    values = np.hstack([base + rng.normal(scale=s, size=(3000, 1)) for s in (0.2, 0.5, 1.0, 3.0)]) + 100.0
+    values[rng.random(values.shape) < 0.15] = np.nan
+    covariance, correlation = _pairwise_complete(values)
+
+    whole = CovarianceAccumulator(4).update(values)
+    merged = CovarianceAccumulator(4)
+    for part in np.array_split(np.arange(len(values)), 6):
+        merged.merge(CovarianceAccumulator(4).update(values[part]))
+    for accumulator in (whole, merged):
+        np.testing.assert_allclose(accumulator.covariance(), covariance, rtol=1e-9)
+        np.testing.assert_allclose(accumulator.correlation(), correlation, rtol=1e-9)
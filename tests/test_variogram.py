@@ -0,0 +1,68 @@
+"""Experimental variograms against a brute-force pair enumeration."""
+import numpy as np
+import pytest
+
+from engines.variogram import VariogramEngine, direction_vector
+
+
+def _brute_force(coords, values, lag, n_lags, direction=None, cos_tol=None, same=None):
+    counts, sq = np.zeros(n_lags + 1), np.zeros(n_lags + 1)
+    for i in range(len(values)):
+        for j in range(i + 1, len(values)):
+            if same is not None and not same[i, j]:
+                continue
+            h = coords[j] - coords[i]
+            dist = np.linalg.norm(h)
+            if direction is not None and abs(h @ direction) / max(dist, 1e-12) < cos_tol:
+                continue
+            k = int(np.rint(dist / lag))
+            if k <= n_lags and abs(dist - k * lag) <= lag / 2.0:
+                counts[k] += 1
+                sq[k] += (values[j] - values[i]) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return counts, np.where(counts > 0, 0.5 * sq / counts, np.nan)
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(3)
+    coords = rng.uniform(0.0, 100.0, (300, 3))
+    values = np.sin(coords[:, 0] / 15.0) + rng.normal(scale=0.3, size=300)
+    return coords, values
+
+
+@pytest.mark.parametrize("chunk_size", [37, 4096])
+def test_omnidirectional_matches_brute_force(samples, chunk_size):
+    coords, values = samples
+    result = VariogramEngine(coords, values, workers=1, chunk_size=chunk_size).omnidirectional(10.0, 6)
+    counts, gamma = _brute_force(coords, values, 10.0, 6)
+    np.testing.assert_array_equal(result["pairs"], counts)
+    np.testing.assert_allclose(result["gamma"], gamma, rtol=1e-12)
+
+
+def test_directional_matches_brute_force(samples):
+    coords, values = samples
+    result = VariogramEngine(coords, values, workers=1, chunk_size=50).directional([(90.0, 0.0)], 10.0, 6)[0]
+    counts, gamma = _brute_force(coords, values, 10.0, 6, direction_vector(90.0, 0.0), np.cos(np.radians(22.5)))
+    np.testing.assert_array_equal(result["pairs"], counts)
+    np.testing.assert_allclose(result["gamma"], gamma, rtol=1e-12)
+
+
+def test_downhole_pairs_never_cross_holes():
+    rng = np.random.default_rng(5)
+    holes = np.repeat(np.arange(6), 20)
+    depths = np.tile(np.arange(20, dtype=np.float64), 6)
+    values = rng.normal(size=len(holes))
+    engine = VariogramEngine(rng.uniform(0.0, 5.0, (len(holes), 3)), values, holes, depths, workers=1)
+    result = engine.downhole(1.0, 5)
+    counts, gamma = _brute_force(depths[:, None], values, 1.0, 5, same=holes[:, None] == holes[None, :])
+    np.testing.assert_array_equal(result["pairs"], counts)
+    np.testing.assert_allclose(result["gamma"], gamma, rtol=1e-12)
+
+
+def test_process_pool_matches_single_process(samples):
+    coords, values = samples
+    single = VariogramEngine(coords, values, workers=1, chunk_size=40).omnidirectional(10.0, 6)
+    pooled = VariogramEngine(coords, values, workers=2, chunk_size=40).omnidirectional(10.0, 6)
+    np.testing.assert_array_equal(pooled["pairs"], single["pairs"])
+    np.testing.assert_allclose(pooled["gamma"], single["gamma"], rtol=1e-12)